@@ -1,94 +1,124 @@
-from django.core.management.sql import emit_post_sync_signal
+import sys
+
 from django.core.management.color import no_style
-from django.db import connections, router, transaction, models, DEFAULT_DB_ALIAS
-from django.utils.datastructures import SortedDict
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
 from django.utils.encoding import smart_unicode
 from django.contrib.contenttypes.models import ContentType
 
-def create(model, using):
-    ''' Mostly lifted from django.core.management.commands.syncdb'''
+from application import replicas
 
-    opts = model._meta
 
-    # Get database connection and cursor
-    db = using or DEFAULT_DB_ALIAS
-    connection = connections[db]
+def get_existing_tables(connection, tables):
+    '''
+    Returns which of the given tables exist, asking about those tables only
+    rather than listing the whole catalogue
+    '''
+    tables = list(set(tables))
+    if not tables:
+        return set()
     cursor = connection.cursor()
+    placeholders = ', '.join(['%s'] * len(tables))
+    if connection.vendor == 'sqlite':
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name IN (%s)" % placeholders, tables
+        )
+    elif connection.vendor in ('postgresql', 'mysql'):
+        schema = 'current_schema()' if connection.vendor == 'postgresql' else 'DATABASE()'
+        cursor.execute(
+            'SELECT table_name FROM information_schema.tables '
+            'WHERE table_schema = %s AND table_name IN (%s)' % (schema, placeholders),
+            tables
+        )
+    else:
+        existing = connection.introspection.table_names(cursor)
+        return set(table for table in tables if table in existing)
+    return set(row[0] for row in cursor.fetchall())
 
-    # Get a list of already installed *models* so that references work right.
-    tables = connection.introspection.table_names()
-    seen_models = connection.introspection.installed_models(tables)
-    created_models = set()
-    pending_references = {}
 
-    # Abort if the table we're going to create already exists
-    if opts.db_table in tables:
-        return
+def get_related_models(model):
+    return [field.rel.to for field in model._meta.local_fields if field.rel]
 
-    # Build the manifest of apps and models that are to be synchronized
-    all_models = [
-        (app.__name__.split('.')[-2],
-            [m for m in models.get_models(app, include_auto_created=True)
-            if router.allow_syncdb(db, m)])
-        for app in models.get_apps()
-    ]
-    def model_installed(model):
-        opts = model._meta
-        converter = connection.introspection.table_name_converter
-        return not ((converter(opts.db_table) in tables) or
-            (opts.auto_created and converter(opts.auto_created._meta.db_table) in tables))
 
-    manifest = SortedDict(
-        (app_name, filter(model_installed, model_list))
-        for app_name, model_list in all_models
-    )
+def create(model, using):
+    '''
+    Creates the table of a single model on the given database and on every
+    read replica, see create_many
+    '''
+    for alias in replicas.get_schema_aliases(using):
+        create_many([model], alias)
 
-    # Get create SQL
-    sql, references = connection.creation.sql_create_model(model, no_style(), seen_models)
-    seen_models.add(model)
-    created_models.add(model)
-    for refto, refs in references.items():
-        pending_references.setdefault(refto, []).extend(refs)
-        if refto in seen_models:
-            sql.extend(connection.creation.sql_for_pending_references(refto, no_style(), pending_references))
-    sql.extend(connection.creation.sql_for_pending_references(model, no_style(), pending_references))
-    for statement in sql:
-        cursor.execute(statement)
-    tables.append(connection.introspection.table_name_converter(model._meta.db_table))
 
-    # Create content_type
-    try:
-        ct = ContentType.objects.get(app_label=opts.app_label,
-                                     model=opts.object_name.lower())
-    except ContentType.DoesNotExist:
-        ct = ContentType(name=smart_unicode(opts.verbose_name_raw),
-            app_label=opts.app_label, model=opts.object_name.lower())
-        ct.save()
+def create_many(model_list, using=None):
+    '''
+    Creates the tables, indexes and content types of a batch of models.
 
-    # Commit changes to the database
-    transaction.commit_unless_managed(using=db)
+    Only the models given and the tables their foreign keys point at are
+    looked at. Foreign keys between models of the batch are resolved
+    whatever order they come in; tables that already exist are skipped.
+    '''
+    db = using or DEFAULT_DB_ALIAS
+    connection = connections[db]
+    creation = connection.creation
+    style = no_style()
+    converter = connection.introspection.table_name_converter
 
-    # Send the post_syncdb signal, so individual apps can do whatever they need
-    # to do at this point.
-    emit_post_sync_signal(created_models, 0, False, db)
+    related = set()
+    for model in model_list:
+        related.update(get_related_models(model))
+    existing = get_existing_tables(connection, [
+        converter(model._meta.db_table) for model in set(model_list) | related
+    ])
+    model_list = [
+        model for model in model_list
+        if converter(model._meta.db_table) not in existing
+    ]
+    if not model_list:
+        return []
 
-    # The connection may have been closed by a syncdb handler.
+    # Models with tables are known, references to the others are added
+    # once their table is created
+    seen_models = set(
+        model for model in related
+        if converter(model._meta.db_table) in existing
+    )
+    pending_references = {}
+    created_models = []
     cursor = connection.cursor()
-
-    # Install SQL indicies for all newly created models
-    for app_name, model_list in manifest.items():
+    with transaction.atomic(using=db):
         for model in model_list:
-            if model in created_models:
-                index_sql = connection.creation.sql_indexes_for_model(model, no_style())
-                if index_sql:
-                    try:
-                        for sql in index_sql:
-                            cursor.execute(sql)
-                    except Exception, e:
-                        sys.stderr.write("Failed to install index for %s.%s model: %s\n" % \
-                                            (app_name, model._meta.object_name, e))
-                        transaction.rollback_unless_managed(using=db)
-                    else:
-                        transaction.commit_unless_managed(using=db)
+            sql, references = creation.sql_create_model(model, style, seen_models)
+            seen_models.add(model)
+            created_models.append(model)
+            for refto, refs in references.items():
+                pending_references.setdefault(refto, []).extend(refs)
+                if refto in seen_models:
+                    sql.extend(creation.sql_for_pending_references(
+                        refto, style, pending_references
+                    ))
+            sql.extend(creation.sql_for_pending_references(
+                model, style, pending_references
+            ))
+            for statement in sql:
+                cursor.execute(statement)
 
+        for model in created_models:
+            opts = model._meta
+            ContentType.objects.get_or_create(
+                app_label=opts.app_label, model=opts.object_name.lower(),
+                defaults={'name': smart_unicode(opts.verbose_name_raw)}
+            )
 
+    for model in created_models:
+        index_sql = creation.sql_indexes_for_model(model, style)
+        if not index_sql:
+            continue
+        try:
+            with transaction.atomic(using=db):
+                for statement in index_sql:
+                    cursor.execute(statement)
+        except Exception, e:
+            opts = model._meta
+            sys.stderr.write("Failed to install index for %s.%s model: %s\n" % \
+                                (opts.app_label, opts.object_name, e))
+    return created_models
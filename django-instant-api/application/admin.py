@@ -1,4 +1,12 @@
-from application import models
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+from django.utils.datastructures import SortedDict
+
+from application import migrator, models
+from application.loader import Schema
+from application.schema import watcher
+from application.utils import reset_url_caches
 from django.contrib import admin
 
 class ApplicationAdmin(admin.ModelAdmin):
@@ -12,6 +20,11 @@ class ModelFieldInline(admin.StackedInline):
     model = models.ModelField
     extra = 0
 
+class ModelIndexInline(admin.TabularInline):
+    model = models.ModelIndex
+    extra = 0
+    readonly_fields = ('automatic',)
+
 class ApplicationModelAdmin(admin.ModelAdmin):
     search_fields = ('name','verbose_name')
     ordering = ('app','name')
@@ -19,8 +32,16 @@ class ApplicationModelAdmin(admin.ModelAdmin):
     list_filter = ('app',)
     inlines = [
         ModelFieldInline,
+        ModelIndexInline,
     ]
 
+    def save_related(self, request, form, formsets, change):
+        # Migrate the table once for all the fields changed in the inline
+        with migrator.deferred():
+            super(ApplicationModelAdmin, self).save_related(
+                request, form, formsets, change
+            )
+
 admin.site.register(models.ApplicationModel, ApplicationModelAdmin)
 
 
@@ -33,5 +54,90 @@ class ModelFieldAdmin(admin.ModelAdmin):
 admin.site.register(models.AdminSetting, admin.ModelAdmin)
 admin.site.register(models.ApiSerialiserSetting, admin.ModelAdmin)
 
-for model in models.ApplicationModel.objects.all():
-    admin.site.register(model.as_model(), model.as_admin())
+
+class LazyPatterns(object):
+    '''
+    Stands in for the admin's URL module, materialising the generated model
+    registrations the first time the URL patterns are resolved or reversed
+    '''
+
+    def __init__(self, schema_admin):
+        self.schema_admin = schema_admin
+
+    @property
+    def urlpatterns(self):
+        self.schema_admin.materialise()
+        return self.schema_admin.patterns
+
+
+class SchemaAdmin(object):
+    '''
+    Keeps an admin site's registrations of generated models in step with
+    their definitions.
+
+    Models are only registered with the site, which builds their classes,
+    when the admin is first used or ``warm`` is called. Include ``urls``
+    rather than ``site.urls``, its pattern list is rewritten in place
+    whenever the registrations change.
+    '''
+
+    def __init__(self, site):
+        self.site = site
+        self.registered = {}
+        self.pending = SortedDict()
+        self.materialised = False
+        self.patterns = []
+        self._lock = threading.RLock()
+
+    @property
+    def urls(self):
+        return LazyPatterns(self), self.site.app_name, self.site.name
+
+    def register_model(self, app_model):
+        with self._lock:
+            self.unregister_model(app_model.pk)
+            if self.materialised:
+                self._register(app_model)
+            else:
+                self.pending[app_model.pk] = app_model
+
+    def unregister_model(self, pk):
+        with self._lock:
+            self.pending.pop(pk, None)
+            model_class = self.registered.pop(pk, None)
+            if model_class in self.site._registry:
+                self.site.unregister(model_class)
+
+    def materialise(self):
+        if self.materialised:
+            return
+        with self._lock:
+            if self.materialised:
+                return
+            # Build the pending classes from one snapshot rather than
+            # querying each one's foreign key targets
+            Schema(self.pending.values(), ContentType.objects.all(), False).build()
+            for app_model in self.pending.values():
+                self._register(app_model)
+            self.pending.clear()
+            self.patterns[:] = self.site.get_urls()
+            self.materialised = True
+
+    warm = materialise
+
+    def refresh(self):
+        with self._lock:
+            if self.materialised:
+                self.patterns[:] = self.site.get_urls()
+                reset_url_caches()
+
+    def _register(self, app_model):
+        model_class = app_model.as_model()
+        if model_class in self.site._registry:
+            self.site.unregister(model_class)
+        self.site.register(model_class, app_model.as_admin())
+        self.registered[app_model.pk] = model_class
+
+
+schema_admin = SchemaAdmin(admin.site)
+watcher.attach(schema_admin)
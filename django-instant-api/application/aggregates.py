@@ -0,0 +1,97 @@
+'''
+Aggregates for the generated viewsets.
+
+``<prefix>/aggregate/`` counts the rows matching the list filters, grouped
+by the fields given in ``?group_by=``, and adds the sum, average, minimum
+or maximum of the fields given in ``?sum=``, ``?avg=``, ``?min=`` and
+``?max=``, all in a single ``values().annotate()`` query. At most
+``aggregate_max_groups`` groups are returned, with ``truncated`` set when
+there were more so clients can narrow the filters. Results are cached along with the viewset's other GET responses when its API settings
+give a ``cache_timeout``.
+'''
+from django.db.models import Avg, Count, Max, Min, Sum
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+from application.decorators import collection_action
+
+AGGREGATES = (
+    ('sum', Sum),
+    ('avg', Avg),
+    ('min', Min),
+    ('max', Max),
+)
+
+NUMERIC_TYPES = (
+    'AutoField', 'BigIntegerField', 'DecimalField', 'FloatField',
+    'IntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField',
+    'SmallIntegerField',
+)
+
+
+class AggregateMixin(object):
+    '''
+    Adds an ``aggregate`` collection action over the fields the serialiser
+    exposes
+    '''
+    group_by_query_param = 'group_by'
+    aggregate_max_groups = 1000
+
+    def get_aggregate_fields(self):
+        '''
+        Returns {name: model field} for the fields that can be grouped by
+        and aggregated, those of the serialiser when it lists them
+        '''
+        opts = self.queryset.model._meta
+        names = getattr(getattr(self.serializer_class, 'Meta', None), 'fields', None)
+        fields = dict((field.name, field) for field in opts.fields)
+        if names:
+            fields = dict((name, fields[name]) for name in names if name in fields)
+        return fields
+
+    def get_field_names(self, param, fields, numeric=False):
+        value = self.request.QUERY_PARAMS.get(param, '')
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        for name in names:
+            if name not in fields:
+                raise ParseError('Cannot aggregate on "%s"' % name)
+            if numeric and fields[name].get_internal_type() not in NUMERIC_TYPES:
+                raise ParseError('"%s" is not a number' % name)
+        return names
+
+    def get_count_alias(self):
+        '''
+        Returns the name the row count is given, ``pk__count`` for models
+        with a field called ``count``
+        '''
+        names = [field.name for field in self.queryset.model._meta.fields]
+        return 'pk__count' if 'count' in names else 'count'
+
+    def get_aggregates(self):
+        fields = self.get_aggregate_fields()
+        group_by = self.get_field_names(self.group_by_query_param, fields)
+        aggregates = {self.get_count_alias(): Count('pk')}
+        for param, function in AGGREGATES:
+            numeric = param in ('sum', 'avg')
+            for name in self.get_field_names(param, fields, numeric):
+                aggregates['%s__%s' % (name, param)] = function(name)
+        return group_by, aggregates
+
+    def run_aggregate(self, group_by, aggregates):
+        '''
+        Returns the result rows and whether groups past the limit were left
+        out
+        '''
+        queryset = self.filter_queryset(self.get_queryset())
+        if not group_by:
+            return [queryset.order_by().aggregate(**aggregates)], False
+        # Ordering by anything else would be added to the GROUP BY
+        queryset = queryset.values(*group_by).annotate(**aggregates).order_by(*group_by)
+        results = list(queryset[:self.aggregate_max_groups + 1])
+        return results[:self.aggregate_max_groups], len(results) > self.aggregate_max_groups
+
+    @collection_action(methods=['get'])
+    def aggregate(self, request, *args, **kwargs):
+        group_by, aggregates = self.get_aggregates()
+        results, truncated = self.run_aggregate(group_by, aggregates)
+        return Response({'results': results, 'truncated': truncated})
@@ -0,0 +1,367 @@
+'''
+Benchmarks for schema building and the generated endpoints.
+
+A synthetic schema of apps x models x fields is created, each model after
+the first in an app having a foreign key to the one before it and a nested
+serialiser, and seeded with rows. The results are plain dicts meant to be
+dumped as JSON so runs can be compared.
+'''
+import threading
+import time
+
+from django.contrib import admin
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from application import longpoll, models, registry
+from application.caching import bump_data_version
+from application.loader import Schema
+from application.routers import SchemaRouter
+from application.schema import SchemaWatcher
+
+FIELD_TYPES = (
+    'application_charfield',
+    'application_integerfield',
+    'application_textfield',
+)
+
+SAMPLE_VALUES = {
+    'application_charfield': lambda i: u'Value %s' % i,
+    'application_integerfield': lambda i: i,
+    'application_textfield': lambda i: (u'Text %s ' % i) * 10,
+}
+
+
+def percentile(values, fraction):
+    '''
+    Nearest rank percentile of a list of numbers
+    '''
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(int(round(fraction * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def summarise(timings, queries):
+    return {
+        'samples': len(timings),
+        'p50_ms': percentile(timings, 0.5),
+        'p99_ms': percentile(timings, 0.99),
+        'mean_ms': sum(timings) / len(timings) if timings else None,
+        'queries': max(queries) if queries else None,
+    }
+
+
+class Timer(object):
+    '''
+    Context manager recording elapsed milliseconds and the queries run
+    '''
+
+    def __enter__(self):
+        self.queries = CaptureQueriesContext(connection)
+        self.queries.__enter__()
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.ms = (time.time() - self.start) * 1000
+        self.queries.__exit__(*exc_info)
+        self.query_count = len(self.queries)
+
+
+def create_schema(apps, models_per_app, fields_per_model, prefix='bench'):
+    '''
+    Creates the synthetic schema and returns its ApplicationModels, in
+    dependency order
+    '''
+    app_models = []
+    for a in range(apps):
+        app = models.Application.objects.create(
+            name='%s%s' % (prefix, a), verbose_name='Bench %s' % a
+        )
+        previous = None
+        for m in range(models_per_app):
+            name = '%s%sx%s' % (prefix.capitalize(), a, m)
+            field_names = ['id', 'name']
+            field_names.extend('field%s' % f for f in range(fields_per_model))
+            if previous is not None:
+                field_names.append('parent')
+            app_model = models.ApplicationModel.objects.create(
+                name=name, verbose_name=name, app=app,
+                api_serialiser=models.ApiSerialiserSetting.objects.create(
+                    fields=','.join(field_names), filter_fields='name',
+                    nested=previous is not None
+                )
+            )
+            models.ModelField.objects.create(
+                name='name', verbose_name='Name', model=app_model,
+                field_type='application_charfield'
+            )
+            for f in range(fields_per_model):
+                models.ModelField.objects.create(
+                    name='field%s' % f, verbose_name='Field %s' % f,
+                    model=app_model, field_type=FIELD_TYPES[f % len(FIELD_TYPES)],
+                    null=True, blank=True
+                )
+            if previous is not None:
+                models.ModelField.objects.create(
+                    name='parent', verbose_name='Parent', model=app_model,
+                    field_type=previous.name.lower(), null=True, blank=True
+                )
+            app_models.append(app_model)
+            previous = app_model
+    return app_models
+
+
+def seed_rows(app_models, rows):
+    parents = {}
+    for app_model in app_models:
+        model_class = app_model.as_model()
+        fields = list(app_model.fields.all())
+        objects = []
+        for i in range(rows):
+            values = {'name': u'Row %s' % i}
+            for field in fields:
+                if field.field_type in SAMPLE_VALUES and field.name != 'name':
+                    values[field.name] = SAMPLE_VALUES[field.field_type](i)
+                elif field.name == 'parent':
+                    values['parent_id'] = parents.get(field.field_type)
+            objects.append(model_class(**values))
+        model_class.objects.bulk_create(objects)
+        parents[app_model.name.lower()] = model_class.objects.values_list(
+            'pk', flat=True
+        ).order_by('pk').first()
+
+
+def measure_schema(app_models):
+    '''
+    Times building every class from scratch, in one batch and one model at
+    a time
+    '''
+    results = {}
+    registry.clear()
+    with Timer() as timer:
+        Schema.load().build()
+    results['build'] = {'ms': timer.ms, 'queries': timer.query_count}
+
+    for name in ('as_model', 'as_api_serialiser', 'as_view_set'):
+        registry.clear()
+        timings = []
+        queries = []
+        for app_model in app_models:
+            with Timer() as timer:
+                getattr(app_model, name)()
+            timings.append(timer.ms)
+            queries.append(timer.query_count)
+        results[name] = summarise(timings, queries)
+        results[name]['total_ms'] = sum(timings)
+    return results
+
+
+def measure_serialisers(app_model, repeat=5):
+    '''
+    Times serialising every row of a flat model through DRF's fields and
+    through the compiled serialiser, from instances and from values() rows
+    '''
+    serialiser = app_model.as_api_serialiser()
+    model_class = app_model.as_model()
+    instances = list(model_class.objects.all())
+    rows = list(model_class.objects.values(
+        *[field.name for field in model_class._meta.fields]
+    ))
+    drf = type(serialiser.__name__, (serialiser,), {'compile_fields': False})
+    results = {}
+    for name, serialiser_class, objects in (
+            ('drf', drf, instances),
+            ('compiled', serialiser, instances),
+            ('compiled_values', serialiser, rows)):
+        timings = []
+        for i in range(repeat):
+            with Timer() as timer:
+                serialiser_class(objects, many=True).data
+            timings.append(timer.ms)
+        results[name] = summarise(timings, [])
+        mean = results[name]['mean_ms']
+        results[name]['rows_per_s'] = len(objects) * 1000 / mean if mean else None
+    return results
+
+
+def measure_long_poll(app_model, clients=50, timeout=5):
+    '''
+    Parks clients on the change feed of a model, one thread each, then
+    changes its data and times how long each takes to be answered
+    '''
+    if not longpoll.is_enabled():
+        return {'skipped': 'INSTANT_API_LONG_POLL is off'}
+    model_class = app_model.as_model()
+    view = app_model.as_view_set().as_view({'get': 'changes'})
+    factory = APIRequestFactory()
+    version = view(factory.get('/changes/')).data['version']
+    answered = []
+    waiting = threading.Semaphore(0)
+
+    def client():
+        request = factory.get('/changes/', {'version': version, 'timeout': timeout})
+        waiting.release()
+        response = view(request)
+        answered.append((time.time(), response.data['changed']))
+
+    threads = [threading.Thread(target=client) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        waiting.acquire()
+    # Give the last clients time to start waiting
+    time.sleep(0.05)
+    changed_at = time.time()
+    bump_data_version(model_class)
+    for thread in threads:
+        thread.join()
+    results = summarise([(at - changed_at) * 1000 for at, changed in answered], [])
+    results['woken'] = len([changed for at, changed in answered if changed])
+    return results
+
+
+def measure_write_batching(app_model, clients=8, writes=25, batch_ms=5):
+    '''
+    Creates rows of a flat model from concurrent clients, one thread each,
+    committing every write on its own and then in batches, and reports the
+    writes per second of both
+    '''
+    if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+        # Every thread would get an empty in-memory database of its own
+        return {'skipped': 'needs a database shared between threads'}
+    viewset = app_model.as_view_set()
+    fields = [
+        field for field in app_model.fields.all()
+        if field.field_type in SAMPLE_VALUES
+    ]
+    factory = APIRequestFactory()
+    results = {}
+    for name, batch_rows in (('unbatched', None), ('batched', clients)):
+        view = type(viewset.__name__, (viewset,), {
+            'write_batch_rows': batch_rows, 'write_batch_ms': batch_ms,
+        }).as_view({'post': 'create'})
+        timings = []
+        failures = []
+
+        def client(offset):
+            for i in range(offset, offset + writes):
+                row = dict(
+                    (field.name, SAMPLE_VALUES[field.field_type](i))
+                    for field in fields
+                )
+                request = factory.post('/', row, format='json')
+                start = time.time()
+                response = view(request)
+                timings.append((time.time() - start) * 1000)
+                if response.status_code != 201:
+                    failures.append(response.status_code)
+            connection.close()
+
+        threads = [
+            threading.Thread(target=client, args=(c * writes,))
+            for c in range(clients)
+        ]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+        results[name] = summarise(timings, [])
+        results[name]['writes_per_s'] = len(timings) / elapsed
+        results[name]['failures'] = len(failures)
+    return results
+
+
+def measure_startup():
+    '''
+    Times what a new worker does before serving: routing every model and
+    registering it with an admin site, which builds nothing until first
+    used, and then warming both up front
+    '''
+    # Importing the admin module attaches the site to the schema watcher,
+    # which reads the database
+    from application.admin import SchemaAdmin
+    registry.clear()
+    watcher = SchemaWatcher()
+    router = SchemaRouter()
+    site = SchemaAdmin(admin.AdminSite(name='benchmark'))
+    with Timer() as lazy:
+        watcher.attach(router)
+        watcher.attach(site)
+    with Timer() as warm:
+        watcher.warm()
+    return {
+        'lazy': {'ms': lazy.ms, 'queries': lazy.query_count},
+        'warm': {'ms': warm.ms, 'queries': warm.query_count},
+        'urls': len(router.urls) + len(site.patterns),
+    }
+
+
+def measure_endpoints(app_models, requests, client=None):
+    '''
+    Times the list, detail and filtered list endpoints of every model
+    through the test client
+    '''
+    client = client or Client()
+    results = {}
+    paths = {'list': [], 'detail': [], 'filter': []}
+    for app_model in app_models:
+        prefix = '/api/%s/' % app_model.get_endpoint_name()
+        pk = app_model.as_model().objects.values_list(
+            'pk', flat=True
+        ).order_by('pk').first()
+        paths['list'].append(prefix)
+        paths['detail'].append('%s%s/' % (prefix, pk))
+        paths['filter'].append('%s?name=Row+1' % prefix)
+
+    for kind, kind_paths in paths.items():
+        # Warm up so classes are built before anything is timed
+        for path in kind_paths:
+            client.get(path, HTTP_ACCEPT='application/json')
+        timings = []
+        queries = []
+        for i in range(requests):
+            for path in kind_paths:
+                with Timer() as timer:
+                    response = client.get(path, HTTP_ACCEPT='application/json')
+                if response.status_code != 200:
+                    raise AssertionError('GET %s returned %s' % (
+                        path, response.status_code
+                    ))
+                timings.append(timer.ms)
+                queries.append(timer.query_count)
+        results[kind] = summarise(timings, queries)
+    return results
+
+
+def run(apps=2, models_per_app=5, fields_per_model=5, rows=100, requests=20):
+    '''
+    Runs every benchmark against the current database and returns the
+    results
+    '''
+    with Timer() as timer:
+        app_models = create_schema(apps, models_per_app, fields_per_model)
+        seed_rows(app_models, rows)
+    return {
+        'config': {
+            'apps': apps,
+            'models_per_app': models_per_app,
+            'fields_per_model': fields_per_model,
+            'rows': rows,
+            'requests': requests,
+            'database': connection.vendor,
+        },
+        'setup': {'ms': timer.ms, 'queries': timer.query_count},
+        'schema': measure_schema(app_models),
+        'serialisers': measure_serialisers(app_models[0]),
+        'long_poll': measure_long_poll(app_models[0]),
+        'write_batching': measure_write_batching(app_models[0]),
+        'startup': measure_startup(),
+        'endpoints': measure_endpoints(app_models, requests),
+    }
@@ -0,0 +1,190 @@
+'''
+Bulk create, update and delete for the generated viewsets.
+
+Rows are sent to ``<prefix>/bulk/`` as a JSON array or as newline delimited
+JSON, validated one by one through the viewset's serialiser and written a
+chunk at a time, each chunk in its own transaction. Invalid rows are left
+out and reported by their position in the request. A chunk the database
+refuses, say over a unique value repeated within it, is rolled back and
+its rows reported as failed, while the chunks before it stay committed;
+the response is then a 400 giving the rows written and those that failed.
+'''
+import json
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.response import Response
+
+from application import changelog
+from application.caching import bump_data_version, deferred_invalidation
+from application.decorators import collection_action
+
+
+class NDJSONParser(BaseParser):
+    '''
+    Parses newline delimited JSON into a list, one item per line
+    '''
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        rows = []
+        for number, line in enumerate(stream, 1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError('NDJSON parse error on line %s - %s' % (number, exc))
+        return rows
+
+
+def chunked(rows, size):
+    for offset in range(0, len(rows), size):
+        yield offset, rows[offset:offset + size]
+
+
+class BulkMixin(object):
+    '''
+    Adds a ``bulk`` collection action: POST creates, PUT and PATCH update
+    rows identified by their primary key, DELETE removes rows given as
+    primary keys or objects with one
+    '''
+    bulk_chunk_size = 500
+
+    @collection_action(methods=['post', 'put', 'patch', 'delete'])
+    def bulk(self, request, *args, **kwargs):
+        rows = request.DATA
+        if not isinstance(rows, list):
+            raise ParseError('Expected a list of rows')
+        if request.method == 'POST':
+            result = self.bulk_create(rows)
+        elif request.method == 'DELETE':
+            result = self.bulk_destroy(rows)
+        else:
+            result = self.bulk_update(rows, partial=request.method == 'PATCH')
+        bump_data_version(self.queryset.model)
+        rolled_back = result.pop('rolled_back')
+        result['errors'].sort(key=lambda error: error['row'])
+
+        if rolled_back:
+            result_status = status.HTTP_400_BAD_REQUEST
+        elif not result['errors']:
+            result_status = status.HTTP_200_OK
+            if request.method == 'POST':
+                result_status = status.HTTP_201_CREATED
+        elif len(result['errors']) == len(rows):
+            result_status = status.HTTP_400_BAD_REQUEST
+        else:
+            result_status = status.HTTP_200_OK
+        return Response(result, status=result_status)
+
+    def validate_row(self, offset, row, errors, instance=None, partial=False):
+        serializer = self.get_serializer(instance, data=row, partial=partial)
+        if serializer.is_valid():
+            return serializer.object
+        errors.append({'row': offset, 'errors': serializer.errors})
+
+    def write_chunk(self, numbered, write, errors):
+        '''
+        Hands the objects of a chunk's (position, object) pairs to ``write``
+        in one transaction and returns the count it returns, or None if the
+        database refused them
+        '''
+        try:
+            # Data versions move on once the chunk has committed
+            with deferred_invalidation(), transaction.atomic(), changelog.deferred():
+                return write([obj for number, obj in numbered])
+        except DatabaseError as exc:
+            for number, obj in numbered:
+                errors.append({'row': number, 'errors': unicode(exc)})
+
+    def get_row_pk(self, row):
+        if isinstance(row, dict):
+            return row.get(self.queryset.model._meta.pk.name)
+        return row
+
+    def bulk_create(self, rows):
+        model_class = self.queryset.model
+
+        def write(objects):
+            if changelog.is_logged(model_class):
+                # bulk_create() leaves the keys unset, the log needs them
+                for obj in objects:
+                    obj.save(force_insert=True)
+            else:
+                model_class.objects.bulk_create(objects)
+            return len(objects)
+        created = rolled_back = 0
+        errors = []
+        for offset, chunk in chunked(rows, self.bulk_chunk_size):
+            objects = []
+            for i, row in enumerate(chunk):
+                obj = self.validate_row(offset + i, row, errors)
+                if obj is not None:
+                    objects.append((offset + i, obj))
+            written = self.write_chunk(objects, write, errors)
+            if written is None:
+                rolled_back += 1
+            else:
+                created += written
+        return {'created': created, 'errors': errors, 'rolled_back': rolled_back}
+
+    def bulk_update(self, rows, partial=False):
+        model_class = self.queryset.model
+
+        def write(objects):
+            for obj in objects:
+                obj.save(force_update=True)
+            return len(objects)
+        updated = rolled_back = 0
+        errors = []
+        for offset, chunk in chunked(rows, self.bulk_chunk_size):
+            instances = model_class.objects.in_bulk(
+                [pk for pk in map(self.get_row_pk, chunk) if pk is not None]
+            )
+            objects = []
+            for i, row in enumerate(chunk):
+                instance = instances.get(self.get_row_pk(row))
+                if instance is None:
+                    errors.append({'row': offset + i, 'errors': 'Not found'})
+                    continue
+                obj = self.validate_row(offset + i, row, errors, instance, partial)
+                if obj is not None:
+                    objects.append((offset + i, obj))
+            written = self.write_chunk(objects, write, errors)
+            if written is None:
+                rolled_back += 1
+            else:
+                updated += written
+        return {'updated': updated, 'errors': errors, 'rolled_back': rolled_back}
+
+    def bulk_destroy(self, rows):
+        model_class = self.queryset.model
+
+        def write(pks):
+            queryset = model_class.objects.filter(pk__in=pks)
+            count = queryset.count()
+            queryset.delete()
+            return count
+        deleted = rolled_back = 0
+        errors = []
+        for offset, chunk in chunked(rows, self.bulk_chunk_size):
+            pks = []
+            for i, row in enumerate(chunk):
+                pk = self.get_row_pk(row)
+                if pk is None:
+                    errors.append({'row': offset + i, 'errors': 'Missing primary key'})
+                else:
+                    pks.append((offset + i, pk))
+            written = self.write_chunk(pks, write, errors)
+            if written is None:
+                rolled_back += 1
+            else:
+                deleted += written
+        return {'deleted': deleted, 'errors': errors, 'rolled_back': rolled_back}
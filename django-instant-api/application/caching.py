@@ -0,0 +1,257 @@
+'''
+Response caching for the generated viewsets.
+
+Each generated model has a data version kept in Django's cache. Saving or
+deleting any of its rows moves the version on, which orphans every cached
+response built from the old one. Cached responses carry an ETag and a
+Last-Modified date so clients can revalidate with a conditional GET. The
+versions of the models a response may nest are part of its key, so writes
+to those orphan it as well.
+'''
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.db.models.signals import post_save, post_delete
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from application import registry
+
+
+def get_response_cache():
+    return get_cache(getattr(settings, 'INSTANT_API_CACHE', 'default'))
+
+
+def _version_key(app_label, model_name):
+    return 'instant_api:data:%s.%s' % (app_label, model_name)
+
+
+def get_data_version(model_class):
+    '''
+    Returns the data version of a generated model, which doubles as the
+    time its rows last changed
+    '''
+    app_label, model_name = registry.get_key(model_class)
+    key = _version_key(app_label, model_name)
+    cache = get_response_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key)
+    return version
+
+
+# Notified whenever this process moves a data version on
+data_changed = threading.Condition()
+
+
+def bump_data_version(model_class):
+    key = registry.get_key(model_class)
+    if key is not None:
+        get_response_cache().set(_version_key(*key), time.time(), None)
+        with data_changed:
+            data_changed.notify_all()
+
+
+_local = threading.local()
+
+
+@contextmanager
+def deferred_invalidation():
+    '''
+    Holds back the data version bumps of the writes in the block to its
+    end, for blocks wrapping a transaction so nothing is cached or woken
+    before the writes are visible
+    '''
+    pending = getattr(_local, 'invalidated', None)
+    if pending is not None:
+        yield
+        return
+    pending = _local.invalidated = []
+    try:
+        yield
+    finally:
+        _local.invalidated = None
+        for model_class in pending:
+            bump_data_version(model_class)
+
+
+def invalidate(sender, **kwargs):
+    pending = getattr(_local, 'invalidated', None)
+    if pending is None:
+        bump_data_version(sender)
+    elif sender not in pending:
+        pending.append(sender)
+
+post_save.connect(invalidate)
+post_delete.connect(invalidate)
+
+
+class DeferredInvalidationAdminMixin(object):
+    '''
+    Moves the data versions of an admin's writes on once its view, and the
+    transaction Django wraps it in, has finished
+    '''
+
+    def add_view(self, *args, **kwargs):
+        with deferred_invalidation():
+            return super(DeferredInvalidationAdminMixin, self).add_view(*args, **kwargs)
+
+    def change_view(self, *args, **kwargs):
+        with deferred_invalidation():
+            return super(DeferredInvalidationAdminMixin, self).change_view(*args, **kwargs)
+
+    def delete_view(self, *args, **kwargs):
+        with deferred_invalidation():
+            return super(DeferredInvalidationAdminMixin, self).delete_view(*args, **kwargs)
+
+    def changelist_view(self, *args, **kwargs):
+        # Saves list_editable rows and runs actions such as delete_selected
+        with deferred_invalidation():
+            return super(DeferredInvalidationAdminMixin, self).changelist_view(*args, **kwargs)
+
+
+def get_related_models(model_class):
+    '''
+    Returns the generated models a model reaches through its foreign keys,
+    whose rows nested serialisers may include in its responses
+    '''
+    def find():
+        related = []
+        pending = [model_class]
+        while pending:
+            for field in pending.pop()._meta.fields:
+                to = getattr(getattr(field, 'rel', None), 'to', None)
+                if (registry.is_dynamic(to) and to is not model_class and
+                        to not in related):
+                    related.append(to)
+                    pending.append(to)
+        return related
+    key = registry.get_key(model_class)
+    return registry.memoise(key[0], key[1], 'related_models', find)
+
+
+def get_response_version(model_class):
+    '''
+    Returns the latest data version among a model and the models its
+    responses may nest
+    '''
+    return max(
+        get_data_version(related)
+        for related in [model_class] + get_related_models(model_class)
+    )
+
+
+def get_response_key(model_class, request, version):
+    app_label, model_name = registry.get_key(model_class)
+    user = getattr(request, 'user', None)
+    key = '%s:%.6f:%s:%s:%s' % (
+        registry.get_version(app_label, model_name),
+        version,
+        request.get_full_path(),
+        getattr(request, 'accepted_media_type', None) or request.META.get('HTTP_ACCEPT', ''),
+        user.pk if user is not None and user.is_authenticated() else '',
+    )
+    return 'instant_api:response:%s.%s:%s' % (
+        app_label, model_name, hashlib.md5(key.encode('utf-8')).hexdigest()
+    )
+
+
+class CachedResponse(Exception):
+    '''
+    Raised once a request has passed its checks and its response is cached
+    '''
+
+    def __init__(self, entry):
+        self.entry = entry
+
+
+class ResponseCacheMixin(object):
+    '''
+    Caches a viewset's successful GET responses for ``cache_timeout``
+    seconds, per user, and answers conditional requests with 304 Not
+    Modified.
+
+    The cache is looked up once authentication, permissions, throttling
+    and content negotiation have run, so a cached response is only ever
+    served to a request that would have been allowed to build it.
+    '''
+    cache_timeout = None
+    uncached_actions = ()
+
+    def is_cached(self, request):
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        return (self.cache_timeout and request.method in ('GET', 'HEAD') and
+                action not in self.uncached_actions)
+
+    def initial(self, request, *args, **kwargs):
+        super(ResponseCacheMixin, self).initial(request, *args, **kwargs)
+        self.cache_key = None
+        if not self.is_cached(request):
+            return
+        self.cache_version = get_response_version(self.queryset.model)
+        self.cache_key = get_response_key(
+            self.queryset.model, request, self.cache_version
+        )
+        entry = get_response_cache().get(self.cache_key)
+        if entry is not None:
+            raise CachedResponse(entry)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CachedResponse):
+            return self.get_cached_response(exc.entry)
+        return super(ResponseCacheMixin, self).handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(ResponseCacheMixin, self).finalize_response(
+            request, response, *args, **kwargs
+        )
+        # Streamed responses aren't rendered and can't be cached
+        if (getattr(self, 'cache_key', None) is None or response.status_code != 200 or
+                not hasattr(response, 'render') or getattr(response, 'exception', False)):
+            return response
+        response.render()
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': quote_etag(hashlib.md5(response.content).hexdigest()),
+            'last_modified': int(self.cache_version),
+        }
+        get_response_cache().set(self.cache_key, entry, self.cache_timeout)
+        return self.get_cached_response(entry)
+
+    def get_cached_response(self, entry):
+        request = self.request
+        # HTTP dates count whole seconds, so a date is only given out once
+        # its second is over and no later write can share it
+        last_modified = entry['last_modified']
+        if time.time() < last_modified + 1:
+            last_modified = None
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        if if_none_match is not None:
+            not_modified = entry['etag'] in [
+                etag.strip() for etag in if_none_match.split(',')
+            ]
+        else:
+            not_modified = (last_modified is not None and if_modified_since is not None and
+                            if_modified_since >= last_modified)
+        if not_modified:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                entry['content'], content_type=entry['content_type']
+            )
+        response['ETag'] = entry['etag']
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+        return response
@@ -0,0 +1,194 @@
+'''
+Change log and incremental sync for generated models.
+
+Models whose API settings turn the change log on record the latest change
+to each of their rows in ChangeLog, keyed by an increasing id which doubles
+as the sync token. ``<prefix>/sync/?since=<token>`` returns the rows saved
+and the keys of the rows deleted after that token, so a client keeping a
+copy of the collection only downloads what changed. Asking without a token
+returns the current one, to be taken before downloading the collection.
+
+The sync is only exact on SQLite, where writes are serialised so entries
+commit in id order. On PostgreSQL or MySQL concurrent transactions can
+commit their ids out of order: a client syncing while entry N+1 has
+committed and N hasn't yet moves its token past N and never sees that
+change. Clients there should do a full download from time to time.
+'''
+import threading
+from contextlib import contextmanager
+
+from django.db import models, router, transaction
+from django.db.models import get_model, Max
+from django.db.models.signals import post_save, post_delete
+from django.http import Http404
+from django.utils.datastructures import SortedDict
+from django.utils.encoding import force_text
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+from application import registry, replicas
+from application.decorators import collection_action
+
+_local = threading.local()
+
+# Keeps the IN clauses below SQLite's parameter limit
+CHUNK_SIZE = 500
+
+
+def get_log_model():
+    return get_model('application', 'ChangeLog')
+
+
+def is_logged(model_class):
+    '''
+    Returns True if a generated model keeps a change log
+    '''
+    key = registry.get_key(model_class)
+    if key is None:
+        return False
+
+    def check():
+        ApplicationModel = get_model('application', 'ApplicationModel')
+        return ApplicationModel.objects.filter(
+            app__name=key[0], name__iexact=key[1], api_serialiser__change_log=True
+        ).exists()
+    return registry.memoise(key[0], key[1], 'change_log', check)
+
+
+def log_changes(model_class, changes):
+    '''
+    Records (pk, deleted) changes to a model's rows, replacing whatever was
+    logged for them before so the log holds one entry per row
+    '''
+    ChangeLog = get_log_model()
+    app_label, model_name = registry.get_key(model_class)
+    changes = SortedDict((force_text(pk), deleted) for pk, deleted in changes)
+    pks = list(changes)
+    entries = ChangeLog.objects.filter(app_label=app_label, model_name=model_name)
+    with transaction.atomic():
+        for offset in range(0, len(pks), CHUNK_SIZE):
+            entries.filter(object_pk__in=pks[offset:offset + CHUNK_SIZE]).delete()
+        ChangeLog.objects.bulk_create([
+            ChangeLog(app_label=app_label, model_name=model_name,
+                      object_pk=pk, deleted=deleted)
+            for pk, deleted in changes.items()
+        ])
+
+
+@contextmanager
+def deferred():
+    '''
+    Collects the changes logged in the block and writes them in one go at
+    its end, for bulk operations
+    '''
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        yield
+        return
+    pending = _local.pending = SortedDict()
+    try:
+        yield
+    finally:
+        _local.pending = None
+    for model_class, changes in pending.items():
+        log_changes(model_class, changes.items())
+
+
+def record_change(model_class, pk, deleted):
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.setdefault(model_class, SortedDict())[pk] = deleted
+    else:
+        log_changes(model_class, [(pk, deleted)])
+
+
+def log_save(sender, instance, **kwargs):
+    if registry.is_dynamic(sender) and is_logged(sender):
+        record_change(sender, instance.pk, False)
+
+
+def log_delete(sender, instance, **kwargs):
+    if registry.is_dynamic(sender) and is_logged(sender):
+        record_change(sender, instance.pk, True)
+
+post_save.connect(log_save)
+post_delete.connect(log_delete)
+
+
+class ChangeLogModel(models.Model):
+    '''
+    Base of the generated models keeping a change log, saving each row in
+    the same transaction as the log entry post_save writes for it
+    '''
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super(ChangeLogModel, self).save(*args, **kwargs)
+
+
+def get_token(model_class):
+    app_label, model_name = registry.get_key(model_class)
+    token = get_log_model().objects.filter(
+        app_label=app_label, model_name=model_name
+    ).aggregate(token=Max('id'))['token']
+    return token or 0
+
+
+def get_changes(model_class, since, limit):
+    '''
+    Returns up to ``limit`` log entries of a model after the token
+    ``since`` as (id, pk, deleted), oldest first
+    '''
+    app_label, model_name = registry.get_key(model_class)
+    return list(get_log_model().objects.filter(
+        app_label=app_label, model_name=model_name, id__gt=since
+    ).order_by('id').values_list('id', 'object_pk', 'deleted')[:limit])
+
+
+class ChangeLogMixin(object):
+    '''
+    Adds a ``sync`` collection action returning the rows changed since a
+    token, when the model keeps a change log
+    '''
+    change_log = False
+    sync_page_size = 500
+
+    @collection_action(methods=['get'])
+    def sync(self, request, *args, **kwargs):
+        if not self.change_log:
+            raise Http404('This model does not keep a change log')
+        model_class = self.queryset.model
+        since = request.QUERY_PARAMS.get('since')
+        if since is None:
+            return Response({'token': get_token(model_class)})
+        try:
+            since = int(since)
+        except ValueError:
+            raise ParseError('Invalid token')
+
+        # The log is on the primary, read the rows from there too so none
+        # are missing when a replica lags behind it
+        with replicas.primary():
+            entries = get_changes(model_class, since, self.sync_page_size + 1)
+            more = len(entries) > self.sync_page_size
+            entries = entries[:self.sync_page_size]
+            saved = [pk for id, pk, deleted in entries if not deleted]
+            rows = []
+            for offset in range(0, len(saved), CHUNK_SIZE):
+                queryset = self.get_queryset().filter(
+                    pk__in=saved[offset:offset + CHUNK_SIZE]
+                ).order_by('pk')
+                rows.extend(self.get_serializer(queryset, many=True).data)
+        return Response({
+            'token': entries[-1][0] if entries else since,
+            'more': more,
+            'changed': rows,
+            'deleted': [
+                model_class._meta.pk.to_python(pk)
+                for id, pk, deleted in entries if deleted
+            ],
+        })
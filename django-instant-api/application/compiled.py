@@ -0,0 +1,117 @@
+'''
+Compiled serialisation for flat generated models.
+
+The fields of a generated serialiser that read plain columns are compiled
+once per serialiser class into (key, field name, attribute, converter)
+entries, the converter being None for values DRF outputs as they are. A
+serialiser whose output fields all compiled turns rows, model instances or
+``values()`` dicts alike, into output in a single loop instead of resolving
+and calling each DRF field per object. Nested and hyperlinked serialisers
+fall back to DRF.
+'''
+from rest_framework import relations, serializers
+from rest_framework.serializers import SortedDictWithMetadata
+
+from application.fieldsets import get_model_field, is_value_field
+from application.instrumentation import timed
+
+# Serialiser fields whose to_native returns column values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+def compile_field(serializer, name, field):
+    '''
+    Returns the compiled entry for a serialiser field, or None if it has to
+    go through DRF
+    '''
+    opts = serializer.opts.model._meta
+    if getattr(field, 'write_only', False) or hasattr(serializer, 'transform_%s' % name):
+        return None
+    if not is_value_field(opts, field, name):
+        return None
+    model_field = get_model_field(opts, field, name)
+    convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_native
+    return (serializer.get_field_key(name), model_field.name, model_field.attname, convert)
+
+
+def get_compiled_fields(serializer_class):
+    '''
+    Returns {field name: compiled entry or None} for every field of a
+    serialiser class, compiled on first use
+    '''
+    compiled = serializer_class.__dict__.get('_compiled_fields')
+    if compiled is None:
+        serializer = serializer_class()
+        compiled = dict(
+            (name, compile_field(serializer, name, field))
+            for name, field in serializer.fields.items()
+        )
+        serializer_class._compiled_fields = compiled
+    return compiled
+
+
+def serialise_row(plan, row):
+    if isinstance(row, dict):
+        values = [row[name] for key, name, attname, convert in plan]
+    else:
+        values = [getattr(row, attname) for key, name, attname, convert in plan]
+    ret = SortedDictWithMetadata()
+    for (key, name, attname, convert), value in zip(plan, values):
+        if convert is not None and value is not None:
+            value = convert(value)
+        ret[key] = value
+    return ret
+
+
+def serialise_rows(plan, rows):
+    return [serialise_row(plan, row) for row in rows]
+
+
+class CompiledSerializerMixin(object):
+    '''
+    Serialises through the compiled fields when every output field has
+    one, unless ``compile_fields`` is turned off
+    '''
+    compile_fields = True
+
+    def get_compiled_plan(self):
+        '''
+        Returns the compiled entries of the output fields in order, or None
+        '''
+        if not hasattr(self, '_compiled_plan'):
+            plan = None
+            if self.compile_fields:
+                compiled = get_compiled_fields(type(self))
+                plan = tuple(compiled.get(name) for name in self.fields)
+                if None in plan:
+                    plan = None
+            self._compiled_plan = plan
+        return self._compiled_plan
+
+    def to_native(self, obj):
+        plan = self.get_compiled_plan() if obj is not None else None
+        if plan is not None:
+            return serialise_row(plan, obj)
+        if isinstance(obj, dict):
+            ret = self._dict_class()
+            for name, field in self.fields.items():
+                ret[self.get_field_key(name)] = field.to_native(obj[field.source or name])
+            return ret
+        return super(CompiledSerializerMixin, self).to_native(obj)
+
+    @property
+    def data(self):
+        if self._data is None and self.many and self.object is not None:
+            plan = self.get_compiled_plan()
+            if plan is not None:
+                with timed('serialise'):
+                    self._data = serialise_rows(plan, self.object)
+        return super(CompiledSerializerMixin, self).data
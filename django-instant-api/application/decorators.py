@@ -0,0 +1,9 @@
+def collection_action(methods=('get',)):
+    '''
+    Marks a viewset method to be routed at ``<prefix>/<method name>/``,
+    acting on the collection rather than a single object
+    '''
+    def decorator(func):
+        func.collection_methods = methods
+        return func
+    return decorator
@@ -0,0 +1,112 @@
+'''
+Streaming export for the generated viewsets.
+
+Rows are read in primary key order a chunk at a time, each chunk starting
+after the last key of the previous one, and written out as they are read,
+so memory use doesn't grow with the size of the table.
+'''
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.fields import FieldDoesNotExist
+from django.http import StreamingHttpResponse
+from django.utils.encoding import force_bytes
+from rest_framework.exceptions import ParseError
+
+from application.decorators import collection_action
+
+
+def iter_rows(queryset, columns, chunk_size=1000):
+    '''
+    Yields value tuples for ``columns`` from every row of the queryset,
+    fetching ``chunk_size`` rows per query
+    '''
+    pk_name = queryset.model._meta.pk.attname
+    columns = list(columns)
+    width = len(columns)
+    if pk_name not in columns:
+        columns.append(pk_name)
+    pk_index = columns.index(pk_name)
+    queryset = queryset.order_by('pk').values_list(*columns)
+    last_pk = None
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        for row in rows:
+            # Leave out the pk when it was only fetched to page by
+            yield row[:width]
+        last_pk = rows[-1][pk_index]
+
+
+class Echo(object):
+    '''
+    File-like object handing back what is written to it, so csv.writer can
+    produce lines for a streaming response
+    '''
+
+    def write(self, value):
+        return value
+
+
+def to_ndjson(names, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def to_csv(names, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow([
+            '' if value is None else force_bytes(value) for value in row
+        ])
+
+
+class ExportMixin(object):
+    '''
+    Adds an ``export`` collection action streaming every row matching the
+    list filters as NDJSON, or as CSV with ``?output=csv``
+    '''
+    export_chunk_size = 1000
+    export_formats = {
+        'ndjson': (to_ndjson, 'application/x-ndjson'),
+        'csv': (to_csv, 'text/csv'),
+    }
+
+    def get_export_fields(self):
+        '''
+        Returns the model fields to export, those of the serialiser when it
+        lists them and every field otherwise
+        '''
+        opts = self.queryset.model._meta
+        names = getattr(getattr(self.serializer_class, 'Meta', None), 'fields', None)
+        if not names:
+            return list(opts.fields)
+        fields = []
+        for name in names:
+            try:
+                fields.append(opts.get_field(name))
+            except FieldDoesNotExist:
+                continue
+        return fields
+
+    @collection_action(methods=['get'])
+    def export(self, request, *args, **kwargs):
+        output = request.QUERY_PARAMS.get('output', 'ndjson')
+        if output not in self.export_formats:
+            raise ParseError('Unknown export format "%s"' % output)
+        writer, content_type = self.export_formats[output]
+
+        names = [field.attname for field in self.get_export_fields()]
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = iter_rows(queryset, names, self.export_chunk_size)
+        response = StreamingHttpResponse(writer(names, rows), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (
+            self.queryset.model._meta.db_table, output
+        )
+        return response
@@ -0,0 +1,172 @@
+'''
+Sparse fieldsets for the generated viewsets.
+
+Clients choose which of the serialiser's fields to get back with
+``?fields=a,b``, or leave some out with ``?exclude=c``. The choice narrows
+both the output and the SQL: only the chosen columns are loaded, and a list
+whose fields are all plain columns is read with ``values()`` and serialised
+straight from the row dicts by the compiled serialiser, without building
+model instances.
+'''
+from django.utils.datastructures import SortedDict
+from rest_framework import exceptions, relations, serializers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Serialiser fields that need the model instance rather than its column value
+INSTANCE_FIELDS = (
+    serializers.BaseSerializer,
+    serializers.FileField,
+    serializers.ModelField,
+    serializers.SerializerMethodField,
+    relations.HyperlinkedIdentityField,
+)
+
+
+def parse_field_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def get_model_field(opts, field, name):
+    '''
+    Returns the concrete model field a serialiser field reads, or None
+    '''
+    source = field.source or name
+    if '.' in source or source == '*':
+        return None
+    try:
+        model_field, model, direct, m2m = opts.get_field_by_name(source)
+    except Exception:
+        return None
+    if not direct or m2m:
+        return None
+    return model_field
+
+
+def is_value_field(opts, field, name):
+    '''
+    Returns True if a serialiser field can be filled from a ``values()`` row
+    '''
+    if isinstance(field, INSTANCE_FIELDS):
+        return False
+    if isinstance(field, relations.RelatedField):
+        if type(field) is not relations.PrimaryKeyRelatedField or field.many:
+            return False
+    return get_model_field(opts, field, name) is not None
+
+
+class SparseSerializerMixin(object):
+    '''
+    Narrows a serialiser to the fields its view was asked for
+    '''
+
+    def get_fields(self):
+        fields = super(SparseSerializerMixin, self).get_fields()
+        view = self.context.get('view')
+        names = view.get_requested_fields() if hasattr(view, 'get_requested_fields') else None
+        if names is None:
+            return fields
+        return SortedDict((name, fields[name]) for name in fields if name in names)
+
+
+class SparseFieldsMixin(object):
+    '''
+    Reads ``?fields=`` and ``?exclude=`` on safe requests and narrows the
+    queryset to the columns they need
+    '''
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+    serialise_values = True
+
+    def get_serialiser_fields(self):
+        '''
+        Returns every field of the serialiser class, whatever was asked for
+        '''
+        if getattr(self, '_serialiser_fields', None) is None:
+            self._serialiser_fields = self.get_serializer_class()().fields
+        return self._serialiser_fields
+
+    def get_requested_fields(self):
+        '''
+        Returns the names of the serialiser fields to output, or None for
+        all of them
+        '''
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+        include = request.QUERY_PARAMS.get(self.fields_query_param)
+        exclude = request.QUERY_PARAMS.get(self.exclude_query_param)
+        names = None
+        if include or exclude:
+            allowed = list(self.get_serialiser_fields())
+            include = parse_field_names(include or '') or allowed
+            exclude = parse_field_names(exclude or '')
+            for name in include + exclude:
+                if name not in allowed:
+                    raise exceptions.ParseError('Unknown field "%s"' % name)
+            names = [name for name in allowed if name in include and name not in exclude]
+        self._requested_fields = names
+        return names
+
+    def get_output_fields(self):
+        fields = self.get_serialiser_fields()
+        names = self.get_requested_fields()
+        if names is None:
+            return fields
+        return SortedDict((name, fields[name]) for name in names)
+
+    def get_required_columns(self, opts):
+        '''
+        Returns the model fields to load besides those serialised: the
+        primary key and those the list is ordered by
+        '''
+        names = [opts.pk.name]
+        ordering = self.queryset.query.order_by or opts.ordering
+        for name in ordering:
+            name = name.lstrip('-')
+            if name not in ('?', 'pk') and '__' not in name:
+                names.append(name)
+        return names
+
+    def can_serialise_values(self, opts, fields):
+        if not self.serialise_values or getattr(self, 'action', None) != 'list':
+            return False
+        return all(is_value_field(opts, field, name) for name, field in fields.items())
+
+    def get_queryset(self):
+        queryset = super(SparseFieldsMixin, self).get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        opts = queryset.model._meta
+        fields = self.get_output_fields()
+        if self.can_serialise_values(opts, fields):
+            names = [
+                get_model_field(opts, field, name).name
+                for name, field in fields.items()
+            ]
+            for name in self.get_required_columns(opts):
+                if name not in names:
+                    names.append(name)
+            return queryset.values(*names)
+
+        if self.get_requested_fields() is None:
+            return queryset
+        names = set(self.get_required_columns(opts))
+        for name, field in fields.items():
+            if isinstance(field, relations.HyperlinkedIdentityField):
+                continue
+            model_field = get_model_field(opts, field, name)
+            if model_field is None:
+                # Reads something other than a column, keep them all
+                return queryset
+            names.add(model_field.name)
+        select_related = queryset.query.select_related
+        if isinstance(select_related, dict):
+            # Relations can't be followed through deferred keys
+            queryset.query.select_related = dict(
+                (name, paths) for name, paths in select_related.items()
+                if name in names
+            ) or False
+        return queryset.only(*names)
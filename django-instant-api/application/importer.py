@@ -0,0 +1,276 @@
+'''
+Streaming bulk import for generated models.
+
+Rows are read from a CSV or NDJSON stream a chunk at a time, validated
+against the generated model class and written with ``bulk_create``, each
+chunk in its own transaction. Only the current chunk and the first few
+errors are held in memory, whatever the size of the file.
+'''
+import csv
+import json
+
+from django import forms
+from django.conf.urls import patterns, url
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import DatabaseError, transaction
+from django.template.response import TemplateResponse
+from import_export.admin import ExportMixin
+
+from application import changelog, replicas
+from application.caching import bump_data_version
+
+
+def read_csv(stream, encoding='utf-8'):
+    '''
+    Yields a dict per CSV line, keyed by the names on the header line
+    '''
+    reader = csv.reader(stream)
+    try:
+        header = [name.decode(encoding).strip() for name in next(reader)]
+    except StopIteration:
+        return
+    for values in reader:
+        if values:
+            yield dict(zip(header, [value.decode(encoding) for value in values]))
+
+
+def read_ndjson(stream, encoding='utf-8'):
+    '''
+    Yields the object on each non-blank line
+    '''
+    for number, line in enumerate(stream, 1):
+        line = line.decode(encoding).strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield ValueError('Invalid JSON on line %s - %s' % (number, exc))
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+def get_reader(path_or_format):
+    '''
+    Returns the reader for a format name, or for a file name's extension
+    '''
+    name = path_or_format.rsplit('.', 1)[-1].lower()
+    if name == 'jsonl':
+        name = 'ndjson'
+    if name not in READERS:
+        raise ValueError('Unsupported import format "%s"' % path_or_format)
+    return READERS[name]
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class DryRun(Exception):
+    pass
+
+
+class Importer(object):
+    '''
+    Imports rows into a generated model class.
+
+    ``progress`` is called with the running totals after every chunk.
+    '''
+
+    def __init__(self, model_class, chunk_size=1000, dry_run=False,
+                 progress=None, max_errors=100):
+        self.model_class = model_class
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.progress = progress
+        self.max_errors = max_errors
+        self.fields = {}
+        for field in model_class._meta.fields:
+            if not field.primary_key or not field.auto_created:
+                self.fields[field.name] = field
+                self.fields[field.attname] = field
+        self.foreign_keys = [
+            field for field in model_class._meta.fields if field.rel
+        ]
+        self.totals = {'rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+
+    def add_error(self, row, errors):
+        self.totals['failed'] += 1
+        if len(self.totals['errors']) < self.max_errors:
+            self.totals['errors'].append({'row': row, 'errors': errors})
+
+    def build(self, row):
+        '''
+        Returns an unsaved instance for a row, raising ValidationError if
+        one of its values doesn't fit the model
+        '''
+        if isinstance(row, Exception):
+            raise ValidationError(unicode(row))
+        if not isinstance(row, dict):
+            raise ValidationError('Expected an object')
+        values = {}
+        for name, value in row.items():
+            field = self.fields.get(name)
+            if field is None:
+                continue
+            if value == '' and field.null and not field.empty_strings_allowed:
+                value = None
+            if field.rel and value is not None:
+                try:
+                    value = field.rel.get_related_field().to_python(value)
+                except ValidationError as exc:
+                    raise ValidationError({field.name: exc.messages})
+            values[field.attname] = value
+        instance = self.model_class(**values)
+        instance.full_clean(
+            exclude=[field.name for field in self.foreign_keys],
+            validate_unique=False
+        )
+        return instance
+
+    def check_foreign_keys(self, chunk):
+        '''
+        Drops the instances whose foreign keys point at missing rows, with
+        one query per foreign key for the whole chunk
+        '''
+        for field in self.foreign_keys:
+            values = set(
+                getattr(instance, field.attname) for number, instance in chunk
+            )
+            values.discard(None)
+            if not values:
+                continue
+            existing = set(field.rel.to._default_manager.filter(
+                **{'%s__in' % field.rel.field_name: values}
+            ).values_list(field.rel.field_name, flat=True))
+            valid = []
+            for number, instance in chunk:
+                value = getattr(instance, field.attname)
+                if value is None or value in existing:
+                    valid.append((number, instance))
+                else:
+                    self.add_error(number, {field.name: ['Does not exist']})
+            chunk = valid
+        return chunk
+
+    def import_chunk(self, offset, rows):
+        chunk = []
+        for number, row in enumerate(rows, offset):
+            try:
+                chunk.append((number, self.build(row)))
+            except ValidationError as exc:
+                self.add_error(number, getattr(exc, 'message_dict', exc.messages))
+        chunk = self.check_foreign_keys(chunk)
+
+        instances = [instance for number, instance in chunk]
+        try:
+            with transaction.atomic(), changelog.deferred():
+                if changelog.is_logged(self.model_class):
+                    # bulk_create() leaves the keys unset, the log needs them
+                    for instance in instances:
+                        instance.save(force_insert=True)
+                else:
+                    self.model_class._default_manager.bulk_create(instances)
+                if self.dry_run:
+                    raise DryRun
+        except DryRun:
+            pass
+        except DatabaseError as exc:
+            for number, instance in chunk:
+                self.add_error(number, unicode(exc))
+            instances = []
+        self.totals['rows'] += len(rows)
+        self.totals['created'] += len(instances)
+
+    def run(self, rows):
+        '''
+        Imports every row and returns the totals: rows read, rows created,
+        rows failed and the first errors
+        '''
+        offset = 0
+        # Foreign keys are checked against rows the import may have just written
+        with replicas.primary():
+            for chunk in chunks(rows, self.chunk_size):
+                self.import_chunk(offset, chunk)
+                offset += len(chunk)
+                if self.progress:
+                    self.progress(self.totals)
+        if self.totals['created'] and not self.dry_run:
+            # bulk_create doesn't send post_save
+            bump_data_version(self.model_class)
+        return self.totals
+
+
+def import_stream(model_class, stream, format, **kwargs):
+    '''
+    Imports a CSV or NDJSON stream into a generated model class, see
+    Importer for the keyword arguments
+    '''
+    return Importer(model_class, **kwargs).run(get_reader(format)(stream))
+
+
+class ImportForm(forms.Form):
+    import_file = forms.FileField()
+    input_format = forms.ChoiceField(
+        choices=[('', '---')] + [(name, name.upper()) for name in sorted(READERS)],
+        required=False, help_text='Taken from the file name when left blank'
+    )
+    dry_run = forms.BooleanField(required=False, initial=True)
+
+
+class StreamingImportModelAdmin(ExportMixin, admin.ModelAdmin):
+    '''
+    Admin with django-import-export's export and a streaming import in
+    place of its whole-file one
+    '''
+    change_list_template = 'admin/import_export/change_list_import_export.html'
+    import_template_name = 'admin/application/import.html'
+    import_chunk_size = 1000
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.module_name
+        return patterns(
+            '',
+            url(r'^import/$',
+                self.admin_site.admin_view(self.import_action),
+                name='%s_%s_import' % info),
+        ) + super(StreamingImportModelAdmin, self).get_urls()
+
+    def import_action(self, request, *args, **kwargs):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportForm(request.POST or None, request.FILES or None)
+        context = {
+            'form': form,
+            'opts': self.model._meta,
+            'fields': [field.attname for field in self.model._meta.fields],
+        }
+        if request.method == 'POST' and form.is_valid():
+            import_file = form.cleaned_data['import_file']
+            try:
+                reader = get_reader(
+                    form.cleaned_data['input_format'] or import_file.name
+                )
+            except ValueError as exc:
+                context['error'] = unicode(exc)
+            else:
+                importer = Importer(
+                    self.model, chunk_size=self.import_chunk_size,
+                    dry_run=form.cleaned_data['dry_run']
+                )
+                context['result'] = importer.run(reader(import_file))
+                context['dry_run'] = importer.dry_run
+        return TemplateResponse(request, [self.import_template_name],
+                                context, current_app=self.admin_site.name)
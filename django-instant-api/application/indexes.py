@@ -0,0 +1,147 @@
+'''
+Index management for the tables of generated models.
+
+Besides the indexes Django infers from field definitions, a model gets an
+automatic index for each of its API filter fields and for the leading field
+of its ordering, plus any composite indexes listed as ModelIndex rows, and
+a full-text index of its search fields.
+'''
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import get_model
+
+from south.db import db, dbs
+
+from application import replicas, search
+
+
+def get_table_indexes(table, using=DEFAULT_DB_ALIAS):
+    '''
+    Returns {index name: (columns, unique)} for the indexes that exist on a
+    table, as reported by the database
+    '''
+    connection = connections[using]
+    cursor = connection.cursor()
+    if connection.vendor == 'sqlite':
+        quote_name = connection.ops.quote_name
+        cursor.execute('PRAGMA index_list(%s)' % quote_name(table))
+        indexes = {}
+        for seq, name, unique in [row[:3] for row in cursor.fetchall()]:
+            cursor.execute('PRAGMA index_info(%s)' % quote_name(name))
+            columns = tuple(info[2] for info in cursor.fetchall())
+            indexes[name] = (columns, bool(unique))
+        return indexes
+    # Other backends only describe single column indexes to Django
+    indexes = {}
+    for column, info in connection.introspection.get_indexes(cursor, table).items():
+        if not info['primary_key']:
+            name = db.create_index_name(table, [column])
+            indexes[name] = ((column,), bool(info['unique']))
+    return indexes
+
+
+def get_automatic_indexes(app_model):
+    '''
+    Returns the field names to index for the model's API filter fields and
+    ordering, leaving out fields Django indexes already
+    '''
+    opts = app_model.as_model()._meta
+    names = []
+    if app_model.api_serialiser and app_model.api_serialiser.filter_fields:
+        names.extend(app_model.api_serialiser.filter_fields.split(','))
+    if app_model.ordering:
+        names.append(app_model.ordering.split(',')[0].lstrip('-'))
+
+    field_names = []
+    for name in names:
+        name = name.strip()
+        try:
+            field = opts.get_field(name)
+        except Exception:
+            continue
+        if field.primary_key or field.unique or field.db_index:
+            continue
+        if field.name not in field_names:
+            field_names.append(field.name)
+    return field_names
+
+
+def get_columns(model_class, field_names):
+    '''
+    Returns the columns for a list of field names, or None if one of them
+    isn't a field of the model anymore
+    '''
+    columns = []
+    for name in field_names:
+        try:
+            columns.append(model_class._meta.get_field(name).column)
+        except Exception:
+            return None
+    return columns
+
+
+def create_index(app_model, field_names, unique=False):
+    model_class = app_model.as_model()
+    table = model_class._meta.db_table
+    columns = get_columns(model_class, field_names)
+    if not columns:
+        return
+    name = db.create_index_name(table, columns)
+    for alias in replicas.get_schema_aliases():
+        if name not in get_table_indexes(table, alias):
+            dbs[alias].create_index(table, columns, unique=unique)
+
+
+def drop_index(app_model, field_names):
+    model_class = app_model.as_model()
+    table = model_class._meta.db_table
+    columns = get_columns(model_class, field_names)
+    if not columns:
+        return
+    name = db.create_index_name(table, columns)
+    for alias in replicas.get_schema_aliases():
+        # Dropping a column drops the indexes using it along with it
+        if name in get_table_indexes(table, alias):
+            dbs[alias].delete_index(table, columns)
+
+
+def sync_indexes(app_model):
+    '''
+    Creates and drops the automatic indexes of a model so they match its
+    current filter fields and ordering, and forgets indexes on fields that
+    no longer exist
+    '''
+    ModelIndex = get_model('application', 'ModelIndex')
+    model_class = app_model.as_model()
+    wanted = get_automatic_indexes(app_model)
+    existing = set()
+    for index in ModelIndex.objects.filter(model=app_model):
+        field_names = index.get_field_names()
+        if get_columns(model_class, field_names) is None:
+            index.delete()
+        elif index.automatic and field_names[0] not in wanted:
+            index.delete()
+        else:
+            existing.add(index.fields)
+    for name in wanted:
+        if name not in existing:
+            ModelIndex.objects.create(model=app_model, fields=name, automatic=True)
+    search.sync_search_index(app_model)
+
+
+def list_indexes(app_model):
+    '''
+    Returns (index name, columns, unique, managed) for every index on the
+    model's table, managed ones being those created from ModelIndex rows
+    '''
+    ModelIndex = get_model('application', 'ModelIndex')
+    model_class = app_model.as_model()
+    table = model_class._meta.db_table
+    managed = set()
+    for index in ModelIndex.objects.filter(model=app_model):
+        columns = get_columns(model_class, index.get_field_names())
+        if columns:
+            managed.add(db.create_index_name(table, columns))
+    return sorted(
+        (name, columns, unique, name in managed)
+        for name, (columns, unique) in get_table_indexes(table).items()
+    )
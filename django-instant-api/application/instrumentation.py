@@ -0,0 +1,254 @@
+'''
+Per-request instrumentation of the generated endpoints.
+
+InstrumentationMiddleware times each request and the SQL it runs, and
+``timed`` blocks add named phases to it: schema building in the registry,
+serialisation and rendering in the viewsets. Requests handled by a
+generated viewset get a Server-Timing header and are added to in-memory
+histograms per endpoint, served by StatsView.
+
+Enabled by the INSTANT_API_INSTRUMENTATION setting, which defaults to DEBUG.
+'''
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from application.permissions import IsStatsReader
+
+TIME_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+PHASES = ('schema', 'serialise', 'render')
+
+_local = threading.local()
+
+
+def is_enabled():
+    return getattr(settings, 'INSTANT_API_INSTRUMENTATION', settings.DEBUG)
+
+
+def start_request():
+    '''
+    Starts recording the request handled by this thread, if enabled
+    '''
+    _local.stats = None
+    if is_enabled():
+        _local.stats = RequestStats()
+        _local.stats.start_queries()
+
+
+def finish_request():
+    '''
+    Stops recording and returns the RequestStats, or None if the request
+    wasn't recorded
+    '''
+    stats = get_current()
+    _local.stats = None
+    if stats is not None:
+        stats.finish()
+    return stats
+
+
+def get_current():
+    '''
+    Returns the RequestStats of the request being handled by this thread,
+    or None when it isn't instrumented
+    '''
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def timed(phase):
+    '''
+    Adds the time spent in the block to a phase of the current request.
+    Blocks nested in one for the same phase aren't counted twice.
+    '''
+    stats = get_current()
+    if stats is None or phase in stats.active:
+        yield
+        return
+    stats.active.add(phase)
+    start = time.time()
+    try:
+        yield
+    finally:
+        stats.active.discard(phase)
+        stats.phases[phase] = stats.phases.get(phase, 0) + (time.time() - start) * 1000
+
+
+class RequestStats(object):
+
+    def __init__(self):
+        self.start = time.time()
+        self.endpoint = None
+        self.phases = {}
+        self.active = set()
+        self.query_count = 0
+        self.query_ms = 0
+        self.total_ms = None
+        self.query_marks = {}
+        self.debug_cursors = {}
+
+    def start_queries(self):
+        for connection in connections.all():
+            self.debug_cursors[connection.alias] = connection.use_debug_cursor
+            connection.use_debug_cursor = True
+            self.query_marks[connection.alias] = len(connection.queries)
+
+    def stop_queries(self):
+        for connection in connections.all():
+            if connection.alias not in self.query_marks:
+                continue
+            mark = self.query_marks[connection.alias]
+            queries = connection.queries[mark:]
+            self.query_count += len(queries)
+            self.query_ms += sum(float(query['time']) for query in queries) * 1000
+            connection.use_debug_cursor = self.debug_cursors[connection.alias]
+            if not settings.DEBUG:
+                del connection.queries[mark:]
+
+    def finish(self):
+        self.stop_queries()
+        self.total_ms = (time.time() - self.start) * 1000
+
+    def get_metrics(self):
+        metrics = [('db', self.query_ms, '%s queries' % self.query_count)]
+        for phase in PHASES:
+            if phase in self.phases:
+                metrics.append((phase, self.phases[phase], None))
+        metrics.append(('total', self.total_ms, None))
+        return metrics
+
+    def header(self):
+        values = []
+        for name, duration, description in self.get_metrics():
+            value = '%s;dur=%.2f' % (name, duration)
+            if description:
+                value += ';desc="%s"' % description
+            values.append(value)
+        return ', '.join(values)
+
+
+class Histogram(object):
+    '''
+    Counts of observations falling under each bucket's upper bound, the
+    last count being for values above every bound
+    '''
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': [[bound, count] for bound, count in zip(bounds, self.counts)],
+        }
+
+
+class StatsCollector(object):
+    '''
+    Histograms of request time, per phase time and query count, per
+    endpoint
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def add(self, stats):
+        with self._lock:
+            histograms = self.endpoints.get(stats.endpoint)
+            if histograms is None:
+                histograms = self.endpoints[stats.endpoint] = {
+                    'queries': Histogram(QUERY_BUCKETS),
+                }
+            histograms['queries'].observe(stats.query_count)
+            for name, duration, description in stats.get_metrics():
+                if name not in histograms:
+                    histograms[name] = Histogram(TIME_BUCKETS)
+                histograms[name].observe(duration)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(
+                (endpoint, dict(
+                    (name, histogram.as_dict())
+                    for name, histogram in histograms.items()
+                ))
+                for endpoint, histograms in self.endpoints.items()
+            )
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+collector = StatsCollector()
+
+
+class InstrumentationMixin(object):
+    '''
+    Names the endpoint of an instrumented request and times rendering the
+    response
+    '''
+
+    def dispatch(self, request, *args, **kwargs):
+        stats = get_current()
+        if stats is not None:
+            opts = self.queryset.model._meta
+            method = request.method.lower()
+            stats.endpoint = '%s.%s %s' % (
+                opts.app_label, opts.object_name.lower(),
+                getattr(self, 'action_map', {}).get(method, method)
+            )
+        response = super(InstrumentationMixin, self).dispatch(request, *args, **kwargs)
+        if stats is not None and not getattr(response, 'is_rendered', True):
+            with timed('render'):
+                response.render()
+        return response
+
+
+class InstrumentedSerializerMixin(object):
+    '''
+    Counts the time spent turning objects into native data as serialisation
+    '''
+
+    def to_native(self, obj):
+        with timed('serialise'):
+            return super(InstrumentedSerializerMixin, self).to_native(obj)
+
+
+class StatsView(APIView):
+    '''
+    Histograms of the instrumented endpoints, GET to read them and DELETE
+    to start over
+    '''
+    permission_classes = (IsStatsReader,)
+
+    def get(self, request, format=None):
+        return Response({
+            'enabled': is_enabled(),
+            'endpoints': collector.snapshot(),
+        })
+
+    def delete(self, request, format=None):
+        collector.reset()
+        return Response(status=204)
@@ -0,0 +1,92 @@
+'''
+Loads every model definition in a fixed number of queries and builds the
+generated classes from that in-memory snapshot.
+'''
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import get_model
+
+
+class Schema(object):
+    '''
+    Snapshot of the ApplicationModel definitions along with their app,
+    fields, admin and API settings, plus the content types that foreign key
+    fields are resolved against.
+
+    Building from a snapshot doesn't query the database. Foreign key targets
+    are built before the models pointing at them, and relations that loop
+    back to a model still being built are left as lazy references that
+    Django resolves once that model is ready.
+    '''
+
+    def __init__(self, app_models, content_types, complete=True):
+        self.complete = complete
+        self.app_models = list(app_models)
+        self.definitions = dict(
+            ((app_model.app.name.lower(), app_model.name.lower()), app_model)
+            for app_model in self.app_models
+        )
+        self.content_types = {}
+        for ctype in content_types:
+            self.content_types.setdefault(ctype.model, []).append(ctype)
+        self.building = set()
+
+    @classmethod
+    def load(cls, queryset=None):
+        '''
+        Takes a snapshot of all model definitions, or only those in
+        ``queryset``, in three queries
+        '''
+        complete = queryset is None
+        if complete:
+            ApplicationModel = get_model('application', 'ApplicationModel')
+            queryset = ApplicationModel.objects.all()
+        app_models = queryset.select_related(
+            'app', 'admin', 'api_serialiser'
+        ).prefetch_related('fields')
+        return cls(app_models, ContentType.objects.all(), complete)
+
+    def build(self):
+        '''
+        Builds the class of every model in the snapshot
+        '''
+        return [app_model.as_model(self) for app_model in self.app_models]
+
+    def build_model(self, app_model):
+        key = (app_model.app.name.lower(), app_model.name.lower())
+        self.building.add(key)
+        try:
+            return app_model.build_model(self)
+        finally:
+            self.building.discard(key)
+
+    def get_content_type(self, model_name):
+        ctypes = self.content_types.get(model_name, [])
+        if not ctypes:
+            raise ContentType.DoesNotExist(
+                'No content type for model %s' % model_name
+            )
+        if len(ctypes) > 1:
+            raise ContentType.MultipleObjectsReturned(
+                'More than one content type for model %s' % model_name
+            )
+        return ctypes[0]
+
+    def get_related_to_model(self, field_type):
+        ctype = self.get_content_type(field_type)
+        key = (ctype.app_label.lower(), ctype.model)
+        model_def = self.definitions.get(key)
+        if model_def is None and self.complete:
+            return ctype.model_class()
+        if model_def is None:
+            # Only part of the schema was loaded
+            ApplicationModel = get_model('application', 'ApplicationModel')
+            try:
+                model_def = ApplicationModel.objects.get(
+                    name__iexact=ctype.model, app__name__iexact=ctype.app_label
+                )
+            except ApplicationModel.DoesNotExist:
+                return ctype.model_class()
+            return model_def.as_model()
+        if key in self.building:
+            return '%s.%s' % (model_def.app.name, model_def.name)
+        return model_def.as_model(self)
@@ -0,0 +1,101 @@
+'''
+Long polling for changes to generated models.
+
+``<prefix>/changes/?version=<v>`` answers as soon as the model's data
+version differs from ``v``, or once ``timeout`` seconds have passed with
+it unchanged, INSTANT_API_LONG_POLL_TIMEOUT being the longest wait allowed.
+Waiting requests hold no database connection. Changes made in the same
+process wake them straight away; those made by other processes are seen
+in the shared cache within INSTANT_API_LONG_POLL_INTERVAL seconds.
+
+Every waiting request holds a worker for up to the timeout, so the endpoint
+answers 404 unless INSTANT_API_LONG_POLL is set, which should only be done
+when serving with gevent workers (see gunicorn.conf.py and the README).
+Under plain threads each waiting request takes up a whole thread.
+'''
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+from application.caching import data_changed, get_data_version
+from application.decorators import collection_action
+
+
+def is_enabled():
+    return getattr(settings, 'INSTANT_API_LONG_POLL', False)
+
+
+def get_max_timeout():
+    return getattr(settings, 'INSTANT_API_LONG_POLL_TIMEOUT', 5)
+
+
+def get_poll_interval():
+    return getattr(settings, 'INSTANT_API_LONG_POLL_INTERVAL', 1)
+
+
+def format_version(version):
+    return '%.6f' % version
+
+
+def release_connections():
+    '''
+    Closes this thread's database connections, those in a transaction
+    excepted, so a waiting request doesn't keep one open
+    '''
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def wait_for_change(model_class, version, timeout):
+    '''
+    Returns the model's data version once it differs from ``version``, or
+    the unchanged version when ``timeout`` seconds have passed
+    '''
+    deadline = time.time() + timeout
+    interval = get_poll_interval()
+    current = format_version(get_data_version(model_class))
+    while current == version:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        with data_changed:
+            data_changed.wait(min(interval, remaining))
+        current = format_version(get_data_version(model_class))
+    return current
+
+
+class LongPollMixin(object):
+    '''
+    Adds a ``changes`` collection action waiting for the model's rows to
+    change
+    '''
+
+    @collection_action(methods=['get'])
+    def changes(self, request, *args, **kwargs):
+        if not is_enabled():
+            raise Http404('Long polling is not enabled')
+        version = request.QUERY_PARAMS.get('version')
+        max_timeout = get_max_timeout()
+        try:
+            timeout = float(request.QUERY_PARAMS.get('timeout', max_timeout))
+        except ValueError:
+            raise ParseError('Invalid timeout')
+        timeout = min(max(timeout, 0), max_timeout)
+
+        model_class = self.queryset.model
+        if version is None:
+            current = format_version(get_data_version(model_class))
+        else:
+            release_connections()
+            current = wait_for_change(model_class, version, timeout)
+        response = Response({
+            'version': current,
+            'changed': version is not None and current != version,
+        })
+        response['Cache-Control'] = 'no-cache'
+        return response
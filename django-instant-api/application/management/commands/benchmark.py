@@ -0,0 +1,55 @@
+import json
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from application import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Builds a synthetic schema in a throwaway test database and '
+            'writes schema build, startup and endpoint timings as JSON')
+    option_list = BaseCommand.option_list + (
+        make_option('--apps', dest='apps', type='int', default=2),
+        make_option('--models', dest='models', type='int', default=5,
+                    help='Models per app, each with a foreign key to the previous one'),
+        make_option('--fields', dest='fields', type='int', default=5,
+                    help='Fields per model besides name and the foreign key'),
+        make_option('--rows', dest='rows', type='int', default=100,
+                    help='Rows seeded per model'),
+        make_option('--requests', dest='requests', type='int', default=20,
+                    help='Timed requests per endpoint'),
+        make_option('--database-file', dest='database_file', default=None,
+                    help='SQLite file to run in instead of memory, which the '
+                         'concurrent write benchmark needs'),
+        make_option('--output', dest='output', default=None,
+                    help='File to write the JSON results to, stdout by default'),
+    )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        if options['database_file']:
+            connection.settings_dict['TEST_NAME'] = options['database_file']
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            results = benchmarks.run(
+                apps=options['apps'],
+                models_per_app=options['models'],
+                fields_per_model=options['fields'],
+                rows=options['rows'],
+                requests=options['requests'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                stream.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,27 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from application import snapshot
+from application.schema import current_generation
+
+
+class Command(BaseCommand):
+    help = ('Writes every model definition to a snapshot file that workers '
+            'can start from without reading the meta tables')
+    option_list = BaseCommand.option_list + (
+        make_option('--output', dest='output', default=None,
+                    help='File to write, INSTANT_API_SCHEMA_SNAPSHOT by default'),
+    )
+
+    def handle(self, *args, **options):
+        path = options['output'] or snapshot.get_snapshot_path()
+        if not path:
+            raise CommandError(
+                'Give --output or set INSTANT_API_SCHEMA_SNAPSHOT'
+            )
+        data = snapshot.export(current_generation())
+        snapshot.write(path, data)
+        self.stdout.write('Wrote %s models at schema generation %s to %s' % (
+            len(data['models']), data['generation'], path
+        ))
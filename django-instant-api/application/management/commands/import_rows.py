@@ -0,0 +1,54 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from application.importer import Importer, get_reader
+from application.models import ApplicationModel
+
+
+class Command(BaseCommand):
+    args = '<app_label.model_name> <file>'
+    help = 'Imports a CSV or NDJSON file into a generated model a chunk at a time'
+    option_list = BaseCommand.option_list + (
+        make_option('--format', dest='format', default=None,
+                    help='csv or ndjson, taken from the file name by default'),
+        make_option('--chunk-size', dest='chunk_size', type='int', default=1000,
+                    help='Rows written per transaction'),
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+                    help='Validate and insert every chunk but roll it back'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 2 or '.' not in args[0]:
+            raise CommandError('Usage: import_rows %s' % self.args)
+        label, path = args
+        app_label, model_name = label.split('.', 1)
+        try:
+            app_model = ApplicationModel.objects.select_related('app').get(
+                app__name=app_label, name__iexact=model_name
+            )
+        except ApplicationModel.DoesNotExist:
+            raise CommandError('Unknown model "%s"' % label)
+        try:
+            reader = get_reader(options['format'] or path)
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        def progress(totals):
+            self.stdout.write('%(rows)s rows read, %(created)s created, '
+                              '%(failed)s failed' % totals)
+
+        importer = Importer(
+            app_model.as_model(), chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'], progress=progress
+        )
+        with open(path, 'rb') as stream:
+            totals = importer.run(reader(stream))
+        for error in totals['errors']:
+            self.stderr.write('Row %(row)s: %(errors)s' % error)
+        if totals['failed'] > len(totals['errors']):
+            self.stderr.write('%s more errors not shown' % (
+                totals['failed'] - len(totals['errors'])
+            ))
+        if options['dry_run']:
+            self.stdout.write('Dry run, nothing was saved')
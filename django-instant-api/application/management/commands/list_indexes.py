@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from application.indexes import list_indexes
+from application.models import ApplicationModel
+
+
+class Command(BaseCommand):
+    args = '[app_label.model_name ...]'
+    help = 'Lists the indexes on the tables of generated models'
+
+    def handle(self, *args, **options):
+        app_models = ApplicationModel.objects.select_related('app')
+        for app_model in app_models.order_by('app__name', 'name'):
+            label = '%s.%s' % (app_model.app.name, app_model.name.lower())
+            if args and label not in args:
+                continue
+            self.stdout.write(label)
+            for name, columns, unique, managed in list_indexes(app_model):
+                self.stdout.write('  %s (%s)%s%s' % (
+                    name, ', '.join(columns),
+                    ' unique' if unique else '',
+                    ' managed' if managed else '',
+                ))
@@ -0,0 +1,44 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from application import migrator, replicas
+from application.models import ApplicationModel
+
+
+class Command(BaseCommand):
+    args = '[app_label.model_name ...]'
+    help = 'Brings the tables of generated models in line with their field definitions'
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+                    help='Only list the changes'),
+        make_option('--drop-unknown', action='store_true', dest='drop_unknown',
+                    default=False,
+                    help='Also drop the columns that no field defines'),
+    )
+
+    def handle(self, *args, **options):
+        app_models = ApplicationModel.objects.select_related('app')
+        for app_model in app_models.order_by('app__name', 'name'):
+            label = '%s.%s' % (app_model.app.name, app_model.name.lower())
+            if args and label not in args:
+                continue
+            aliases = replicas.get_schema_aliases()
+            plans = [
+                plan for plan in [
+                    migrator.plan_table(
+                        app_model, using=alias, drop_unknown=options['drop_unknown']
+                    ) for alias in aliases
+                ]
+                if plan or plan.unknown
+            ]
+            if not plans:
+                continue
+            self.stdout.write(label)
+            for plan in plans:
+                for line in plan.describe():
+                    if len(aliases) > 1:
+                        line = '%s: %s' % (plan.using, line)
+                    self.stdout.write('  %s' % line)
+            if not options['dry_run'] and any(plans):
+                migrator.migrate(app_model, drop_unknown=options['drop_unknown'])
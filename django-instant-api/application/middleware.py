@@ -0,0 +1,49 @@
+from application import instrumentation, replicas
+from application.schema import watcher
+
+
+class SchemaSyncMiddleware(object):
+    '''
+    Rebuilds the generated models, routes and admin registrations in this
+    worker when another one has changed a model definition
+    '''
+
+    def process_request(self, request):
+        watcher.sync()
+
+
+class InstrumentationMiddleware(object):
+    '''
+    Times every request and its SQL, adding a Server-Timing header to the
+    responses of generated endpoints. Should come first so the time spent in
+    the other middleware, schema syncing included, is counted.
+    '''
+
+    def process_request(self, request):
+        instrumentation.start_request()
+
+    def process_response(self, request, response):
+        stats = instrumentation.finish_request()
+        if stats is not None and stats.endpoint is not None:
+            response['Server-Timing'] = stats.header()
+            instrumentation.collector.add(stats)
+        return response
+
+
+class ReplicaMiddleware(object):
+    '''
+    Reads generated models from the primary database during requests that
+    write and for a while after them, so clients see their own writes when
+    INSTANT_API_REPLICAS is set
+    '''
+
+    def process_request(self, request):
+        replicas.start_request(replicas.is_sticky(request))
+
+    def process_response(self, request, response):
+        written = replicas.finish_request()
+        # Bulk writes don't send post_save
+        if written or (request.method not in replicas.SAFE_METHODS and
+                       response.status_code < 400):
+            replicas.set_sticky(response)
+        return response
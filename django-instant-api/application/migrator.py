@@ -0,0 +1,332 @@
+'''
+Migrates the tables of generated models to match their ModelField rows.
+
+The stored field definitions are compared with the columns the database
+reports for the table, and every difference, whether an added, renamed,
+altered or dropped column, is applied in one pass: one table rebuild on
+SQLite, one transaction elsewhere. Tables are migrated on the primary
+database and on every read replica alias.
+
+Only the columns of removed fields are dropped. Columns no field accounts
+for are left alone with a warning, unless ``drop_unknown`` is given, as
+``manage.py migrate_tables --drop-unknown`` does.
+
+Field changes made inside ``deferred()`` are collected and each changed
+table is migrated once when the block ends, which is how the admin saves
+a model's field inline.
+'''
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.utils.datastructures import SortedDict
+
+from south.db import dbs
+
+from application import indexes, replicas, schema
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class TablePlan(object):
+    '''
+    The changes needed to bring a table in line with its field definitions
+    '''
+
+    def __init__(self, table, using=DEFAULT_DB_ALIAS):
+        self.table = table
+        self.using = using
+        self.renamed = SortedDict()
+        self.added = []
+        self.altered = []
+        self.deleted = []
+        self.unknown = []
+
+    def __nonzero__(self):
+        return bool(self.renamed or self.added or self.altered or self.deleted)
+
+    def describe(self):
+        lines = []
+        for old, new in self.renamed.items():
+            lines.append('rename %s to %s' % (old, new))
+        for name, field in self.added:
+            lines.append('add %s' % field.column)
+        for name, field, changes in self.altered:
+            lines.append('alter %s (%s)' % (field.column, ', '.join(changes)))
+        for column in self.deleted:
+            lines.append('drop %s' % column)
+        for column in self.unknown:
+            lines.append('keep %s (no field defines it)' % column)
+        return lines
+
+
+def get_column_field(model_field):
+    '''
+    Returns the Django field for a ModelField with its column set
+    '''
+    field = model_field.as_field()
+    field.set_attributes_from_name(model_field.name)
+    return field
+
+
+def get_live_columns(table, using=DEFAULT_DB_ALIAS):
+    '''
+    Returns {column: {'type', 'null', 'unique'}} for a table as the database
+    describes it. Types are the declared SQL types on SQLite and Django field
+    type names elsewhere.
+    '''
+    connection = connections[using]
+    cursor = connection.cursor()
+    uniques = set(
+        columns[0] for columns, unique in indexes.get_table_indexes(table, using).values()
+        if unique and len(columns) == 1
+    )
+    columns = {}
+    if connection.vendor == 'sqlite':
+        db = dbs[using]
+        for info in db._get_full_table_description(connection, cursor, table):
+            columns[info['name']] = {
+                'type': info['type'].lower().strip(),
+                'null': bool(info['null_ok']),
+                'unique': info['name'] in uniques,
+            }
+        return columns
+    introspection = connection.introspection
+    for row in introspection.get_table_description(cursor, table):
+        try:
+            column_type = introspection.get_field_type(row[1], row)
+        except KeyError:
+            column_type = None
+        columns[row[0]] = {
+            'type': column_type,
+            'null': bool(row[6]),
+            'unique': row[0] in uniques,
+        }
+    return columns
+
+
+def get_column_type(field, connection):
+    if connection.vendor == 'sqlite':
+        return (field.db_type(connection) or '').lower().strip()
+    if field.rel:
+        field = field.rel.get_related_field()
+    internal_type = field.get_internal_type()
+    if internal_type == 'AutoField':
+        return 'IntegerField'
+    return internal_type
+
+
+def plan_table(app_model, renames=None, using=DEFAULT_DB_ALIAS, dropped=(),
+               drop_unknown=False):
+    '''
+    Compares a model's field definitions with its table in the given
+    database and returns the TablePlan to apply. ``renames`` maps old column
+    names to new ones for fields renamed since the table was last migrated
+    and ``dropped`` names the columns of fields removed since. Other columns
+    without a field are only dropped with ``drop_unknown``.
+    '''
+    model_class = app_model.as_model()
+    table = model_class._meta.db_table
+    live = get_live_columns(table, using)
+    live.pop(model_class._meta.pk.column, None)
+    plan = TablePlan(table, using)
+    connection = connections[using]
+
+    wanted = SortedDict()
+    for model_field in app_model.fields.all():
+        field = get_column_field(model_field)
+        wanted[field.column] = (model_field.name, field)
+
+    for old, new in (renames or {}).items():
+        if old in live and new not in live and new in wanted:
+            plan.renamed[old] = new
+            live[new] = live.pop(old)
+
+    for column, (name, field) in wanted.items():
+        current = live.pop(column, None)
+        if current is None:
+            plan.added.append((name, field))
+            continue
+        changes = []
+        column_type = get_column_type(field, connection)
+        if current['type'] is not None and current['type'] != column_type:
+            changes.append('type')
+        if current['null'] != field.null:
+            changes.append('null')
+        if current['unique'] != field.unique:
+            changes.append('unique')
+        if changes:
+            plan.altered.append((name, field, changes))
+    for column in sorted(live):
+        if column in dropped or drop_unknown:
+            plan.deleted.append(column)
+        else:
+            plan.unknown.append(column)
+    return plan
+
+
+def apply_plan(plan):
+    if not plan:
+        return
+    if connections[plan.using].vendor == 'sqlite':
+        _apply_sqlite(plan)
+        return
+    db = dbs[plan.using]
+    with transaction.atomic(using=plan.using):
+        for old, new in plan.renamed.items():
+            db.rename_column(plan.table, old, new)
+        for name, field in plan.added:
+            db.add_column(plan.table, name, field, keep_default=False)
+        for name, field, changes in plan.altered:
+            if 'type' in changes or 'null' in changes:
+                db.alter_column(plan.table, field.column, field, ignore_constraints=True)
+            if 'unique' in changes:
+                if field.unique:
+                    db.create_unique(plan.table, [field.column])
+                else:
+                    db.delete_unique(plan.table, [field.column])
+        for column in plan.deleted:
+            db.delete_column(plan.table, column)
+
+
+def _apply_sqlite(plan):
+    '''
+    Applies the whole plan with a single rebuild of the table, where
+    South would rebuild it once per column
+    '''
+    connection = connections[plan.using]
+    db = dbs[plan.using]
+    added = {}
+    for name, field in plan.added:
+        if (not field.null and
+                (not field.has_default() or field.get_default() is None) and
+                not field.empty_strings_allowed):
+            raise ValueError(
+                'Cannot add the non null column %s without a default' % field.column
+            )
+        default = None
+        if field.get_default() is not None:
+            default = "'%s'" % field.get_db_prep_save(
+                field.get_default(), connection=connection
+            )
+        field._suppress_default = True
+        added[field.column] = (
+            db._column_sql_for_create(plan.table, name, field, False), default
+        )
+
+    altered = {}
+    uniques_deleted = []
+    for name, field, changes in plan.altered:
+        if not field.null and field.has_default():
+            db._update_nulls_to_default({
+                'table_name': db.quote_name(plan.table),
+                'column': db.quote_name(field.column),
+            }, field)
+        field._suppress_default = True
+        altered[field.column] = db._column_sql_for_create(
+            plan.table, field.column, field
+        )
+        if 'unique' in changes and not field.unique:
+            uniques_deleted.append(field.column)
+        elif field.unique and 'unique' not in changes:
+            # The rebuild keeps the UNIQUE of a column that already had one
+            altered[field.column] = altered[field.column].replace(' UNIQUE', '')
+
+    with transaction.atomic(using=plan.using):
+        db._remake_table(
+            plan.table, added=added, renames=plan.renamed, deleted=plan.deleted,
+            altered=altered, uniques_deleted=uniques_deleted
+        )
+
+
+def migrate(app_model, renames=None, dropped=(), drop_unknown=False):
+    '''
+    Brings a model's table in line with its fields in every database, then
+    rebuilds its class and tells the other workers. Returns the TablePlan
+    applied to the primary.
+    '''
+    plans = [
+        plan_table(app_model, renames, alias, dropped, drop_unknown)
+        for alias in replicas.get_schema_aliases()
+    ]
+    for plan in plans:
+        if plan.unknown:
+            log.warning(
+                'Keeping columns of %s.%s that no field defines: %s',
+                plan.using, plan.table, ', '.join(plan.unknown)
+            )
+        apply_plan(plan)
+    app_model.uncache()
+    indexes.sync_indexes(app_model)
+    schema.publish(app_model)
+    return plans[0]
+
+
+class Batch(object):
+    '''
+    Models whose fields changed inside ``deferred()``, with their renames
+    and dropped columns
+    '''
+
+    def __init__(self):
+        self.app_models = SortedDict()
+        self.renames = {}
+        self.dropped = {}
+
+    def add(self, app_model, renames=None, dropped=()):
+        self.app_models[app_model.pk] = app_model
+        model_renames = self.renames.setdefault(app_model.pk, SortedDict())
+        model_dropped = self.dropped.setdefault(app_model.pk, set())
+        for old, new in (renames or {}).items():
+            # Follow a column renamed more than once back to its original
+            for first, current in model_renames.items():
+                if current == old:
+                    old = first
+            model_renames[old] = new
+        for column in dropped:
+            # The table still has a renamed column under its original name
+            for first, current in model_renames.items():
+                if current == column:
+                    del model_renames[first]
+                    column = first
+            model_dropped.add(column)
+
+    def apply(self):
+        return [
+            migrate(app_model, self.renames.get(pk), self.dropped.get(pk, ()))
+            for pk, app_model in self.app_models.items()
+        ]
+
+
+@contextmanager
+def deferred():
+    '''
+    Defers the migrations for field changes made in the block to its end,
+    migrating each changed table once
+    '''
+    batch = getattr(_local, 'batch', None)
+    if batch is not None:
+        yield batch
+        return
+    batch = _local.batch = Batch()
+    try:
+        yield batch
+    finally:
+        _local.batch = None
+    batch.apply()
+
+
+def field_changed(app_model, renames=None, dropped=()):
+    '''
+    Migrates a model's table after one of its fields was added, changed or
+    removed, or leaves it for the end of the enclosing ``deferred()`` block.
+    ``dropped`` names the columns of removed fields.
+    '''
+    batch = getattr(_local, 'batch', None)
+    if batch is not None:
+        batch.add(app_model, renames, dropped)
+    else:
+        migrate(app_model, renames, dropped)
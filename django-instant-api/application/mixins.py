@@ -1,6 +1,29 @@
 from django.db.models import get_model
-from rest_framework import serializers, viewsets
-from import_export.admin import ImportExportModelAdmin
+from rest_framework import serializers
+
+from application import registry, search, viewsets
+from application.caching import DeferredInvalidationAdminMixin
+from application.compiled import CompiledSerializerMixin
+from application.fieldsets import SparseSerializerMixin
+from application.importer import StreamingImportModelAdmin
+from application.instrumentation import InstrumentedSerializerMixin, timed
+from application.writebehind import WriteBehindSerializerMixin
+
+
+def get_app_model(model_class):
+    '''
+    Returns the ApplicationModel a generated class was built from, or None
+    for any other model
+    '''
+    key = registry.get_key(model_class)
+    if key is None:
+        return None
+    ApplicationModel = get_model('application', 'ApplicationModel')
+    def get_definition():
+        return ApplicationModel.objects.select_related(
+            'app', 'api_serialiser'
+        ).filter(app__name=key[0], name__iexact=key[1]).first()
+    return registry.memoise(key[0], key[1], 'definition', get_definition)
 
 
 class AdminMixin(object):
@@ -14,62 +37,141 @@ class AdminMixin(object):
                 attr = getattr(self.admin, field_name)
                 if attr:
                     attrs[field_name] = attr.split(',')
+        attrs['full_text_fields'] = search.get_search_fields(self)
         admin_name = '%sAdmin' % self.name.capitalize()
-        return type(str(admin_name), (ImportExportModelAdmin,), attrs)
+        return type(str(admin_name), (
+            DeferredInvalidationAdminMixin, search.SearchAdminMixin,
+            StreamingImportModelAdmin
+        ), attrs)
 
 
 class ApiMixin(object):
 
+    def get_endpoint_name(self):
+        if self.verbose_name_plural:
+            return self.verbose_name_plural.lower()
+        return self.verbose_name.lower() + 's'
+
     @property
     def default_serialiser(self):
+        return registry.memoise(
+            self.app.name, self.name, 'default_serialiser',
+            self.build_default_serialiser
+        )
+
+    def build_default_serialiser(self):
         attrs = {}
         class Meta:
             model = self.as_model()
         attrs['Meta'] = Meta
         serializer_name = '%sSerializer' % self.name.capitalize()
-        return type(str(serializer_name), (serializers.HyperlinkedModelSerializer,), attrs)
+        return type(str(serializer_name), (
+            InstrumentedSerializerMixin, SparseSerializerMixin,
+            CompiledSerializerMixin, WriteBehindSerializerMixin,
+            serializers.HyperlinkedModelSerializer
+        ), attrs)
 
-    def get_related_serialisers(self):
-        fks = [
+    def get_foreign_keys(self):
+        return [
             field for field in self.as_model()._meta.fields
             if field.__class__.__name__.split('.')[-1] == 'ForeignKey'
         ]
+
+    def get_nested_relations(self, nested_in=()):
+        '''
+        Returns (foreign key, ApplicationModel) pairs for the relations the
+        API serialiser nests, skipping models already being nested into
+        '''
+        nested_in = nested_in + (self.pk,)
+        relations = []
+        for fk in self.get_foreign_keys():
+            app_model = get_app_model(fk.rel.to)
+            if app_model is not None and app_model.pk not in nested_in:
+                relations.append((fk, app_model))
+        return relations
+
+    def get_related_serialisers(self, nested_in=()):
         related_serialisers = {}
-        for fk in fks:
-            try:
-                ApplicationModel = get_model('application', 'ApplicationModel')
-                app_model = ApplicationModel.objects.get(
-                    name__iexact=fk.rel.to._meta.model_name)
-                related_serialisers[fk.rel.to._meta.model_name] = app_model.as_api_serialiser()()
-            except ApplicationModel.DoesNotExist:
-                pass
+        for fk, app_model in self.get_nested_relations(nested_in):
+            serialiser = app_model.build_api_serialiser(nested_in + (self.pk,))
+            if serialiser is None:
+                class Meta:
+                    model = fk.rel.to
+                serialiser = type(
+                    str('%sSerializer' % app_model.name.capitalize()),
+                    (serializers.ModelSerializer,), {'Meta': Meta}
+                )
+            related_serialisers[fk.name] = serialiser()
         return related_serialisers
 
+    def get_select_related(self, nested_in=()):
+        '''
+        Returns the select_related() paths for the relations the viewset's
+        serialiser reads related objects through
+        '''
+        if not self.api_serialiser:
+            # Hyperlinked relations look up the related object, but the
+            # plain serialiser used when nesting only reads the key
+            if nested_in:
+                return []
+            return [fk.name for fk in self.get_foreign_keys()]
+        if not self.api_serialiser.nested:
+            return []
+        paths = []
+        for fk, app_model in self.get_nested_relations(nested_in):
+            paths.append(fk.name)
+            paths.extend(
+                '%s__%s' % (fk.name, path)
+                for path in app_model.get_select_related(nested_in + (self.pk,))
+            )
+        return paths
+
     def as_api_serialiser(self):
+        return registry.memoise(
+            self.app.name, self.name, 'api_serialiser',
+            self.build_api_serialiser
+        )
+
+    def build_api_serialiser(self, nested_in=()):
         attrs = {}
         if self.api_serialiser:
             if self.api_serialiser.nested:
-                attrs.update(self.get_related_serialisers())
+                attrs.update(self.get_related_serialisers(nested_in))
             class Meta:
                 model = self.as_model()
                 fields = self.api_serialiser.fields.split(',')
             attrs['Meta'] = Meta
             serializer_name = '%sApiSerializer' % self.name.capitalize()
-            return type(str(serializer_name), (serializers.ModelSerializer,), attrs)
+            return type(str(serializer_name), (
+                InstrumentedSerializerMixin, SparseSerializerMixin,
+                CompiledSerializerMixin, WriteBehindSerializerMixin,
+                serializers.ModelSerializer
+            ), attrs)
         return
 
     def as_view_set(self):
-        attrs = {
-            'queryset': self.as_model().objects.all(),
-            'serializer_class': self.default_serialiser,
-            'paginate': 50,
-        }
-        if self.api_serialiser:
-            attrs.update({
-                'filter_fields': self.api_serialiser.filter_fields.split(',')
-            })
-        api_serialiser = self.as_api_serialiser()
-        if api_serialiser:
-            attrs['serializer_class'] = api_serialiser
-        viewset_name = '%sViewSet' % self.name.capitalize()
-        return type(str(viewset_name), (viewsets.ModelViewSet,), attrs)
+        with timed('schema'):
+            queryset = self.as_model().objects.all()
+            select_related = self.get_select_related()
+            if select_related:
+                queryset = queryset.select_related(*select_related)
+            attrs = {
+                'queryset': queryset,
+                'serializer_class': self.default_serialiser,
+                'paginate_by': 50,
+            }
+            if self.api_serialiser:
+                attrs.update({
+                    'search_fields': search.get_search_fields(self),
+                    'filter_fields': self.api_serialiser.filter_fields.split(','),
+                    'keyset_pagination': self.api_serialiser.pagination == 'keyset',
+                    'cache_timeout': self.api_serialiser.cache_timeout,
+                    'change_log': self.api_serialiser.change_log,
+                    'write_batch_rows': self.api_serialiser.write_batch_rows,
+                    'write_batch_ms': self.api_serialiser.write_batch_ms,
+                })
+            api_serialiser = self.as_api_serialiser()
+            if api_serialiser:
+                attrs['serializer_class'] = api_serialiser
+            viewset_name = '%sViewSet' % self.name.capitalize()
+            return type(str(viewset_name), (viewsets.ModelViewSet,), attrs)
@@ -1,14 +1,13 @@
+import threading
+
 from django.db import models
-from django.db import router
-from django.db.models.loading import cache
-from django.utils.datastructures import SortedDict
+from django.db import router, transaction
+from django.db.models.signals import pre_delete, post_delete
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 
-from south.db import db
-
-from application import actions, utils, mixins
-from application.utils import get_field_map, get_field_choices, get_unicode
+from application import actions, changelog, indexes, migrator, mixins, registry, schema, search
+from application.utils import get_field_class, FieldChoices, get_unicode
 import logging
 
 log = logging.getLogger(__name__)
@@ -76,19 +75,32 @@ class ApplicationModel(mixins.AdminMixin, mixins.ApiMixin, models.Model):
         null=True, blank=True
     )
 
+    generation = models.PositiveIntegerField(
+        help_text='Schema generation this model was last changed in',
+        default=0, db_index=True, editable=False
+    )
+
     def uncache(self):
         '''
-        Removes the model this instance represents from Django's cache
+        Moves the model this instance represents on to a new schema version
 
-        We need to remove the model from the cache whenever we change it
+        We need to drop the generated class whenever we change the model
         otherwise it won't have the changes next time it's loaded
         '''
+        registry.bump(self.app.name, self.name)
 
-        cached_models = cache.app_models.get(self.app.name, SortedDict())
-        if cached_models.has_key(self.name.lower()):
-            del cached_models[self.name.lower()]
+    def as_model(self, schema=None):
+        '''
+        Returns the model class for this definition, building it from the
+        given loader.Schema snapshot if there isn't one for its current version
+        '''
+        if schema is not None:
+            builder = lambda: schema.build_model(self)
+        else:
+            builder = self.build_model
+        return registry.get_or_build(self.app.name, self.name, builder)
 
-    def as_model(self):
+    def build_model(self, schema=None):
         attrs = {}
         class Meta:
             app_label = self.app.name
@@ -99,8 +111,11 @@ class ApplicationModel(mixins.AdminMixin, mixins.ApiMixin, models.Model):
         attrs['__module__'] = 'applications.%s.models' % self.app.name
         attrs['__unicode__'] = get_unicode
         for field in self.fields.all():
-            attrs[field.name] = field.as_field()
-        return type(str(self.name), (models.Model,), attrs)
+            attrs[field.name] = field.as_field(schema)
+        base = models.Model
+        if self.api_serialiser and self.api_serialiser.change_log:
+            base = changelog.ChangeLogModel
+        return type(str(self.name), (base,), attrs)
 
     def save(self, force_insert=False, force_update=False, using=None):
         using = using or router.db_for_write(self.__class__, instance=self)
@@ -111,11 +126,41 @@ class ApplicationModel(mixins.AdminMixin, mixins.ApiMixin, models.Model):
         if create:
             actions.create(self.as_model(), using)
         self.uncache()
+        indexes.sync_indexes(self)
+        schema.publish(self)
 
     def __unicode__(self):
         return self.verbose_name
 
 
+class SchemaGeneration(models.Model):
+    '''
+    Single row counter bumped whenever a model definition changes, so every
+    worker can tell with one read whether its generated classes are stale
+    '''
+    generation = models.PositiveIntegerField(default=0)
+
+
+class ChangeLog(models.Model):
+    '''
+    Latest change to each row of the generated models keeping a change log,
+    the id serving as the sync token of the change
+    '''
+
+    class Meta:
+        unique_together = (
+            ('app_label', 'model_name', 'object_pk'),
+        )
+        index_together = (
+            ('app_label', 'model_name', 'id'),
+        )
+
+    app_label = models.CharField(max_length=255)
+    model_name = models.CharField(max_length=64)
+    object_pk = models.CharField(max_length=255)
+    deleted = models.BooleanField(default=False)
+
+
 class AdminSetting(models.Model):
     list_filter = models.CharField(max_length=255,
         null=True, blank=True
@@ -127,6 +172,13 @@ class AdminSetting(models.Model):
         null=True, blank=True
     )
 
+    def save(self, *args, **kwargs):
+        super(AdminSetting, self).save(*args, **kwargs)
+        if hasattr(self, 'applicationmodel'):
+            self.applicationmodel.uncache()
+            search.sync_search_index(self.applicationmodel)
+            schema.publish(self.applicationmodel)
+
     def __unicode__(self):
         if hasattr(self, 'applicationmodel'):
             return u'%s.%sAdmin' % (
@@ -144,6 +196,33 @@ class ApiSerialiserSetting(models.Model):
         null=True, blank=True
     )
     nested = models.BooleanField(default=False)
+    pagination = models.CharField(
+        help_text='Keyset pagination follows the model ordering with '
+            'next/previous cursors and skips counting the table',
+        max_length=16, default='page',
+        choices=(('page', 'Page number'), ('keyset', 'Keyset')),
+    )
+    cache_timeout = models.PositiveIntegerField(
+        help_text='Seconds to cache GET responses for, leave empty to '
+            'disable caching',
+        null=True, blank=True
+    )
+    change_log = models.BooleanField(
+        help_text='Log changes to rows so clients can fetch only what '
+            'changed since their last sync. Only exact on SQLite, other '
+            'databases can commit concurrent changes out of order and a '
+            'sync may miss them',
+        default=False
+    )
+    write_batch_rows = models.PositiveIntegerField(
+        help_text='Commit single-object POST and PUT writes together, up to '
+            'this many per transaction, leave empty to commit each on its own',
+        null=True, blank=True
+    )
+    write_batch_ms = models.PositiveIntegerField(
+        help_text='Milliseconds a batched write waits for others to join it',
+        default=10
+    )
 
     class Meta:
         verbose_name = 'API settings'
@@ -163,6 +242,13 @@ class ApiSerialiserSetting(models.Model):
                         'Field "%s" does not exist' % field
                     )
 
+    def save(self, *args, **kwargs):
+        super(ApiSerialiserSetting, self).save(*args, **kwargs)
+        if hasattr(self, 'applicationmodel'):
+            self.applicationmodel.uncache()
+            indexes.sync_indexes(self.applicationmodel)
+            schema.publish(self.applicationmodel)
+
     def __unicode__(self):
         if hasattr(self, 'applicationmodel'):
             return u'%s.%sSerialiser' % (
@@ -196,7 +282,7 @@ class ModelField(models.Model):
 
     field_type = models.CharField(
         help_text='Field Data Type',
-        choices=get_field_choices(),
+        choices=FieldChoices(),
         max_length=128, null=False, blank=False
     )
 
@@ -225,7 +311,9 @@ class ModelField(models.Model):
         max_length=256, null=True, blank=True
     )
 
-    def get_related_to_model(self):
+    def get_related_to_model(self, schema=None):
+        if schema is not None:
+            return schema.get_related_to_model(self.field_type)
         ctype = ContentType.objects.get(model=self.field_type)
         try:
             model_def = ApplicationModel.objects.get(
@@ -236,7 +324,7 @@ class ModelField(models.Model):
             model_class = ctype.model_class()
         return model_class
 
-    def as_field(self):
+    def as_field(self, schema=None):
         attrs = {
             'verbose_name': self.verbose_name,
             'null': self.null,
@@ -254,15 +342,12 @@ class ModelField(models.Model):
         if self.default is not None and self.default != '':
             attrs['default'] = self.default
 
-        field_class = None
-        if self.field_type in get_field_map():
-            module, klass = get_field_map()[self.field_type]
-            field_class = utils.get_module_attr(module, klass, models.CharField)
+        field_class = get_field_class(self.field_type)
 
         if field_class is None:
             try:
                 field_class = models.ForeignKey
-                attrs['to'] = self.get_related_to_model()
+                attrs['to'] = self.get_related_to_model(schema)
                 if attrs['to'] is None:
                     del attrs['to']
                     raise Exception('Could not get model class from %s' % self.field_type)
@@ -279,31 +364,108 @@ class ModelField(models.Model):
 
         return field_class(**attrs)
 
-    def delete(self, using=None):
-        model_class = self.model.as_model()
-        table = model_class._meta.db_table
-        db.delete_column(table, self.name)
+    def save(self, force_insert=False, force_update=False, using=None):
+        previous = None
+        if self.pk is not None:
+            previous = self.__class__.objects.filter(pk=self.pk).first()
+
+        renames = {}
+        dropped = []
+        if previous is not None:
+            old_column = migrator.get_column_field(previous).column
+            new_column = migrator.get_column_field(self).column
+            if previous.name != self.name:
+                renames[old_column] = new_column
+            elif old_column != new_column:
+                # e.g. turned into a foreign key, whose column ends in _id
+                dropped.append(old_column)
+
+        with transaction.atomic():
+            super(ModelField, self).save(force_insert, force_update, using)
+            migrator.field_changed(self.model, renames, dropped)
 
-        super(ModelField, self).delete(using)
-        self.model.uncache()
+    def __unicode__(self):
+        return '%s.%s' % (
+            self.model.name, self.name
+        )
 
-    def save(self, force_insert=False, force_update=False, using=None):
-        create = False
-        if self.pk is None or not self.__class__.objects.filter(pk=self.pk).exists():
-            create = True
 
-        model_class = self.model.as_model()
-        field = self.as_field()
-        table = model_class._meta.db_table
-        if create:
-            db.add_column(table, self.name, field, keep_default=False)
-        else:
-            pass
+class ModelIndex(models.Model):
+
+    class Meta:
+        verbose_name = 'Index'
+        verbose_name_plural = 'Indexes'
+        unique_together = (
+            ('model', 'fields'),
+        )
+
+    model = models.ForeignKey('application.ApplicationModel',
+        related_name='indexes',
+        null=False, blank=False
+    )
+
+    fields = models.CharField(
+        help_text='Comma separated names of the fields to index, in order',
+        max_length=255, null=False, blank=False
+    )
+
+    unique = models.BooleanField(
+        help_text='Restrict the indexed fields to unique combinations',
+        default=False, null=False, blank=False
+    )
+
+    automatic = models.BooleanField(
+        help_text='Created for the API filter fields or model ordering',
+        default=False, null=False, blank=False, editable=False
+    )
 
-        super(ModelField, self).save(force_insert, force_update, using)
-        self.model.uncache()
+    def get_field_names(self):
+        return [name.strip() for name in self.fields.split(',')]
+
+    def save(self, force_insert=False, force_update=False, using=None):
+        self.fields = ','.join(self.get_field_names())
+        if self.pk is not None:
+            previous = self.__class__.objects.filter(pk=self.pk).first()
+            if previous is not None:
+                indexes.drop_index(self.model, previous.get_field_names())
+        super(ModelIndex, self).save(force_insert, force_update, using)
+        indexes.create_index(self.model, self.get_field_names(), self.unique)
+
+    def delete(self, using=None):
+        indexes.drop_index(self.model, self.get_field_names())
+        super(ModelIndex, self).delete(using)
 
     def __unicode__(self):
-        return '%s.%s' % (
-            self.model.name, self.name
+        return '%s(%s)' % (self.model.name, self.fields)
+
+
+# Definitions are also deleted by cascades and queryset deletes, which
+# don't call delete(), so deletions are handled through the signals
+_deleting = threading.local()
+
+
+def model_deleting(sender, instance, **kwargs):
+    if not hasattr(_deleting, 'pks'):
+        _deleting.pks = set()
+    _deleting.pks.add(instance.pk)
+
+
+def model_deleted(sender, instance, **kwargs):
+    _deleting.pks.discard(instance.pk)
+    ChangeLog.objects.filter(
+        app_label=instance.app.name, model_name=instance.name.lower()
+    ).delete()
+    instance.uncache()
+    schema.bump_generation()
+
+
+def field_deleted(sender, instance, **kwargs):
+    # Fields deleted along with their model leave its table be
+    if instance.model_id not in getattr(_deleting, 'pks', ()):
+        migrator.field_changed(
+            instance.model, dropped=[migrator.get_column_field(instance).column]
         )
+
+pre_delete.connect(model_deleting, sender=ApplicationModel)
+post_delete.connect(model_deleted, sender=ApplicationModel)
+post_delete.connect(field_deleted, sender=ModelField)
@@ -0,0 +1,144 @@
+'''
+Keyset (cursor) pagination for the generated viewsets.
+
+Pages are fetched with a ``WHERE`` on the ordering columns of the last row
+seen rather than an ``OFFSET``, and without counting the table, so a deep
+page costs the same as the first one. Ordering fields should be non-null
+columns of the model itself; the primary key is always added as the final
+tie breaker.
+'''
+import base64
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.response import Response
+from rest_framework.templatetags.rest_framework import replace_query_param
+
+
+def get_keyset_ordering(queryset):
+    '''
+    Returns the queryset's ordering as (field name, descending) pairs,
+    ending with the primary key
+    '''
+    opts = queryset.model._meta
+    ordering = queryset.query.order_by or opts.ordering
+    keyset = []
+    for name in ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name == '?' or '__' in name:
+            raise exceptions.ParseError(
+                'Cannot paginate by cursor on "%s"' % name
+            )
+        if name == 'pk':
+            name = opts.pk.name
+        keyset.append((opts.get_field(name).name, descending))
+        if name == opts.pk.name:
+            break
+    else:
+        keyset.append((opts.pk.name, False))
+    return keyset
+
+
+def get_keyset_filter(keyset, values, backwards=False):
+    '''
+    Builds the filter matching rows that come after ``values`` in the
+    keyset ordering, or before them when going backwards
+    '''
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(keyset, values):
+        lookup = 'lt' if descending != backwards else 'gt'
+        condition |= equal & Q(**{'%s__%s' % (name, lookup): value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def encode_cursor(values, backwards=False):
+    data = {'v': values, 'd': 'p' if backwards else 'n'}
+    return base64.urlsafe_b64encode(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def decode_cursor(cursor, keyset):
+    '''
+    Returns the (values, backwards) encoded in a cursor
+    '''
+    try:
+        data = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        values, backwards = data['v'], data['d'] == 'p'
+    except (TypeError, ValueError, KeyError):
+        raise exceptions.ParseError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(keyset):
+        raise exceptions.ParseError('Invalid cursor')
+    return values, backwards
+
+
+class KeysetPaginationMixin(object):
+    '''
+    Switches a viewset's list to keyset pagination when
+    ``keyset_pagination`` is set.
+
+    Responses carry opaque ``next`` and ``previous`` links in place of the
+    page number links and count.
+    '''
+    keyset_pagination = False
+    cursor_query_param = 'cursor'
+
+    def list(self, request, *args, **kwargs):
+        if not self.keyset_pagination:
+            return super(KeysetPaginationMixin, self).list(request, *args, **kwargs)
+
+        # The filter backend applies an ordering of its own, so take the
+        # keyset from the unfiltered queryset
+        queryset = self.get_queryset()
+        keyset = get_keyset_ordering(queryset)
+        queryset = self.filter_queryset(queryset)
+        page_size = self.get_paginate_by()
+
+        cursor = request.QUERY_PARAMS.get(self.cursor_query_param)
+        backwards = False
+        if cursor:
+            values, backwards = decode_cursor(cursor, keyset)
+            queryset = queryset.filter(
+                get_keyset_filter(keyset, values, backwards)
+            )
+        queryset = queryset.order_by(*[
+            ('-%s' if descending != backwards else '%s') % name
+            for name, descending in keyset
+        ])
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        next_url = previous_url = None
+        if rows and (has_more if not backwards else cursor):
+            next_url = self.get_cursor_url(keyset, rows[-1])
+        if rows and (has_more if backwards else cursor):
+            previous_url = self.get_cursor_url(keyset, rows[0], True)
+
+        serializer = self.get_serializer(rows, many=True)
+        return Response({
+            'next': next_url,
+            'previous': previous_url,
+            'results': serializer.data,
+        })
+
+    def get_cursor_url(self, keyset, row, backwards=False):
+        if isinstance(row, dict):
+            # A values() row, keyed by field name
+            values = [row[name] for name, descending in keyset]
+        else:
+            opts = row._meta
+            values = [
+                getattr(row, opts.get_field(name).attname)
+                for name, descending in keyset
+            ]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, encode_cursor(values, backwards)
+        )
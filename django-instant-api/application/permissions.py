@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import permissions
 
 class IsOwner(permissions.BasePermission):
@@ -8,4 +9,18 @@ class IsOwner(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         # Instance must have an attribute named `owner`.
-        return obj.owner == request.user
\ No newline at end of file
+        return obj.owner == request.user
+
+
+class IsStatsReader(permissions.BasePermission):
+    """
+    Allows staff users, and requests from INSTANT_API_STATS_ALLOWED_IPS.
+    REMOTE_ADDR is all that's checked, so only list addresses that can't
+    be reached through a proxy.
+    """
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        address = request.META.get('REMOTE_ADDR')
+        return address in getattr(settings, 'INSTANT_API_STATS_ALLOWED_IPS', ())
@@ -0,0 +1,132 @@
+'''
+Process-wide registry of the model classes generated from ApplicationModel
+definitions.
+
+Classes are keyed by (app label, model name, schema version). The same class
+is handed out until the definition changes and ``bump`` moves the model on to
+a new version, at which point the next lookup builds a fresh class.
+'''
+import threading
+
+from django.db.models.loading import cache
+
+from application.instrumentation import timed
+
+_lock = threading.RLock()
+_versions = {}
+_classes = {}
+_keys = {}
+_memos = {}
+
+
+def _key(app_label, model_name):
+    return (app_label, model_name.lower())
+
+
+def get_version(app_label, model_name):
+    return _versions.get(_key(app_label, model_name), 0)
+
+
+def get(app_label, model_name):
+    '''
+    Returns the class registered for the current version of a model, or None
+    '''
+    key = _key(app_label, model_name)
+    return _classes.get(key + (_versions.get(key, 0),))
+
+
+def get_or_build(app_label, model_name, builder):
+    '''
+    Returns the class for the current version of a model, calling
+    ``builder`` to create it when the registry doesn't hold one yet
+    '''
+    key = _key(app_label, model_name)
+    with _lock:
+        version_key = key + (_versions.get(key, 0),)
+        model_class = _classes.get(version_key)
+        if model_class is None:
+            # Django hands back whatever is in its app cache for this name
+            # instead of creating a new class, so clear it out first
+            _evict_app_cache(*key)
+            with timed('schema'):
+                model_class = builder()
+            _classes[version_key] = model_class
+            _keys[model_class] = key
+        return model_class
+
+
+def memoise(app_label, model_name, name, builder):
+    '''
+    Returns a value derived from the current version of a model, such as a
+    serialiser class, calling ``builder`` the first time it's asked for
+    '''
+    key = _key(app_label, model_name)
+    with _lock:
+        version = _versions.get(key, 0)
+        memo = _memos.get(key + (name,))
+        if memo is None or memo[0] != version:
+            with timed('schema'):
+                memo = (version, builder())
+            _memos[key + (name,)] = memo
+        return memo[1]
+
+
+def get_key(model_class):
+    '''
+    Returns the (app label, model name) a generated class is registered
+    under, or None if it isn't a current generated class
+    '''
+    return _keys.get(model_class)
+
+
+def bump(app_label, model_name):
+    '''
+    Moves a model on to a new schema version, dropping its class.
+
+    Models with foreign keys to the dropped class are bumped as well, since
+    their relations would otherwise keep pointing at the stale class.
+    '''
+    key = _key(app_label, model_name)
+    with _lock:
+        version = _versions.get(key, 0)
+        _versions[key] = version + 1
+        stale = _classes.pop(key + (version,), None)
+        _evict_app_cache(*key)
+        if stale is None:
+            return
+        _keys.pop(stale, None)
+        for other_key, model_class in list(_classes.items()):
+            if _references(model_class, stale):
+                bump(*other_key[:2])
+
+
+def is_dynamic(model_class):
+    '''
+    Returns True if the class was built from an ApplicationModel
+    '''
+    return model_class in _keys
+
+
+def clear():
+    with _lock:
+        for key in list(_classes):
+            _evict_app_cache(*key[:2])
+        _classes.clear()
+        _keys.clear()
+        _versions.clear()
+        _memos.clear()
+
+
+def _references(model_class, target):
+    for field in model_class._meta.fields:
+        rel = getattr(field, 'rel', None)
+        if rel is not None and rel.to is target:
+            return True
+    return False
+
+
+def _evict_app_cache(app_label, model_name):
+    cached_models = cache.app_models.get(app_label, {})
+    if model_name in cached_models:
+        del cached_models[model_name]
+    cache._get_models_cache.clear()
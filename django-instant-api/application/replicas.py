@@ -0,0 +1,155 @@
+'''
+Read replicas for the generated models.
+
+ReplicaRouter sends reads of generated models to one of the database
+aliases listed in the INSTANT_API_REPLICAS setting and their writes to the
+primary. A client that has just written keeps reading from the primary for
+INSTANT_API_STICKY_SECONDS, tracked by ReplicaMiddleware with a cookie, so
+it sees its own writes whatever the replication lag.
+
+Generated tables are created and migrated on the primary and on every
+replica alias.
+'''
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models.signals import post_save, post_delete
+
+from application import registry
+
+STICKY_COOKIE = 'instant_api_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_local = threading.local()
+
+
+def get_replicas():
+    '''
+    Returns the configured replica aliases, leaving out the primary and
+    aliases missing from DATABASES
+    '''
+    return [
+        alias for alias in getattr(settings, 'INSTANT_API_REPLICAS', ())
+        if alias != DEFAULT_DB_ALIAS and alias in connections.databases
+    ]
+
+
+def get_schema_aliases(using=None):
+    '''
+    Returns the aliases the tables of generated models live in, the
+    primary first
+    '''
+    aliases = [using or DEFAULT_DB_ALIAS]
+    for alias in get_replicas():
+        if alias not in aliases:
+            aliases.append(alias)
+    return aliases
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'INSTANT_API_STICKY_SECONDS', 5)
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', 0) > 0
+
+
+@contextmanager
+def primary():
+    '''
+    Reads from the primary inside the block
+    '''
+    _local.pinned = getattr(_local, 'pinned', 0) + 1
+    try:
+        yield
+    finally:
+        _local.pinned -= 1
+
+
+def get_replica():
+    '''
+    Returns the replica this thread reads from, picked once per request so
+    a request sees a single replica
+    '''
+    replicas = get_replicas()
+    replica = getattr(_local, 'replica', None)
+    if replica not in replicas:
+        replica = _local.replica = random.choice(replicas)
+    return replica
+
+
+def start_request(sticky=False):
+    '''
+    Starts a request, reading from the primary throughout if ``sticky``
+    '''
+    _local.replica = None
+    _local.pinned = 1 if sticky else 0
+    _local.written = False
+
+
+def finish_request():
+    '''
+    Ends a request and returns True if it wrote to a generated model
+    '''
+    written = getattr(_local, 'written', False)
+    start_request()
+    return written
+
+
+def mark_written(sender, **kwargs):
+    if registry.is_dynamic(sender):
+        _local.written = True
+        _local.pinned = max(getattr(_local, 'pinned', 0), 1)
+
+post_save.connect(mark_written)
+post_delete.connect(mark_written)
+
+
+def is_sticky(request):
+    '''
+    Returns True if the request writes or comes from a client that wrote
+    within the last INSTANT_API_STICKY_SECONDS
+    '''
+    if request.method not in SAFE_METHODS:
+        return True
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def set_sticky(response):
+    seconds = get_sticky_seconds()
+    response.set_cookie(STICKY_COOKIE, '%.3f' % (time.time() + seconds),
+                        max_age=seconds, httponly=True)
+
+
+class ReplicaRouter(object):
+    '''
+    Database router reading generated models from the replicas, unless
+    pinned to the primary, and writing them to the primary. Other models
+    are left to the next router.
+    '''
+
+    def db_for_read(self, model, **hints):
+        if not registry.is_dynamic(model) or is_pinned():
+            return None
+        if not get_replicas():
+            return None
+        return get_replica()
+
+    def db_for_write(self, model, **hints):
+        # Instances read from a replica are saved to the primary all the same
+        if registry.is_dynamic(model):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = get_schema_aliases()
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
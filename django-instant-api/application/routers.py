@@ -0,0 +1,88 @@
+from django.conf.urls import url
+from django.utils.datastructures import SortedDict
+from rest_framework import routers
+
+from application.instrumentation import StatsView
+from application.utils import reset_url_caches
+from application.viewsets import lazy_view_set
+
+
+class SchemaRouter(routers.DefaultRouter):
+    '''
+    DefaultRouter whose registrations follow ApplicationModel changes.
+
+    ``urls`` is a single list that ``refresh`` rewrites in place, so the
+    URLconf including it picks up new and removed endpoints without a restart.
+    '''
+    collection_route = routers.Route(
+        url=r'^{prefix}/{methodname}{trailing_slash}$',
+        mapping={},
+        name='{basename}-{methodnamehyphen}',
+        initkwargs={}
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(SchemaRouter, self).__init__(*args, **kwargs)
+        self.entries = SortedDict()
+        self._urls = []
+
+    def get_routes(self, viewset):
+        '''
+        Adds routes for the viewset's collection actions, ahead of the
+        detail route that would otherwise take their name for a key
+        '''
+        routes = super(SchemaRouter, self).get_routes(viewset)
+        collection_routes = []
+        for methodname in dir(viewset):
+            httpmethods = getattr(
+                getattr(viewset, methodname), 'collection_methods', None
+            )
+            if httpmethods:
+                collection_routes.append(self.collection_route._replace(
+                    url=routers.replace_methodname(
+                        self.collection_route.url, methodname
+                    ),
+                    mapping=dict(
+                        (httpmethod.lower(), methodname)
+                        for httpmethod in httpmethods
+                    ),
+                    name=routers.replace_methodname(
+                        self.collection_route.name, methodname
+                    ),
+                ))
+        return routes[:1] + collection_routes + routes[1:]
+
+    def get_urls(self):
+        '''
+        Adds the instrumentation stats endpoint at ``_stats/``
+        '''
+        urls = super(SchemaRouter, self).get_urls()
+        return [
+            url(r'^_stats/$', StatsView.as_view(), name='instant-api-stats'),
+        ] + urls
+
+    def register_model(self, app_model):
+        '''
+        Routes a model's endpoint without building anything, its viewset is
+        built by the first request to reach it
+        '''
+        self.entries[app_model.pk] = (
+            app_model.get_endpoint_name(), lazy_view_set(app_model)
+        )
+
+    def unregister_model(self, pk):
+        self.entries.pop(pk, None)
+
+    def refresh(self):
+        self.registry = []
+        for prefix, viewset in self.entries.values():
+            self.register(prefix, viewset, base_name=viewset.base_name)
+        self._urls[:] = self.get_urls()
+        reset_url_caches()
+
+    def warm(self):
+        '''
+        Builds the viewset of every routed model up front
+        '''
+        for prefix, viewset in self.entries.values():
+            viewset.get_view_set()
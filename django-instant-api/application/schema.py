@@ -0,0 +1,171 @@
+'''
+Keeps each worker's generated models, admin registrations and API routes in
+step with the schema generation stored in the database.
+
+Every change to a model definition bumps the ``SchemaGeneration`` counter and
+stamps the changed ApplicationModel with the new value. Workers compare the
+counter with the one they last loaded on each request and only rebuild the
+models stamped since then.
+'''
+import logging
+import threading
+
+from django.db import transaction
+from django.db.models import F, get_model
+
+from application import registry, snapshot
+from application.loader import Schema
+
+log = logging.getLogger(__name__)
+
+
+def bump_generation():
+    '''
+    Increments the shared schema generation and returns the new value
+    '''
+    SchemaGeneration = get_model('application', 'SchemaGeneration')
+    counter = SchemaGeneration.objects.filter(pk=1)
+    if not counter.update(generation=F('generation') + 1):
+        SchemaGeneration.objects.get_or_create(pk=1)
+        counter.update(generation=F('generation') + 1)
+    return counter.values_list('generation', flat=True)[0]
+
+
+def current_generation():
+    SchemaGeneration = get_model('application', 'SchemaGeneration')
+    generations = SchemaGeneration.objects.filter(pk=1).values_list(
+        'generation', flat=True
+    )
+    return generations[0] if generations else 0
+
+
+def publish(app_model):
+    '''
+    Marks a model definition as changed so other workers rebuild it
+    '''
+    # A worker must never see the new generation without the stamp
+    with transaction.atomic():
+        generation = bump_generation()
+        app_model.__class__.objects.filter(pk=app_model.pk).update(
+            generation=generation
+        )
+    app_model.generation = generation
+
+
+class SchemaWatcher(object):
+    '''
+    Tracks the schema generation a worker has loaded and refreshes its
+    targets when the shared one moves on.
+
+    A target is anything that publishes the generated models, such as the
+    API router or the admin site. It provides ``register_model(app_model)``,
+    ``unregister_model(pk)`` and ``refresh()``, the latter being called once
+    after a batch of changes, and ``warm()`` to build whatever it would
+    otherwise build on demand.
+    '''
+
+    def __init__(self):
+        self.generation = None
+        self.targets = []
+        self.registered = {}
+        self._snapshot = None
+        self._lock = threading.RLock()
+
+    def load_schema(self):
+        '''
+        Returns every model definition at the loaded generation, from the
+        INSTANT_API_SCHEMA_SNAPSHOT file when that was taken at it
+        '''
+        path = snapshot.get_snapshot_path()
+        if path:
+            if self._snapshot is not None and self._snapshot[0] == self.generation:
+                return self._snapshot[1]
+            try:
+                schema = snapshot.load_file(path, self.generation)
+            except snapshot.SnapshotError as exc:
+                log.warning('Loading the schema from the database: %s', exc)
+            else:
+                self._snapshot = (self.generation, schema)
+                return schema
+        return Schema.load()
+
+    def attach(self, target):
+        with self._lock:
+            if self.generation is None:
+                self.generation = current_generation()
+            for app_model in self.load_schema().app_models:
+                self._register(target, app_model)
+            target.refresh()
+            self.targets.append(target)
+
+    def warm(self):
+        '''
+        Builds every generated class and has the targets build theirs, for
+        workers that should pay for the whole schema before serving
+        '''
+        with self._lock:
+            if self.generation is None:
+                self.generation = current_generation()
+            self.load_schema().build()
+            for target in self.targets:
+                target.warm()
+
+    def sync(self):
+        '''
+        Brings the targets up to date with the shared schema generation.
+
+        Returns True if anything was rebuilt. When nothing has changed this
+        costs a single primary key lookup.
+        '''
+        generation = current_generation()
+        if self.generation is None:
+            # Nothing attached yet, attaching loads the whole schema
+            self.generation = generation
+        if generation == self.generation:
+            return False
+        ApplicationModel = get_model('application', 'ApplicationModel')
+        with self._lock:
+            if generation == self.generation:
+                return False
+            live = set(ApplicationModel.objects.values_list('pk', flat=True))
+            for pk in set(self.registered) - live:
+                self._unregister(pk)
+
+            changed = Schema.load(ApplicationModel.objects.filter(
+                generation__gt=self.generation
+            ))
+            for app_model in changed.app_models:
+                registry.bump(app_model.app.name, app_model.name)
+
+            # Bumping a model also drops the classes of models with foreign
+            # keys to it, so those need registering again as well
+            stale = [
+                pk for pk, (key, version) in self.registered.items()
+                if registry.get_version(*key) != version
+            ]
+            changed_pks = set(app_model.pk for app_model in changed.app_models)
+            if set(stale) - changed_pks:
+                changed = Schema.load(ApplicationModel.objects.filter(
+                    pk__in=set(stale) | changed_pks
+                ))
+
+            for app_model in changed.app_models:
+                for target in self.targets:
+                    self._register(target, app_model)
+            for target in self.targets:
+                target.refresh()
+            self.generation = generation
+        return True
+
+    def _register(self, target, app_model):
+        target.register_model(app_model)
+        key = (app_model.app.name, app_model.name)
+        self.registered[app_model.pk] = (key, registry.get_version(*key))
+
+    def _unregister(self, pk):
+        for target in self.targets:
+            target.unregister_model(pk)
+        del self.registered[pk]
+
+
+watcher = SchemaWatcher()
@@ -0,0 +1,435 @@
+'''
+Full-text search for generated models.
+
+The text columns among a model's admin search fields are indexed for the
+``?search=`` filter of its viewset and for its admin's search box. Matching
+rows contain every word searched for, the last one as a prefix so results
+follow what is being typed, and come back most relevant first.
+
+On SQLite the index is an FTS5 table over the model's table, kept in sync
+by triggers and ranked by bm25. Other databases, or SQLite builds without
+FTS5, use an inverted index held by each process. It is built once per
+schema version and search fields, and the rows this process saves or
+deletes are re-read into it on the next search. Changes it can't account
+for, made by other processes or by writes that send no signals, rebuild
+it at most once every INSTANT_API_SEARCH_REBUILD_INTERVAL seconds.
+'''
+import heapq
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connections, transaction, DatabaseError
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from rest_framework.filters import BaseFilterBackend
+
+from application import registry, replicas
+from application.caching import get_data_version
+
+TEXT_TYPES = ('CharField', 'EmailField', 'SlugField', 'TextField', 'URLField')
+
+# Rows looked up at a time when re-reading changed rows into an index
+CHUNK_SIZE = 500
+# Most matches the in-process index hands to the database, best first
+SEARCH_LIMIT = 1000
+
+_fts5 = {}
+_indexes = {}
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower(), re.UNICODE)
+
+
+def get_search_fields(app_model):
+    '''
+    Returns the names of the text fields among the model's admin search
+    fields, in the order given
+    '''
+    admin = app_model.admin
+    if admin is None or not admin.search_fields:
+        return []
+    opts = app_model.as_model()._meta
+    names = []
+    for name in admin.search_fields.split(','):
+        name = name.strip().lstrip('^=@')
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.get_internal_type() in TEXT_TYPES and field.name not in names:
+            names.append(field.name)
+    return names
+
+
+def get_fts_table(table):
+    return '%s_fts' % table
+
+
+def has_fts5(connection):
+    '''
+    Returns True if the database is SQLite with FTS5 compiled in
+    '''
+    if connection.vendor != 'sqlite':
+        return False
+    if not getattr(settings, 'INSTANT_API_SEARCH_FTS', True):
+        return False
+    if connection.alias not in _fts5:
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA compile_options')
+        options = [row[0] for row in cursor.fetchall()]
+        if 'ENABLE_FTS5' in options:
+            _fts5[connection.alias] = True
+        else:
+            try:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute('CREATE VIRTUAL TABLE temp._fts5_check USING fts5(x)')
+                    cursor.execute('DROP TABLE temp._fts5_check')
+                _fts5[connection.alias] = True
+            except DatabaseError:
+                _fts5[connection.alias] = False
+    return _fts5[connection.alias]
+
+
+def get_fts_statements(model_class, columns, quote_name):
+    '''
+    Returns the statements creating the FTS5 table and its triggers for
+    the given columns, keyed by the name of what they create
+    '''
+    opts = model_class._meta
+    table = opts.db_table
+    fts = get_fts_table(table)
+    names = ', '.join(quote_name(column) for column in columns)
+
+    def values(prefix):
+        return ', '.join(
+            '%s.%s' % (prefix, quote_name(column))
+            for column in [opts.pk.column] + columns
+        )
+
+    insert = 'INSERT INTO %s(rowid, %s) VALUES (%s);' % (
+        quote_name(fts), names, values('new')
+    )
+    delete = "INSERT INTO %s(%s, rowid, %s) VALUES ('delete', %s);" % (
+        quote_name(fts), quote_name(fts), names, values('old')
+    )
+    trigger = 'CREATE TRIGGER %s AFTER %s ON %s BEGIN %s END'
+    return [
+        (fts, 'CREATE VIRTUAL TABLE %s USING fts5(%s, content=%s, content_rowid=%s)' % (
+            quote_name(fts), names, quote_name(table), quote_name(opts.pk.column)
+        )),
+        (fts + '_ai', trigger % (quote_name(fts + '_ai'), 'INSERT', quote_name(table), insert)),
+        (fts + '_ad', trigger % (quote_name(fts + '_ad'), 'DELETE', quote_name(table), delete)),
+        (fts + '_au', trigger % (
+            quote_name(fts + '_au'), 'UPDATE', quote_name(table), delete + ' ' + insert
+        )),
+    ]
+
+
+def sync_fts(model_class, columns, using):
+    '''
+    Creates, replaces or drops the FTS5 table and triggers of a model's
+    table so they index the given columns, leaving them be if they do
+    '''
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    fts = get_fts_table(model_class._meta.db_table)
+    wanted = get_fts_statements(model_class, columns, quote_name) if columns else []
+    cursor = connection.cursor()
+    names = [fts, fts + '_ai', fts + '_ad', fts + '_au']
+    cursor.execute(
+        'SELECT name, sql FROM sqlite_master WHERE name IN (%s)' % ', '.join(['%s'] * 4),
+        names
+    )
+    existing = dict(cursor.fetchall())
+    if existing == dict(wanted):
+        return
+    with transaction.atomic(using=using):
+        for name in names[1:]:
+            if name in existing:
+                cursor.execute('DROP TRIGGER %s' % quote_name(name))
+        if fts in existing:
+            cursor.execute('DROP TABLE %s' % quote_name(fts))
+        for name, sql in wanted:
+            cursor.execute(sql)
+        if wanted:
+            cursor.execute("INSERT INTO %s(%s) VALUES ('rebuild')" % (
+                quote_name(fts), quote_name(fts)
+            ))
+
+
+def sync_search_index(app_model):
+    '''
+    Brings the FTS5 index of a model in line with its search fields on
+    every database it lives in
+    '''
+    model_class = app_model.as_model()
+    opts = model_class._meta
+    columns = [opts.get_field(name).column for name in get_search_fields(app_model)]
+    for alias in replicas.get_schema_aliases():
+        if has_fts5(connections[alias]):
+            sync_fts(model_class, columns, alias)
+
+
+def has_fts_table(model_class, using):
+    key = registry.get_key(model_class)
+
+    def check():
+        connection = connections[using]
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [get_fts_table(model_class._meta.db_table)]
+        )
+        return cursor.fetchone() is not None
+    if key is None:
+        return check()
+    return registry.memoise(key[0], key[1], 'fts_table:%s' % using, check)
+
+
+class SearchIndex(object):
+    '''
+    Inverted index of the search fields of a model's rows, scoring matches
+    by term frequency weighted by how rare the term is
+    '''
+
+    def __init__(self, version, data_version):
+        self.version = version
+        self.data_version = data_version
+        self.built_at = time.time()
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.postings = {}
+        self.tokens = []
+        self.stale = set()
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    def add(self, pk, values):
+        self.remove(pk)
+        counts = {}
+        for token in tokenize(u' '.join(value for value in values if value)):
+            counts[token] = counts.get(token, 0) + 1
+        self.rows[pk] = counts
+        for token, count in counts.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                insort(self.tokens, token)
+            self.postings[token][pk] = count
+
+    def remove(self, pk):
+        for token in self.rows.pop(pk, ()):
+            postings = self.postings[token]
+            del postings[pk]
+            if not postings:
+                del self.postings[token]
+                del self.tokens[bisect_left(self.tokens, token)]
+
+    def mark_stale(self, pk):
+        with self.lock:
+            self.stale.add(pk)
+
+    def is_outdated(self, model_class):
+        '''
+        Returns True if the model's rows changed in ways the index hasn't
+        been told about and it's been up long enough to be rebuilt
+        '''
+        if self.stale or self.data_version == get_data_version(model_class):
+            return False
+        interval = getattr(settings, 'INSTANT_API_SEARCH_REBUILD_INTERVAL', 30)
+        return time.time() - self.built_at >= interval
+
+    def refresh(self, model_class, fields, using):
+        '''
+        Re-reads the rows saved or deleted since the last search
+        '''
+        with self.lock:
+            if not self.stale:
+                return
+            data_version = get_data_version(model_class)
+            pks = list(self.stale)
+            self.stale.clear()
+            manager = model_class._default_manager.using(using)
+            for offset in range(0, len(pks), CHUNK_SIZE):
+                chunk = pks[offset:offset + CHUNK_SIZE]
+                for pk in chunk:
+                    self.remove(pk)
+                for row in manager.filter(pk__in=chunk).values_list('pk', *fields):
+                    self.add(row[0], row[1:])
+            self.data_version = data_version
+
+    def lookup(self, term, prefix=False):
+        '''
+        Returns {pk: count} for a term, or for every term it starts
+        '''
+        if not prefix:
+            return self.postings.get(term, {})
+        matches = {}
+        index = bisect_left(self.tokens, term)
+        while index < len(self.tokens) and self.tokens[index].startswith(term):
+            for pk, count in self.postings[self.tokens[index]].items():
+                matches[pk] = matches.get(pk, 0) + count
+            index += 1
+        return matches
+
+    def search(self, terms, limit=None):
+        '''
+        Returns the keys of the rows matching every term, best first, the
+        first ``limit`` of them if given
+        '''
+        with self.lock:
+            scores = None
+            for position, term in enumerate(terms):
+                matches = self.lookup(term, prefix=position == len(terms) - 1)
+                idf = math.log(1 + (self.row_count - len(matches) + 0.5) / (len(matches) + 0.5))
+                if scores is None:
+                    scores = dict((pk, count * idf) for pk, count in matches.items())
+                else:
+                    scores = dict(
+                        (pk, score + matches[pk] * idf)
+                        for pk, score in scores.items() if pk in matches
+                    )
+                if not scores:
+                    return []
+        key = lambda pk: (-scores[pk], pk)
+        if limit is None:
+            return sorted(scores, key=key)
+        return heapq.nsmallest(limit, scores, key=key)
+
+
+def build_search_index(model_class, fields, using, version):
+    index = SearchIndex(version, get_data_version(model_class))
+    rows = model_class._default_manager.using(using).values_list('pk', *fields)
+    for row in rows.iterator():
+        index.add(row[0], row[1:])
+    return index
+
+
+def get_search_index(model_class, fields, using):
+    '''
+    Returns the in-process index of a model's search fields, built on first
+    use and again when its schema or search fields change
+    '''
+    app_label, model_name = registry.get_key(model_class)
+    key = (using, app_label, model_name)
+    version = (registry.get_version(app_label, model_name), tuple(fields))
+    lock = registry.memoise(app_label, model_name, 'search_lock', threading.Lock)
+    index = _indexes.get(key)
+    if index is None or index.version != version:
+        with lock:
+            index = _indexes.get(key)
+            if index is None or index.version != version:
+                index = _indexes[key] = build_search_index(
+                    model_class, fields, using, version
+                )
+    elif index.is_outdated(model_class) and lock.acquire(False):
+        # Searches carry on with the current index while one rebuilds it
+        try:
+            index = _indexes[key] = build_search_index(
+                model_class, fields, using, version
+            )
+        finally:
+            lock.release()
+    index.refresh(model_class, fields, using)
+    return index
+
+
+def row_changed(sender, instance, **kwargs):
+    key = registry.get_key(sender)
+    if key is None:
+        return
+    for (using, app_label, model_name), index in _indexes.items():
+        if (app_label, model_name) == key:
+            index.mark_stale(instance.pk)
+
+post_save.connect(row_changed)
+post_delete.connect(row_changed)
+
+
+def get_match_expression(terms):
+    '''
+    Returns the FTS5 query matching every term, the last as a prefix
+    '''
+    quoted = ['"%s"' % term.replace('"', '""') for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_queryset(queryset, fields, query):
+    '''
+    Narrows a queryset to the rows whose search fields match the query,
+    ordered most relevant first. Without FTS5 only the best
+    INSTANT_API_SEARCH_LIMIT matches are kept, so the query stays bounded.
+    '''
+    terms = tokenize(query)
+    if not terms or not fields:
+        return queryset
+    model_class = queryset.model
+    opts = model_class._meta
+    connection = connections[queryset.db]
+    quote_name = connection.ops.quote_name
+    table = opts.db_table
+    if has_fts5(connection) and has_fts_table(model_class, queryset.db):
+        fts = get_fts_table(table)
+        return queryset.extra(
+            tables=[fts],
+            where=[
+                '%s.rowid = %s.%s' % (quote_name(fts), quote_name(table), quote_name(opts.pk.column)),
+                '%s MATCH %%s' % quote_name(fts),
+            ],
+            params=[get_match_expression(terms)],
+            order_by=['%s.rank' % quote_name(fts)],
+        )
+
+    limit = getattr(settings, 'INSTANT_API_SEARCH_LIMIT', SEARCH_LIMIT)
+    pks = get_search_index(model_class, fields, queryset.db).search(terms, limit)
+    if not pks:
+        return queryset.none()
+    # Generated models have integer keys, written out rather than passed as
+    # parameters, which SQLite allows no more than 999 of
+    column = '%s.%s' % (quote_name(table), quote_name(opts.pk.column))
+    rank = 'CASE %s %s END' % (column, ' '.join(
+        'WHEN %d THEN %d' % (int(pk), position) for position, pk in enumerate(pks)
+    ))
+    return queryset.extra(
+        select={'search_rank': rank},
+        where=['%s IN (%s)' % (column, ', '.join('%d' % int(pk) for pk in pks))],
+        order_by=['search_rank'],
+    )
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    '''
+    Filters a generated viewset by ``?search=`` over its ``search_fields``
+    '''
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.QUERY_PARAMS.get(self.search_param)
+        fields = getattr(view, 'search_fields', None)
+        if not query or not fields:
+            return queryset
+        return search_queryset(queryset, fields, query)
+
+
+class SearchAdminMixin(object):
+    '''
+    Answers the admin's search box from the full-text index when every
+    search field is indexed, leaving other searches to Django
+    '''
+    full_text_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = [name.lstrip('^=@') for name in self.search_fields or ()]
+        if (search_term and self.full_text_fields and
+                set(search_fields) == set(self.full_text_fields)):
+            return search_queryset(queryset, self.full_text_fields, search_term), False
+        return super(SearchAdminMixin, self).get_search_results(
+            request, queryset, search_term
+        )
@@ -0,0 +1,203 @@
+'''
+Schema snapshots for starting workers without reading the meta tables.
+
+``manage.py export_schema`` writes every model definition, with its app,
+fields, admin and API settings, to a JSON file along with what the fields
+resolve to: their field classes and the models foreign keys point at. A
+worker whose INSTANT_API_SCHEMA_SNAPSHOT names that file builds its models
+from it instead of querying the definitions, as long as the snapshot was
+taken at the shared schema generation. A stale or unreadable snapshot is
+rejected and the worker loads the schema from the database as before.
+'''
+import json
+import os
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import get_model
+
+from application import registry
+from application.loader import Schema
+from application.utils import get_field_class
+
+FORMAT = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class StaleSnapshot(SnapshotError):
+    pass
+
+
+def get_snapshot_path():
+    return getattr(settings, 'INSTANT_API_SCHEMA_SNAPSHOT', None)
+
+
+def get_class_path(cls):
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def dump_row(obj):
+    if obj is None:
+        return None
+    return dict(
+        (field.attname, field.value_from_object(obj))
+        for field in obj._meta.concrete_fields
+    )
+
+
+def load_row(model_class, values, using=DEFAULT_DB_ALIAS):
+    '''
+    Returns an instance of a row as if it had been read from the database
+    '''
+    if values is None:
+        return None
+    obj = model_class(**dict((str(name), value) for name, value in values.items()))
+    obj._state.adding = False
+    obj._state.db = using
+    return obj
+
+
+def resolve_field(schema, field):
+    '''
+    Returns the class path of a field and the 'app_label.model' it points
+    at, if it's a foreign key
+    '''
+    field_class = get_field_class(field.field_type)
+    if field_class is not None:
+        return get_class_path(field_class), None
+    try:
+        ctype = schema.get_content_type(field.field_type)
+    except (ContentType.DoesNotExist, ContentType.MultipleObjectsReturned):
+        # as_field() falls back to a CharField
+        return 'django.db.models.fields.CharField', None
+    return 'django.db.models.fields.related.ForeignKey', '%s.%s' % (
+        ctype.app_label, ctype.model
+    )
+
+
+def export(generation, schema=None):
+    '''
+    Returns the snapshot of the whole schema, which should be loaded after
+    reading ``generation`` so changes in between make the snapshot stale
+    rather than mislabelled
+    '''
+    schema = schema or Schema.load()
+    content_types = {}
+    models = []
+    for app_model in schema.app_models:
+        fields = []
+        for field in app_model.fields.all():
+            field_class, related_to = resolve_field(schema, field)
+            if related_to is not None:
+                ctype = schema.get_content_type(field.field_type)
+                content_types[ctype.pk] = dump_row(ctype)
+            row = dump_row(field)
+            row.update({'field_class': field_class, 'related_to': related_to})
+            fields.append(row)
+        models.append({
+            'model': dump_row(app_model),
+            'app': dump_row(app_model.app),
+            'admin': dump_row(app_model.admin),
+            'api_serialiser': dump_row(app_model.api_serialiser),
+            'endpoint': app_model.get_endpoint_name(),
+            'fields': fields,
+        })
+    return {
+        'format': FORMAT,
+        'generation': generation,
+        'content_types': sorted(content_types.values(), key=lambda row: row['id']),
+        'models': models,
+    }
+
+
+def write(path, snapshot):
+    '''
+    Writes a snapshot so workers never read a half written file
+    '''
+    partial = '%s.tmp' % path
+    with open(partial, 'w') as stream:
+        json.dump(snapshot, stream, separators=(',', ':'), sort_keys=True)
+    os.rename(partial, path)
+
+
+def read(path):
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (IOError, ValueError) as exc:
+        raise SnapshotError('Cannot read schema snapshot %s: %s' % (path, exc))
+
+
+def load(snapshot, generation):
+    '''
+    Returns the loader.Schema held in a snapshot, raising StaleSnapshot if
+    it wasn't taken at ``generation`` and SnapshotError if it's malformed
+    '''
+    try:
+        return _load(snapshot, generation)
+    except (AttributeError, KeyError, TypeError, ValueError) as exc:
+        raise SnapshotError('Malformed schema snapshot: %s: %s' % (
+            exc.__class__.__name__, exc
+        ))
+
+
+def _load(snapshot, generation):
+    if snapshot.get('format') != FORMAT:
+        raise SnapshotError('Unsupported schema snapshot format %r' % snapshot.get('format'))
+    if snapshot['generation'] != generation:
+        raise StaleSnapshot('Schema snapshot is of generation %s, the schema is at %s' % (
+            snapshot['generation'], generation
+        ))
+    Application = get_model('application', 'Application')
+    ApplicationModel = get_model('application', 'ApplicationModel')
+    AdminSetting = get_model('application', 'AdminSetting')
+    ApiSerialiserSetting = get_model('application', 'ApiSerialiserSetting')
+    ModelField = get_model('application', 'ModelField')
+
+    apps = {}
+    app_models = []
+    for entry in snapshot['models']:
+        app = apps.get(entry['app']['id'])
+        if app is None:
+            app = apps[entry['app']['id']] = load_row(Application, entry['app'])
+        app_model = load_row(ApplicationModel, entry['model'])
+        app_model.app = app
+        app_model.admin = load_row(AdminSetting, entry['admin'])
+        app_model.api_serialiser = load_row(ApiSerialiserSetting, entry['api_serialiser'])
+
+        fields = []
+        for row in entry['fields']:
+            row = dict(row)
+            field_class = row.pop('field_class')
+            row.pop('related_to')
+            field = load_row(ModelField, row)
+            resolved = get_field_class(field.field_type)
+            if resolved is not None and get_class_path(resolved) != field_class:
+                raise StaleSnapshot('Field %s.%s no longer resolves to %s' % (
+                    app_model.name, field.name, field_class
+                ))
+            field.model = app_model
+            fields.append(field)
+        # Stands in for prefetch_related('fields')
+        queryset = app_model.fields.all()
+        queryset._result_cache = fields
+        queryset._prefetch_done = True
+        app_model._prefetched_objects_cache = {'fields': queryset}
+        app_models.append(app_model)
+    content_types = [load_row(ContentType, row) for row in snapshot['content_types']]
+
+    for app_model in app_models:
+        # get_app_model() hands these out instead of querying for them
+        registry.memoise(
+            app_model.app.name, app_model.name, 'definition',
+            lambda app_model=app_model: app_model
+        )
+    return Schema(app_models, content_types, complete=True)
+
+
+def load_file(path, generation):
+    return load(read(path), generation)
@@ -0,0 +1,54 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, models
+from django.db.models.loading import cache
+from django.test import TestCase
+
+from application import actions
+
+
+class CreateTablesTestCase(TestCase):
+
+    def setUp(self):
+        class Meta:
+            app_label = 'batch'
+
+        self.author = type('Author', (models.Model,), {
+            'Meta': Meta, '__module__': 'applications.batch.models',
+            'name': models.CharField(max_length=32, db_index=True),
+            'favourite': models.ForeignKey('batch.Book', null=True),
+        })
+        self.book = type('Book', (models.Model,), {
+            'Meta': Meta, '__module__': 'applications.batch.models',
+            'author': models.ForeignKey(self.author),
+            'owner': models.ForeignKey('auth.User', null=True),
+        })
+        self._table_names = connection.introspection.table_names
+
+        def table_names(*args, **kwargs):
+            raise AssertionError('Listed every table')
+        connection.introspection.table_names = table_names
+
+    def tearDown(self):
+        connection.introspection.table_names = self._table_names
+        cache.app_models.pop('batch', None)
+        cache._get_models_cache.clear()
+
+    def test_create_many(self):
+        created = actions.create_many([self.author, self.book])
+        self.assertEqual(created, [self.author, self.book])
+
+        user_model = self.book._meta.get_field('owner').rel.to
+        self.assertEqual(
+            actions.get_existing_tables(connection, [
+                'batch_author', 'batch_book', user_model._meta.db_table
+            ]),
+            set(['batch_author', 'batch_book', user_model._meta.db_table])
+        )
+        book = self.book.objects.create(author=self.author.objects.create(name='A'))
+        self.author.objects.update(favourite=book)
+        self.assertTrue(ContentType.objects.filter(app_label='batch', model='book').exists())
+
+    def test_existing_tables_skipped(self):
+        actions.create(self.author, None)
+        self.assertEqual(actions.create_many([self.author, self.book]), [self.book])
+        self.assertEqual(actions.create_many([self.author, self.book]), [])
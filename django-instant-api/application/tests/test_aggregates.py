@@ -0,0 +1,100 @@
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from application import models
+
+
+class AggregateTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='sales', verbose_name='Sales'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Order', verbose_name='Order', app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,region,total,note', filter_fields='region'
+            )
+        )
+        for name, field_type in (('region', 'application_charfield'),
+                                 ('total', 'application_integerfield'),
+                                 ('note', 'application_charfield'),
+                                 ('secret', 'application_integerfield')):
+            models.ModelField.objects.create(
+                name=name, verbose_name=name, model=self.model, field_type=field_type
+            )
+        order = self.model.as_model()
+        for region, total in (('north', 10), ('north', 30), ('south', 5)):
+            order.objects.create(region=region, total=total, note='x', secret=1)
+
+        self.factory = APIRequestFactory()
+        self.view = self.model.as_view_set().as_view({'get': 'aggregate'})
+
+    def tearDown(self):
+        self.app.delete()
+
+    def get(self, **params):
+        return self.view(self.factory.get('/api/orders/aggregate/', params))
+
+    def test_totals(self):
+        response = self.get(sum='total', max='total')
+        self.assertEqual(response.data['results'], [
+            {'count': 3, 'total__sum': 45, 'total__max': 30}
+        ])
+
+    def test_group_by(self):
+        with self.assertNumQueries(1):
+            response = self.get(group_by='region', sum='total', avg='total')
+        self.assertEqual(response.data['results'], [
+            {'region': 'north', 'count': 2, 'total__sum': 40, 'total__avg': 20.0},
+            {'region': 'south', 'count': 1, 'total__sum': 5, 'total__avg': 5.0},
+        ])
+        self.assertFalse(response.data['truncated'])
+
+    def test_group_limit(self):
+        viewset = self.model.as_view_set()
+        viewset.aggregate_max_groups = 1
+        view = viewset.as_view({'get': 'aggregate'})
+        response = view(self.factory.get('/api/orders/aggregate/', {'group_by': 'region'}))
+        self.assertEqual(response.data['results'], [{'region': 'north', 'count': 2}])
+        self.assertTrue(response.data['truncated'])
+
+    def test_filters(self):
+        response = self.get(region='south', sum='total')
+        self.assertEqual(response.data['results'], [{'count': 1, 'total__sum': 5}])
+
+    def test_uncached_by_default(self):
+        self.get(group_by='region')
+        with self.assertNumQueries(1):
+            self.get(group_by='region')
+
+    def test_cached_per_version(self):
+        self.model.api_serialiser.cache_timeout = 60
+        self.model.api_serialiser.save()
+        self.view = self.model.as_view_set().as_view({'get': 'aggregate'})
+        self.get(group_by='region')
+        with self.assertNumQueries(0):
+            response = self.get(group_by='region')
+        self.assertEqual(json.loads(response.content)['results'][0]['count'], 2)
+        self.model.as_model().objects.create(region='north', total=1)
+        response = self.get(group_by='region')
+        self.assertEqual(json.loads(response.content)['results'][0]['count'], 3)
+
+    def test_allowed_fields(self):
+        self.assertEqual(self.get(sum='secret').status_code, 400)
+        self.assertEqual(self.get(sum='note').status_code, 400)
+        self.assertEqual(self.get(group_by='nope').status_code, 400)
+
+    def test_count_field(self):
+        models.ModelField.objects.create(
+            name='count', verbose_name='count', model=self.model,
+            field_type='application_integerfield', null=True
+        )
+        self.model.api_serialiser.fields = 'id,region,total,count'
+        self.model.api_serialiser.save()
+        view = self.model.as_view_set().as_view({'get': 'aggregate'})
+        response = view(self.factory.get('/api/orders/aggregate/', {'sum': 'count'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'pk__count': 3, 'count__sum': None}])
@@ -0,0 +1,33 @@
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from application import benchmarks, models
+
+
+class BenchmarkTestCase(TestCase):
+
+    def tearDown(self):
+        models.Application.objects.filter(name__startswith='bench').delete()
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(benchmarks.percentile(values, 0.5), 50)
+        self.assertEqual(benchmarks.percentile(values, 0.99), 99)
+        self.assertEqual(benchmarks.percentile([3], 0.99), 3)
+        self.assertIsNone(benchmarks.percentile([], 0.5))
+
+    @override_settings(INSTANT_API_LONG_POLL=True)
+    def test_run(self):
+        results = benchmarks.run(
+            apps=1, models_per_app=2, fields_per_model=2, rows=3, requests=2
+        )
+        self.assertEqual(results['schema']['build']['queries'], 3)
+        self.assertGreater(results['startup']['urls'], 0)
+        for kind in ('drf', 'compiled', 'compiled_values'):
+            self.assertEqual(results['serialisers'][kind]['samples'], 5)
+        self.assertEqual(results['long_poll']['woken'], 50)
+        # The test database is in memory, which threads can't share
+        self.assertIn('skipped', results['write_batching'])
+        for kind in ('list', 'detail', 'filter'):
+            self.assertEqual(results['endpoints'][kind]['samples'], 4)
+            self.assertIsNotNone(results['endpoints'][kind]['p99_ms'])
@@ -0,0 +1,119 @@
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from application import models
+from application.routers import SchemaRouter
+
+
+class BulkTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title,priority', filter_fields='title'
+            )
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.model, field_type='application_charfield',
+        )
+        models.ModelField.objects.create(
+            name='priority', verbose_name='Priority',
+            model=self.model, field_type='application_integerfield',
+            null=False, blank=False, default='0'
+        )
+        self.task = self.model.as_model()
+
+        self.factory = APIRequestFactory()
+        self.view = self.model.as_view_set().as_view({
+            'post': 'bulk', 'put': 'bulk', 'patch': 'bulk', 'delete': 'bulk'
+        })
+
+    def tearDown(self):
+        self.app.delete()
+
+    def send(self, method, rows, content_type='application/json'):
+        if content_type == 'application/x-ndjson':
+            body = '\n'.join(json.dumps(row) for row in rows)
+        else:
+            body = json.dumps(rows)
+        request = getattr(self.factory, method)(
+            '/api/tasks/bulk/', body, content_type=content_type
+        )
+        return self.view(request)
+
+    def test_route(self):
+        router = SchemaRouter()
+        router.register('tasks', self.model.as_view_set())
+        names = [pattern.name for pattern in router.get_urls()]
+        self.assertIn('task-bulk', names)
+        self.assertLess(names.index('task-bulk'), names.index('task-detail'))
+
+    def test_bulk_create(self):
+        rows = [{'title': 'Task %s' % i, 'priority': i} for i in range(5)]
+        rows.append({'title': 'Broken', 'priority': 'high'})
+        response = self.send('post', rows)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(response.data['errors'][0]['row'], 5)
+        self.assertEqual(self.task.objects.count(), 5)
+
+    def test_bulk_create_duplicate_unique(self):
+        self.task.objects.create(title='Existing')
+        models.ModelField.objects.create(
+            name='code', verbose_name='Code', model=self.model,
+            field_type='application_charfield', unique=True, null=True
+        )
+        self.model.api_serialiser.fields = 'id,title,priority,code'
+        self.model.api_serialiser.save()
+        self.task = self.model.as_model()
+        view = self.model.as_view_set()
+        view.bulk_chunk_size = 2
+        view = view.as_view({'post': 'bulk'})
+        response = view(self.factory.post('/api/tasks/bulk/', [
+            {'title': 'A', 'code': 'a'}, {'title': 'B', 'code': 'b'},
+            {'title': 'C', 'code': 'c'}, {'title': 'D', 'code': 'c'},
+        ], format='json'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertEqual(
+            sorted(self.task.objects.values_list('title', flat=True)), ['A', 'B', 'Existing']
+        )
+
+    def test_bulk_create_ndjson(self):
+        rows = [{'title': 'Task %s' % i} for i in range(3)]
+        response = self.send('post', rows, 'application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.task.objects.count(), 3)
+
+    def test_bulk_update(self):
+        first = self.task.objects.create(title='First')
+        second = self.task.objects.create(title='Second')
+        response = self.send('patch', [
+            {'id': first.pk, 'priority': 3},
+            {'id': second.pk, 'title': 'Renamed'},
+            {'id': 999, 'title': 'Missing'},
+        ])
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['errors'], [{'row': 2, 'errors': 'Not found'}])
+        self.assertEqual(self.task.objects.get(pk=first.pk).priority, 3)
+        self.assertEqual(self.task.objects.get(pk=second.pk).title, 'Renamed')
+
+    def test_bulk_delete(self):
+        first = self.task.objects.create(title='First')
+        second = self.task.objects.create(title='Second')
+        self.task.objects.create(title='Third')
+        response = self.send('delete', [first.pk, {'id': second.pk}])
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(list(self.task.objects.values_list('title', flat=True)), ['Third'])
+
+    def test_rejects_single_object(self):
+        response = self.send('post', {'title': 'Task'})
+        self.assertEqual(response.status_code, 400)
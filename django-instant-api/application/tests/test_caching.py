@@ -0,0 +1,161 @@
+import time
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from application import models
+from application.caching import _version_key, get_data_version, get_response_cache
+
+
+class ResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title', filter_fields='title', cache_timeout=60
+            )
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.model, field_type='application_charfield',
+        )
+        self.task = self.model.as_model()
+        self.task.objects.create(title='First')
+
+        self.factory = APIRequestFactory()
+        self.view = self.model.as_view_set().as_view({'get': 'list'})
+
+    def tearDown(self):
+        self.app.delete()
+
+    def get(self, **extra):
+        return self.view(self.factory.get('/api/tasks/', **extra))
+
+    def test_cached_response(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'])
+        with self.assertNumQueries(0):
+            cached = self.get()
+        self.assertEqual(cached.content, response.content)
+
+    def test_conditional_get(self):
+        response = self.get()
+        not_modified = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        # Written this second, a later write could share the date
+        self.assertFalse(response.has_header('Last-Modified'))
+        get_response_cache().set(
+            _version_key('tasks', 'task'), time.time() - 10, None
+        )
+        response = self.get()
+        not_modified = self.get(
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        self.task.objects.create(title='Second')
+        changed = self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_checks_run_before_cache(self):
+        viewset = self.model.as_view_set()
+        viewset.permission_classes = [IsAuthenticated]
+        view = viewset.as_view({'get': 'list'})
+        user = User.objects.create(username='cached')
+        request = self.factory.get('/api/tasks/')
+        force_authenticate(request, user)
+        self.assertEqual(view(request).status_code, 200)
+        self.assertEqual(view(self.factory.get('/api/tasks/')).status_code, 403)
+
+    def test_cached_per_user(self):
+        viewset = self.model.as_view_set()
+        view = viewset.as_view({'get': 'list'})
+        self.assertEqual(view(self.factory.get('/api/tasks/')).status_code, 200)
+        request = self.factory.get('/api/tasks/')
+        force_authenticate(request, User.objects.create(username='other'))
+        with self.assertNumQueries(2):
+            # Not served the anonymous response
+            self.assertEqual(view(request).status_code, 200)
+
+    def test_nested_invalidates(self):
+        owner = models.ApplicationModel.objects.create(
+            name='Owner', verbose_name='Owner', app=self.app
+        )
+        models.ModelField.objects.create(
+            name='name', verbose_name='Name',
+            model=owner, field_type='application_charfield',
+        )
+        models.ModelField.objects.create(
+            name='owner', verbose_name='Owner',
+            model=self.model, field_type='owner', null=True,
+        )
+        self.model.api_serialiser.fields = 'id,title,owner'
+        self.model.api_serialiser.nested = True
+        self.model.api_serialiser.save()
+        person = owner.as_model().objects.create(name='Ann')
+        self.model.as_model().objects.update(owner=person)
+        view = self.model.as_view_set().as_view({'get': 'list'})
+        response = view(self.factory.get('/api/tasks/'))
+        self.assertIn('Ann', response.content)
+        person.name = 'Bob'
+        person.save()
+        self.assertIn('Bob', view(self.factory.get('/api/tasks/')).content)
+
+    def test_write_invalidates(self):
+        response = self.get()
+        self.task.objects.create(title='Second')
+        changed = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('Second', changed.content)
+
+    def record_versions(self):
+        '''
+        Returns the data versions a read inside the writer's transaction
+        sees just after each save
+        '''
+        seen = []
+
+        def saved(sender, **kwargs):
+            if sender is self.task:
+                seen.append(get_data_version(self.task))
+        post_save.connect(saved, weak=False)
+        self.addCleanup(post_save.disconnect, saved)
+        return seen
+
+    def test_bulk_bumps_after_commit(self):
+        before = get_data_version(self.task)
+        seen = self.record_versions()
+        view = self.model.as_view_set().as_view({'put': 'bulk'})
+        pk = self.task.objects.get().pk
+        response = view(self.factory.put(
+            '/api/tasks/bulk/', [{'id': pk, 'title': 'Changed'}], format='json'
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, [before])
+        self.assertNotEqual(get_data_version(self.task), before)
+
+    def test_admin_bumps_after_commit(self):
+        model_admin = self.model.as_admin()(self.task, admin.site)
+        # Skips the redirect to the changelist, which isn't routed here
+        model_admin.response_change = lambda request, obj: HttpResponse()
+        request = RequestFactory().post('/', {'title': 'Changed'})
+        request.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        request._dont_enforce_csrf_checks = True
+        before = get_data_version(self.task)
+        seen = self.record_versions()
+        response = model_admin.change_view(request, str(self.task.objects.get().pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, [before])
+        self.assertNotEqual(get_data_version(self.task), before)
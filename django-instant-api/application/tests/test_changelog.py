@@ -0,0 +1,166 @@
+import json
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase, TransactionTestCase
+from django.test.client import RequestFactory
+from rest_framework.test import APIRequestFactory
+
+from application import changelog, models
+from application.importer import Importer
+
+
+class ChangeLogTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='notes', verbose_name='Notes'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Note', verbose_name='Note', app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,text', filter_fields='text', change_log=True
+            )
+        )
+        models.ModelField.objects.create(
+            name='text', verbose_name='text', model=self.model,
+            field_type='application_charfield'
+        )
+        self.note = self.model.as_model()
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def call(self, action, method='get', data=None, **params):
+        view = self.model.as_view_set().as_view({method: action})
+        if method == 'get':
+            request = self.factory.get('/api/notes/', params)
+        else:
+            request = getattr(self.factory, method)(
+                '/api/notes/', json.dumps(data), content_type='application/json'
+            )
+        return view(request)
+
+    def sync(self, since=None):
+        if since is None:
+            return self.call('sync').data
+        return self.call('sync', since=since).data
+
+    def test_sync(self):
+        first = self.note.objects.create(text='First')
+        token = self.sync()['token']
+        self.assertEqual(self.sync(0)['changed'], [{'id': first.pk, 'text': 'First'}])
+
+        second = self.note.objects.create(text='Second')
+        first.text = 'Changed'
+        first.save()
+        data = self.sync(token)
+        self.assertEqual(data['changed'], [
+            {'id': first.pk, 'text': 'Changed'},
+            {'id': second.pk, 'text': 'Second'},
+        ])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['more'])
+
+        pk = second.pk
+        second.delete()
+        latest = self.sync(data['token'])
+        self.assertEqual(latest['changed'], [])
+        self.assertEqual(latest['deleted'], [pk])
+        self.assertEqual(self.sync(latest['token'])['changed'], [])
+        # Each row is logged once, however often it changed
+        self.assertEqual(models.ChangeLog.objects.count(), 2)
+
+    def test_paging(self):
+        for i in range(5):
+            self.note.objects.create(text='Note %s' % i)
+        viewset = self.model.as_view_set()
+        viewset.sync_page_size = 3
+        view = viewset.as_view({'get': 'sync'})
+        data = view(self.factory.get('/api/notes/', {'since': 0})).data
+        self.assertTrue(data['more'])
+        self.assertEqual(len(data['changed']), 3)
+        data = view(self.factory.get('/api/notes/', {'since': data['token']})).data
+        self.assertFalse(data['more'])
+        self.assertEqual(len(data['changed']), 2)
+
+    def test_bulk(self):
+        token = self.sync()['token']
+        response = self.call('bulk', 'post', [{'text': 'A'}, {'text': 'B'}])
+        self.assertEqual(response.status_code, 201)
+        data = self.sync(token)
+        self.assertEqual([row['text'] for row in data['changed']], ['A', 'B'])
+
+        pks = [row['id'] for row in data['changed']]
+        self.call('bulk', 'put', [{'id': pks[0], 'text': 'C'}])
+        self.call('bulk', 'delete', [pks[1]])
+        data = self.sync(data['token'])
+        self.assertEqual(data['changed'], [{'id': pks[0], 'text': 'C'}])
+        self.assertEqual(data['deleted'], [pks[1]])
+
+    def test_admin(self):
+        token = self.sync()['token']
+        model_admin = self.model.as_admin()(self.note, admin.site)
+        request = RequestFactory().post('/')
+        request.user = User(is_superuser=True)
+        note = self.note(text='Admin')
+        model_admin.save_model(request, note, None, False)
+        pk = note.pk
+        model_admin.delete_model(request, note)
+        self.assertEqual(self.sync(token)['deleted'], [pk])
+
+    def test_opt_in(self):
+        self.model.api_serialiser.change_log = False
+        self.model.api_serialiser.save()
+        self.note = self.model.as_model()
+        self.note.objects.create(text='Unlogged')
+        self.assertFalse(models.ChangeLog.objects.exists())
+        self.assertEqual(self.call('sync').status_code, 404)
+
+    def test_import(self):
+        token = self.sync()['token']
+        totals = Importer(self.note).run([{'text': 'One'}, {'text': 'Two'}])
+        self.assertEqual(totals['created'], 2)
+        data = self.sync(token)
+        self.assertEqual([row['text'] for row in data['changed']], ['One', 'Two'])
+
+        Importer(self.note, dry_run=True).run([{'text': 'Three'}])
+        self.assertEqual(self.sync(data['token'])['changed'], [])
+
+
+class ChangeLogTransactionTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='journal', verbose_name='Journal'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Entry', verbose_name='Entry', app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,text', filter_fields='text', change_log=True
+            )
+        )
+        models.ModelField.objects.create(
+            name='text', verbose_name='text', model=self.model,
+            field_type='application_charfield'
+        )
+        self.entry = self.model.as_model()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def test_row_and_log_commit_together(self):
+        def fail(model_class, changes):
+            raise IntegrityError('log entry clash')
+        log_changes = changelog.log_changes
+        changelog.log_changes = fail
+        try:
+            with self.assertRaises(IntegrityError):
+                self.entry.objects.create(text='Lost')
+        finally:
+            changelog.log_changes = log_changes
+        self.assertFalse(self.entry.objects.exists())
+        self.entry.objects.create(text='Kept')
+        self.assertEqual(models.ChangeLog.objects.count(), 1)
@@ -0,0 +1,88 @@
+import datetime
+import json
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from application import models
+from application.compiled import get_compiled_fields
+
+
+class CompiledSerialiserTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='compiled', verbose_name='Compiled'
+        )
+        self.owner_model = self.create_model('Owner', 'id,name')
+        self.create_field(self.owner_model, 'name', 'application_charfield')
+        self.item_model = self.create_model(
+            'Item', 'id,name,count,done,created,price,owner'
+        )
+        self.create_field(self.item_model, 'name', 'application_charfield')
+        self.create_field(self.item_model, 'count', 'application_integerfield')
+        self.create_field(self.item_model, 'done', 'application_booleanfield')
+        self.create_field(self.item_model, 'created', 'application_datetimefield')
+        self.create_field(self.item_model, 'price', 'application_floatfield')
+        self.create_field(self.item_model, 'owner', 'owner')
+
+        owner = self.owner_model.as_model().objects.create(name='Ann')
+        item = self.item_model.as_model()
+        created = timezone.make_aware(datetime.datetime(2014, 5, 1, 12, 30), timezone.utc)
+        item.objects.create(name='One', count=1, done=True, created=created,
+                            price=1.5, owner=owner)
+        item.objects.create(name=None, count=None, done=False)
+
+    def tearDown(self):
+        self.app.delete()
+
+    def create_model(self, name, fields, nested=False):
+        return models.ApplicationModel.objects.create(
+            name=name, verbose_name=name, app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields=fields, filter_fields='id', nested=nested
+            )
+        )
+
+    def create_field(self, model, name, field_type):
+        models.ModelField.objects.create(
+            name=name, verbose_name=name, model=model, field_type=field_type
+        )
+
+    def serialise(self, objects, compiled=True):
+        serialiser = self.item_model.as_api_serialiser()
+        if not compiled:
+            serialiser = type('Serialiser', (serialiser,), {'compile_fields': False})
+        serializer = serialiser(objects, many=True)
+        self.assertEqual(serializer.get_compiled_plan() is not None, compiled)
+        return json.loads(JSONRenderer().render(serializer.data))
+
+    def test_compiled_fields(self):
+        compiled = get_compiled_fields(self.item_model.as_api_serialiser())
+        self.assertEqual(compiled['owner'][1:3], ('owner', 'owner_id'))
+        self.assertIsNone(compiled['name'][3])
+        self.assertIsNotNone(compiled['created'][3])
+        # Hyperlinked fields need DRF
+        self.assertIsNone(get_compiled_fields(self.item_model.default_serialiser)['url'])
+
+    def test_matches_drf(self):
+        item = self.item_model.as_model()
+        instances = list(item.objects.order_by('pk'))
+        expected = self.serialise(instances, compiled=False)
+        self.assertEqual(expected[0]['created'], '2014-05-01T12:30:00Z')
+        self.assertEqual(self.serialise(instances), expected)
+        rows = item.objects.order_by('pk').values(
+            *[field.name for field in item._meta.fields]
+        )
+        self.assertEqual(self.serialise(rows), expected)
+
+    def test_nested_falls_back(self):
+        self.item_model.api_serialiser.nested = True
+        self.item_model.api_serialiser.save()
+        self.item_model.uncache()
+        serializer = self.item_model.as_api_serialiser()(
+            self.item_model.as_model().objects.order_by('pk'), many=True
+        )
+        self.assertIsNone(serializer.get_compiled_plan())
+        self.assertEqual(serializer.data[0]['owner']['name'], 'Ann')
@@ -0,0 +1,90 @@
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from application import models
+from application.export import iter_rows
+
+
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='exports', verbose_name='Export'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title,priority', filter_fields='title'
+            )
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.model, field_type='application_charfield',
+        )
+        models.ModelField.objects.create(
+            name='priority', verbose_name='Priority',
+            model=self.model, field_type='application_integerfield',
+            null=False, blank=False, default='0'
+        )
+        self.task = self.model.as_model()
+        for i in range(7):
+            self.task.objects.create(title=u'T\xe2che %s' % i, priority=i)
+
+        self.factory = APIRequestFactory()
+        view_set = self.model.as_view_set()
+        view_set.export_chunk_size = 3
+        self.view = view_set.as_view({'get': 'export'})
+
+    def tearDown(self):
+        self.app.delete()
+
+    def export(self, **params):
+        response = self.view(self.factory.get('/api/exports/export/', params))
+        self.assertEqual(response.status_code, 200)
+        return response, ''.join(response.streaming_content)
+
+    def test_iter_rows_chunks(self):
+        queryset = self.task.objects.all()
+        with self.assertNumQueries(4):
+            rows = list(iter_rows(queryset, ['title'], chunk_size=3))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(set(len(row) for row in rows), set([1]))
+        self.assertEqual([row[0] for row in rows], sorted(row[0] for row in rows))
+
+    def test_export_ndjson(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(sorted(rows[0]), ['id', 'priority', 'title'])
+        self.assertEqual(rows[6]['title'], u'T\xe2che 6')
+
+    def test_export_csv(self):
+        response, content = self.export(output='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = content.splitlines()
+        self.assertEqual(lines[0], 'id,title,priority')
+        self.assertEqual(len(lines), 8)
+        self.assertIn(u'T\xe2che 0'.encode('utf-8'), lines[1])
+
+    def test_export_csv_without_id(self):
+        self.model.api_serialiser.fields = 'title,priority'
+        self.model.api_serialiser.save()
+        self.view = self.model.as_view_set().as_view({'get': 'export'})
+        response, content = self.export(output='csv')
+        lines = content.splitlines()
+        self.assertEqual(lines[0], 'title,priority')
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(set(len(line.split(',')) for line in lines), set([2]))
+
+    def test_export_filtered(self):
+        response, content = self.export(title=u'T\xe2che 2')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['priority'] for row in rows], [2])
+
+    def test_unknown_format(self):
+        response = self.view(self.factory.get('/api/exports/export/', {'output': 'xml'}))
+        self.assertEqual(response.status_code, 400)
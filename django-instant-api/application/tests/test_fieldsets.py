@@ -0,0 +1,86 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from application import models
+
+
+class SparseFieldsTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='sparse', verbose_name='Sparse'
+        )
+        self.author_model = models.ApplicationModel.objects.create(
+            name='Author', verbose_name='Author', app=self.app
+        )
+        self.create_field(self.author_model, 'name', 'application_charfield')
+        self.post_model = models.ApplicationModel.objects.create(
+            name='Post', verbose_name='Post', app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title,body,author', filter_fields='title', nested=True
+            )
+        )
+        self.create_field(self.post_model, 'title', 'application_charfield')
+        self.create_field(self.post_model, 'body', 'application_textfield')
+        self.create_field(self.post_model, 'author', 'author')
+
+        author = self.author_model.as_model().objects.create(name='Ann')
+        post = self.post_model.as_model()
+        for i in range(3):
+            post.objects.create(title='Post %s' % i, body='Body %s' % i, author=author)
+
+        self.factory = APIRequestFactory()
+        self.view_set = self.post_model.as_view_set()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def create_field(self, model, name, field_type):
+        models.ModelField.objects.create(
+            name=name, verbose_name=name, model=model, field_type=field_type
+        )
+
+    def get(self, actions=None, **params):
+        view = self.view_set.as_view(actions or {'get': 'list'})
+        pk = params.pop('pk', None)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(self.factory.get('/api/posts/', params), pk=pk)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_fields(self):
+        response, queries = self.get(fields='id,title')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [sorted(row) for row in response.data['results']], [['id', 'title']] * 3
+        )
+        select = queries[-1]
+        self.assertNotIn('"body"', select)
+        self.assertNotIn('"author_id"', select)
+
+    def test_exclude(self):
+        response, queries = self.get(exclude='body')
+        row = response.data['results'][0]
+        self.assertEqual(list(row), ['id', 'title', 'author'])
+        self.assertEqual(row['author']['name'], 'Ann')
+        self.assertNotIn('"body"', queries[-1])
+
+    def test_unknown_field(self):
+        response, queries = self.get(fields='id,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_values_match_instances(self):
+        response, queries = self.get(fields='id,title,body')
+        self.view_set.serialise_values = False
+        try:
+            expected, queries = self.get(fields='id,title,body')
+        finally:
+            del self.view_set.serialise_values
+        self.assertEqual(response.data['results'], expected.data['results'])
+
+    def test_detail(self):
+        pk = self.post_model.as_model().objects.order_by('pk')[0].pk
+        response, queries = self.get({'get': 'retrieve'}, pk=pk, fields='title')
+        self.assertEqual(response.data, {'title': 'Post 0'})
+        self.assertNotIn('"body"', queries[-1])
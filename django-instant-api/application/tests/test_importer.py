@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+from StringIO import StringIO
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from application import models
+from application.importer import Importer, import_stream
+
+
+class ImporterTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='imports', verbose_name='Import'
+        )
+        self.project_model = models.ApplicationModel.objects.create(
+            name='Project', verbose_name='Project', app=self.app
+        )
+        self.task_model = models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task', app=self.app
+        )
+        models.ModelField.objects.create(
+            name='name', verbose_name='Name',
+            model=self.project_model, field_type='application_charfield',
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.task_model, field_type='application_charfield',
+        )
+        models.ModelField.objects.create(
+            name='priority', verbose_name='Priority',
+            model=self.task_model, field_type='application_integerfield',
+        )
+        models.ModelField.objects.create(
+            name='project', verbose_name='Project',
+            model=self.task_model, field_type='project',
+        )
+        self.project = self.project_model.as_model().objects.create(name='Launch')
+        self.task = self.task_model.as_model()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def test_import_csv_in_chunks(self):
+        lines = ['title,priority,project']
+        lines.extend(u'T\xe2che %s,%s,%s' % (i, i, self.project.pk) for i in range(5))
+        lines.append('Broken,high,%s' % self.project.pk)
+        lines.append('Orphan,1,999')
+        stream = StringIO(u'\n'.join(lines).encode('utf-8'))
+        progress = []
+        totals = import_stream(
+            self.task, stream, 'csv', chunk_size=2,
+            progress=lambda totals: progress.append(totals['rows'])
+        )
+        self.assertEqual(totals['created'], 5)
+        self.assertEqual(totals['failed'], 2)
+        self.assertEqual([error['row'] for error in totals['errors']], [5, 6])
+        self.assertEqual(progress, [2, 4, 6, 7])
+        self.assertEqual(self.task.objects.count(), 5)
+        self.assertTrue(self.task.objects.filter(title=u'T\xe2che 4').exists())
+
+    def test_import_ndjson(self):
+        rows = [{'title': 'Task %s' % i, 'project_id': self.project.pk} for i in range(3)]
+        stream = StringIO('\n'.join(json.dumps(row) for row in rows) + '\n\nnot json\n')
+        totals = import_stream(self.task, stream, 'tasks.ndjson')
+        self.assertEqual(totals['created'], 3)
+        self.assertEqual(totals['errors'][0]['row'], 3)
+        self.assertEqual(self.task.objects.filter(project=self.project).count(), 3)
+
+    def test_dry_run(self):
+        totals = Importer(self.task, dry_run=True).run([{'title': 'Task'}])
+        self.assertEqual(totals['created'], 1)
+        self.assertEqual(self.task.objects.count(), 0)
+
+    def test_command(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as stream:
+            stream.write('title\nFirst\nSecond\n')
+        out = StringIO()
+        try:
+            call_command('import_rows', 'imports.task', path, stdout=out)
+        finally:
+            os.remove(path)
+        self.assertIn('2 rows read, 2 created, 0 failed', out.getvalue())
+        self.assertEqual(self.task.objects.count(), 2)
+
+    def test_admin_import(self):
+        model_admin = self.task_model.as_admin()(self.task, admin.site)
+        upload = SimpleUploadedFile('tasks.csv', 'title\nFirst\nSecond\n')
+        request = RequestFactory().post('/', {'import_file': upload, 'dry_run': 'on'})
+        request.user = User(is_superuser=True)
+        response = model_admin.import_action(request)
+        self.assertEqual(response.context_data['result']['created'], 2)
+        self.assertIn('2 rows read, 2 created, 0 failed', response.render().content)
+        self.assertEqual(self.task.objects.count(), 0)
+
+        upload = SimpleUploadedFile('tasks.csv', 'title\nFirst\nSecond\n')
+        request = RequestFactory().post('/', {'import_file': upload})
+        request.user = User(is_superuser=True)
+        model_admin.import_action(request)
+        self.assertEqual(self.task.objects.count(), 2)
+
+    def test_admin_import_needs_add_permission(self):
+        model_admin = self.task_model.as_admin()(self.task, admin.site)
+        upload = SimpleUploadedFile('tasks.csv', 'title\nFirst\n')
+        request = RequestFactory().post('/', {'import_file': upload})
+        request.user = User.objects.create_user('clerk')
+        with self.assertRaises(PermissionDenied):
+            model_admin.import_action(request)
+        self.assertEqual(self.task.objects.count(), 0)
@@ -0,0 +1,70 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from application import models
+from application.indexes import list_indexes
+
+
+class IndexTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app, ordering='-priority',
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title,priority', filter_fields='title'
+            )
+        )
+        for name, field_type in (('title', 'application_charfield'),
+                                 ('priority', 'application_integerfield')):
+            models.ModelField.objects.create(
+                name=name, verbose_name=name,
+                model=self.model, field_type=field_type,
+            )
+
+    def tearDown(self):
+        self.app.delete()
+
+    def get_indexed_columns(self):
+        return [
+            (columns, managed)
+            for name, columns, unique, managed in list_indexes(self.model)
+        ]
+
+    def test_filter_fields_and_ordering_are_indexed(self):
+        self.assertEqual(
+            sorted(self.get_indexed_columns()),
+            [((u'priority',), True), ((u'title',), True)]
+        )
+
+    def test_changed_filter_fields_drop_index(self):
+        api_serialiser = self.model.api_serialiser
+        api_serialiser.filter_fields = 'id'
+        api_serialiser.save()
+        self.assertEqual(
+            self.get_indexed_columns(), [((u'priority',), True)]
+        )
+
+    def test_composite_index(self):
+        index = models.ModelIndex.objects.create(
+            model=self.model, fields='priority, title'
+        )
+        self.assertIn(((u'priority', u'title'), True), self.get_indexed_columns())
+        index.delete()
+        self.assertNotIn(((u'priority', u'title'), True), self.get_indexed_columns())
+
+    def test_deleted_field_forgets_index(self):
+        self.model.fields.get(name='title').delete()
+        self.assertEqual(
+            self.get_indexed_columns(), [((u'priority',), True)]
+        )
+        self.assertFalse(self.model.indexes.filter(fields='title').exists())
+
+    def test_list_indexes_command(self):
+        out = StringIO()
+        call_command('list_indexes', 'tasks.task', stdout=out)
+        self.assertIn('(title) managed', out.getvalue())
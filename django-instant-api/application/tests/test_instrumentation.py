@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from application import instrumentation, models, schema
+
+
+@override_settings(INSTANT_API_INSTRUMENTATION=True)
+class InstrumentationTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='timings', verbose_name='Timing'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Timing', verbose_name='Timing',
+            app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title', filter_fields='title'
+            )
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.model, field_type='application_charfield',
+        )
+        self.model.as_model().objects.create(title='First')
+        # Make the project's watcher pick up the model on the next request
+        schema.watcher.generation = -1
+        instrumentation.collector.reset()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def get_timings(self, response):
+        timings = {}
+        for metric in response['Server-Timing'].split(', '):
+            parts = metric.split(';')
+            timings[parts[0]] = dict(part.split('=', 1) for part in parts[1:])
+        return timings
+
+    def test_server_timing(self):
+        response = self.client.get('/api/timings/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        timings = self.get_timings(response)
+        self.assertIn('schema', timings)
+        self.assertIn('serialise', timings)
+        self.assertIn('render', timings)
+        self.assertGreater(float(timings['total']['dur']), 0)
+        self.assertRegexpMatches(timings['db']['desc'], r'"\d+ queries"')
+
+    def test_other_requests_not_timed(self):
+        response = self.client.get('/api/', HTTP_ACCEPT='application/json')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_stats(self):
+        User.objects.create_superuser('staff', 'staff@example.com', 'secret')
+        self.client.login(username='staff', password='secret')
+        for i in range(3):
+            self.client.get('/api/timings/', HTTP_ACCEPT='application/json')
+        response = self.client.get('/api/_stats/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        histograms = response.data['endpoints']['timings.timing list']
+        self.assertEqual(histograms['total']['count'], 3)
+        self.assertEqual(sum(count for bound, count in histograms['queries']['buckets']), 3)
+
+        self.client.delete('/api/_stats/')
+        self.assertEqual(instrumentation.collector.snapshot(), {})
+
+    def test_stats_staff_only(self):
+        response = self.client.get('/api/_stats/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete('/api/_stats/', HTTP_X_FORWARDED_FOR='127.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(INSTANT_API_STATS_ALLOWED_IPS=['10.1.2.3'])
+    def test_stats_allowed_ips(self):
+        response = self.client.get('/api/_stats/', REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/_stats/', REMOTE_ADDR='10.1.2.4')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(INSTANT_API_INSTRUMENTATION=False)
+    def test_disabled(self):
+        response = self.client.get('/api/timings/', HTTP_ACCEPT='application/json')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class HistogramTestCase(TestCase):
+
+    def test_observe(self):
+        histogram = instrumentation.Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        self.assertEqual(histogram.as_dict(), {
+            'count': 4,
+            'sum': 56.5,
+            'buckets': [['1', 2], ['10', 1], ['+Inf', 1]],
+        })
@@ -0,0 +1,70 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from application import models, registry, schema
+from application.loader import Schema
+from application.routers import SchemaRouter
+
+
+class SchemaLoaderTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+        for name in ('Account', 'Project', 'Task', 'Note'):
+            models.ApplicationModel.objects.create(
+                name=name, verbose_name=name,
+                app=self.app,
+                admin=models.AdminSetting.objects.create(),
+                api_serialiser=models.ApiSerialiserSetting.objects.create(
+                    fields='id', filter_fields='id'
+                ),
+            )
+        self.create_field('Account', 'owner', 'user')
+        self.create_field('Project', 'account', 'account')
+        self.create_field('Task', 'project', 'project')
+        self.create_field('Task', 'title', 'application_charfield')
+        self.create_field('Note', 'task', 'task')
+        self.create_field('Note', 'body', 'application_textfield')
+        registry.clear()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def create_field(self, model_name, name, field_type):
+        models.ModelField.objects.create(
+            name=name, verbose_name=name,
+            model=models.ApplicationModel.objects.get(name=model_name),
+            field_type=field_type
+        )
+
+    def test_build_query_count(self):
+        with self.assertNumQueries(3):
+            model_classes = Schema.load().build()
+        self.assertEqual(len(model_classes), 4)
+
+    def test_build_resolves_foreign_keys(self):
+        Schema.load().build()
+        account = registry.get('tasks', 'account')
+        project = registry.get('tasks', 'project')
+        task = registry.get('tasks', 'task')
+        self.assertIs(account._meta.get_field('owner').rel.to, User)
+        self.assertIs(project._meta.get_field('account').rel.to, account)
+        self.assertIs(task._meta.get_field('project').rel.to, project)
+
+    def test_build_resolves_circular_foreign_keys(self):
+        self.create_field('Account', 'note', 'note')
+        registry.clear()
+        Schema.load().build()
+        account = registry.get('tasks', 'account')
+        project = registry.get('tasks', 'project')
+        note = registry.get('tasks', 'note')
+        self.assertIs(account._meta.get_field('note').rel.to, note)
+        self.assertIs(project._meta.get_field('account').rel.to, account)
+
+    def test_attach_query_count(self):
+        watcher = schema.SchemaWatcher()
+        watcher.generation = schema.current_generation()
+        with self.assertNumQueries(3):
+            watcher.attach(SchemaRouter())
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from application import models
+from application.caching import bump_data_version
+
+
+@override_settings(INSTANT_API_LONG_POLL=True)
+class LongPollTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='feeds', verbose_name='Feeds'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Entry', verbose_name='Entry', app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title', filter_fields='title', cache_timeout=60
+            )
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='title', model=self.model,
+            field_type='application_charfield'
+        )
+        self.entry = self.model.as_model()
+        self.view = self.model.as_view_set().as_view({'get': 'changes'})
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def changes(self, **params):
+        response = self.view(self.factory.get('/api/entries/changes/', params))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_current_version(self):
+        data = self.changes()
+        self.assertFalse(data['changed'])
+        self.assertEqual(self.changes(version='0', timeout='10')['changed'], True)
+
+    def test_timeout(self):
+        version = self.changes()['version']
+        start = time.time()
+        data = self.changes(version=version, timeout='0.1')
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        self.assertEqual(data, {'version': version, 'changed': False})
+
+    def test_woken_by_change(self):
+        version = self.changes()['version']
+
+        def write():
+            time.sleep(0.1)
+            bump_data_version(self.entry)
+        writer = threading.Thread(target=write)
+        writer.start()
+        start = time.time()
+        data = self.changes(version=version, timeout='10')
+        writer.join()
+        self.assertLess(time.time() - start, 5)
+        self.assertTrue(data['changed'])
+        self.assertNotEqual(data['version'], version)
+
+    def test_not_cached(self):
+        version = self.changes()['version']
+        self.entry.objects.create(title='New')
+        self.assertNotEqual(self.changes()['version'], version)
+
+    def test_invalid_timeout(self):
+        response = self.view(self.factory.get('/api/entries/changes/', {
+            'version': '1', 'timeout': 'soon'
+        }))
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(INSTANT_API_LONG_POLL=False)
+    def test_opt_in(self):
+        response = self.view(self.factory.get('/api/entries/changes/', {
+            'version': '1', 'timeout': '10'
+        }))
+        self.assertEqual(response.status_code, 404)
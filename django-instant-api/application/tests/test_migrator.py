@@ -0,0 +1,140 @@
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from application import migrator, models
+
+
+class MigratorTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='migrations', verbose_name='Migration'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Note', verbose_name='Note', app=self.app
+        )
+        self.title = self.create_field('title', 'application_charfield')
+
+    def tearDown(self):
+        self.app.delete()
+
+    def create_field(self, name, field_type, **kwargs):
+        return models.ModelField.objects.create(
+            name=name, verbose_name=name, model=self.model,
+            field_type=field_type, **kwargs
+        )
+
+    def get_columns(self):
+        return migrator.get_live_columns(self.model.as_model()._meta.db_table)
+
+    def count_rebuilds(self, queries):
+        return len([
+            query for query in queries.captured_queries
+            if 'CREATE TABLE "_south_new_' in query['sql']
+        ])
+
+    def test_add_and_drop(self):
+        body = self.create_field('body', 'application_textfield')
+        self.assertEqual(self.get_columns()['body']['type'], 'text')
+        body.delete()
+        self.assertNotIn('body', self.get_columns())
+        self.assertFalse(migrator.plan_table(self.model))
+
+    def test_update_alters_column(self):
+        self.title.null = False
+        self.title.unique = True
+        self.title.save()
+        column = self.get_columns()['title']
+        self.assertFalse(column['null'])
+        self.assertTrue(column['unique'])
+
+        self.title.unique = False
+        self.title.save()
+        self.assertFalse(self.get_columns()['title']['unique'])
+
+        self.title.field_type = 'application_integerfield'
+        self.title.null = True
+        self.title.save()
+        self.assertEqual(self.get_columns()['title']['type'], 'integer')
+        self.assertFalse(migrator.plan_table(self.model))
+
+    def test_rename_keeps_data(self):
+        self.model.as_model().objects.create(title='Kept')
+        self.title.name = 'heading'
+        self.title.save()
+        self.assertNotIn('title', self.get_columns())
+        self.assertEqual(
+            list(self.model.as_model().objects.values_list('heading', flat=True)),
+            ['Kept']
+        )
+
+    def test_deferred_rebuilds_table_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            with migrator.deferred():
+                fields = [
+                    self.create_field('field%s' % i, 'application_integerfield')
+                    for i in range(10)
+                ]
+                for field in fields:
+                    field.unique = True
+                    field.save()
+                self.title.delete()
+        if connection.vendor == 'sqlite':
+            self.assertEqual(self.count_rebuilds(queries), 1)
+        columns = self.get_columns()
+        self.assertNotIn('title', columns)
+        self.assertTrue(all(columns['field%s' % i]['unique'] for i in range(10)))
+
+    def test_single_change_rebuilds_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.create_field('body', 'application_textfield')
+        if connection.vendor == 'sqlite':
+            self.assertEqual(self.count_rebuilds(queries), 1)
+
+    def test_command(self):
+        # Simulate a table out of step with its fields
+        models.ModelField.objects.filter(pk=self.title.pk).update(null=False)
+        out = StringIO()
+        call_command('migrate_tables', 'migrations.note', dry_run=True, stdout=out)
+        self.assertIn('alter title (null)', out.getvalue())
+        self.assertTrue(self.get_columns()['title']['null'])
+
+        call_command('migrate_tables', stdout=StringIO())
+        self.assertFalse(self.get_columns()['title']['null'])
+
+    def add_unknown_column(self):
+        table = self.model.as_model()._meta.db_table
+        connection.cursor().execute('ALTER TABLE %s ADD COLUMN legacy varchar(10)' % (
+            connection.ops.quote_name(table)
+        ))
+
+    def test_unknown_columns_kept(self):
+        self.add_unknown_column()
+        plan = migrator.plan_table(self.model)
+        self.assertFalse(plan)
+        self.assertEqual(plan.unknown, ['legacy'])
+
+        self.create_field('body', 'application_textfield')
+        self.assertIn('legacy', self.get_columns())
+
+        out = StringIO()
+        call_command('migrate_tables', 'migrations.note', dry_run=True, stdout=out)
+        self.assertIn('keep legacy (no field defines it)', out.getvalue())
+        call_command('migrate_tables', 'migrations.note', stdout=StringIO())
+        self.assertIn('legacy', self.get_columns())
+
+        call_command('migrate_tables', 'migrations.note', drop_unknown=True, stdout=StringIO())
+        self.assertNotIn('legacy', self.get_columns())
+
+    def test_deferred_rename_then_delete(self):
+        with migrator.deferred():
+            self.title.name = 'heading'
+            self.title.save()
+            self.title.delete()
+        columns = self.get_columns()
+        self.assertNotIn('title', columns)
+        self.assertNotIn('heading', columns)
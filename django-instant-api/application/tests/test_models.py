@@ -42,6 +42,32 @@ class ApplicationModelTestCase(TestCase):
             'CharField'
         )
 
+    def test_as_model_is_memoised(self):
+        self.assertIs(self.model.as_model(), self.model.as_model())
+
+    def test_uncache_builds_new_class(self):
+        model = self.model.as_model()
+        self.model.uncache()
+        self.assertIsNot(self.model.as_model(), model)
+
+    def test_uncache_rebuilds_dependent_models(self):
+        account_model = models.ApplicationModel.objects.create(
+            name='Account', verbose_name='Account',
+            app=self.app
+        )
+        models.ModelField.objects.create(
+            name='task', verbose_name='Task',
+            model=account_model, field_type='task',
+            null=True, blank=True
+        )
+        account = account_model.as_model()
+        self.model.uncache()
+        task = self.model.as_model()
+        self.assertIsNot(account_model.as_model(), account)
+        self.assertIs(
+            account_model.as_model()._meta.get_field('task').rel.to, task
+        )
+
     def test_as_admin(self):
         admin = self.model.as_admin()
         self.assertEqual(admin.__name__, 'TaskAdmin')
@@ -0,0 +1,82 @@
+import urlparse
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from application import models
+
+
+class KeysetPaginationTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app, ordering='-priority',
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title,priority', filter_fields='priority',
+                pagination='keyset'
+            )
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.model, field_type='application_charfield',
+        )
+        models.ModelField.objects.create(
+            name='priority', verbose_name='Priority',
+            model=self.model, field_type='application_integerfield',
+            null=False, blank=False, default='0'
+        )
+        task = self.model.as_model()
+        for i in range(7):
+            task.objects.create(title='Task %s' % i, priority=i % 3)
+
+        self.factory = APIRequestFactory()
+        self.view = self.model.as_view_set().as_view(
+            {'get': 'list'}, paginate_by=3
+        )
+
+    def tearDown(self):
+        self.app.delete()
+
+    def get(self, url):
+        url = urlparse.urlparse(url)
+        request = self.factory.get(url.path, dict(urlparse.parse_qsl(url.query)))
+        return self.view(request).data
+
+    def get_titles(self, page):
+        return [row['title'] for row in page['results']]
+
+    def test_pages_forwards_and_backwards(self):
+        first = self.get('/api/tasks/')
+        self.assertNotIn('count', first)
+        self.assertIsNone(first['previous'])
+        self.assertEqual(
+            self.get_titles(first), ['Task 2', 'Task 5', 'Task 1']
+        )
+
+        second = self.get(first['next'])
+        self.assertEqual(
+            self.get_titles(second), ['Task 4', 'Task 0', 'Task 3']
+        )
+        third = self.get(second['next'])
+        self.assertEqual(self.get_titles(third), ['Task 6'])
+        self.assertIsNone(third['next'])
+
+        previous = self.get(third['previous'])
+        self.assertEqual(self.get_titles(previous), self.get_titles(second))
+        previous = self.get(previous['previous'])
+        self.assertEqual(self.get_titles(previous), self.get_titles(first))
+        self.assertIsNone(previous['previous'])
+
+    def test_skips_count_query(self):
+        with self.assertNumQueries(1):
+            self.get('/api/tasks/')
+
+    def test_invalid_cursor(self):
+        response = self.view(
+            self.factory.get('/api/tasks/', {'cursor': 'nope'})
+        )
+        self.assertEqual(response.status_code, 400)
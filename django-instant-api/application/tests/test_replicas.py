@@ -0,0 +1,100 @@
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from south.db import dbs
+
+from application import migrator, models, replicas
+from application.middleware import ReplicaMiddleware
+
+
+@override_settings(INSTANT_API_REPLICAS=['replica'])
+class ReplicaTestCase(TestCase):
+
+    def setUp(self):
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+        }
+        dbs['replica'] = dbs[DEFAULT_DB_ALIAS].__class__('replica')
+        replicas.start_request()
+
+        self.app = models.Application.objects.create(
+            name='replicated', verbose_name='Replicated'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Entry', verbose_name='Entry', app=self.app
+        )
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title', model=self.model,
+            field_type='application_charfield'
+        )
+        self.entry = self.model.as_model()
+        self.table = self.entry._meta.db_table
+
+    def tearDown(self):
+        self.app.delete()
+        replicas.start_request()
+        connections['replica'].close()
+        del connections._connections.replica
+        del connections.databases['replica']
+        del dbs['replica']
+
+    def test_tables_on_every_alias(self):
+        self.assertEqual(replicas.get_schema_aliases(), ['default', 'replica'])
+        columns = migrator.get_live_columns(self.table, 'replica')
+        self.assertIn('title', columns)
+
+        models.ModelField.objects.create(
+            name='body', verbose_name='Body', model=self.model,
+            field_type='application_textfield', null=True
+        )
+        for alias in replicas.get_schema_aliases():
+            self.assertIn('body', migrator.get_live_columns(self.table, alias))
+        self.assertFalse(migrator.plan_table(self.model, using='replica'))
+
+    def test_reads_from_replica(self):
+        self.entry.objects.using('replica').create(title='Replicated')
+        replicas.start_request()
+        entry = self.entry.objects.get()
+        self.assertEqual(entry._state.db, 'replica')
+        with replicas.primary():
+            self.assertFalse(self.entry.objects.exists())
+
+        # Writes go to the primary, and later reads follow them there
+        entry.save()
+        self.assertEqual(entry._state.db, 'default')
+        self.assertEqual(self.entry.objects.count(), 1)
+        self.assertEqual(self.entry.objects.get().title, 'Replicated')
+
+        # Definitions aren't generated models and stay on the primary
+        replicas.start_request()
+        self.assertEqual(models.ApplicationModel.objects.filter(
+            pk=self.model.pk).count(), 1)
+
+    def test_sticky_after_write(self):
+        middleware = ReplicaMiddleware()
+        factory = RequestFactory()
+
+        request = factory.post('/api/replicated/entry/')
+        middleware.process_request(request)
+        self.assertTrue(replicas.is_pinned())
+        self.entry.objects.create(title='Written')
+        response = middleware.process_response(request, HttpResponse(status=201))
+        cookie = response.cookies[replicas.STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+
+        request = factory.get('/api/replicated/entry/')
+        request.COOKIES[replicas.STICKY_COOKIE] = cookie.value
+        middleware.process_request(request)
+        self.assertEqual(self.entry.objects.count(), 1)
+        response = middleware.process_response(request, HttpResponse())
+        self.assertNotIn(replicas.STICKY_COOKIE, response.cookies)
+
+        # Other clients read from the replica
+        request = factory.get('/api/replicated/entry/')
+        middleware.process_request(request)
+        self.assertFalse(replicas.is_pinned())
+        self.assertEqual(self.entry.objects.count(), 0)
+        middleware.process_response(request, HttpResponse())
@@ -0,0 +1,154 @@
+from django.contrib import admin
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from application import models, registry, schema
+from application.routers import SchemaRouter
+
+
+class SchemaWatcherTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+
+        self.model = models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app
+        )
+
+        self.watcher = schema.SchemaWatcher()
+        self.router = SchemaRouter()
+        self.watcher.attach(self.router)
+
+    def tearDown(self):
+        self.app.delete()
+
+    def get_prefixes(self):
+        return [prefix for prefix, viewset, basename in self.router.registry]
+
+    def test_publish_bumps_generation(self):
+        generation = schema.current_generation()
+        schema.publish(self.model)
+        self.assertEqual(schema.current_generation(), generation + 1)
+        self.assertEqual(
+            models.ApplicationModel.objects.get(pk=self.model.pk).generation,
+            generation + 1
+        )
+
+    def test_sync_unchanged_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(self.watcher.sync())
+
+    def test_sync_registers_new_model(self):
+        self.assertEqual(self.get_prefixes(), ['tasks'])
+        models.ApplicationModel.objects.create(
+            name='Account', verbose_name='Account',
+            app=self.app
+        )
+        self.assertTrue(self.watcher.sync())
+        self.assertEqual(self.get_prefixes(), ['tasks', 'accounts'])
+
+    def test_sync_rebuilds_changed_model(self):
+        viewset = self.router.registry[0][1]
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.model, field_type='application_charfield',
+        )
+        self.assertTrue(self.watcher.sync())
+        model_class = self.router.registry[0][1].get_view_set().queryset.model
+        self.assertIsNot(self.router.registry[0][1], viewset)
+        self.assertIn('title', model_class._meta.get_all_field_names())
+
+    def make_site(self, name):
+        # Importing the admin module at load time would read the database
+        # before the test database exists
+        from application.admin import SchemaAdmin
+        return SchemaAdmin(admin.AdminSite(name=name))
+
+    def test_attach_builds_nothing(self):
+        registry.clear()
+        router = SchemaRouter()
+        self.watcher.attach(router)
+        self.assertEqual(router.registry[0][0], 'tasks')
+        self.assertIsNone(registry.get('tasks', 'task'))
+
+        view_set = router.registry[0][1].get_view_set()
+        self.assertIs(view_set.queryset.model, registry.get('tasks', 'task'))
+        self.assertIs(router.registry[0][1].get_view_set(), view_set)
+
+    def test_admin_materialised_on_first_use(self):
+        registry.clear()
+        site = self.make_site('lazy')
+        self.watcher.attach(site)
+        self.assertFalse(site.materialised)
+        self.assertEqual(site.site._registry, {})
+
+        patterns = site.urls[0].urlpatterns
+        self.assertTrue(site.materialised)
+        self.assertIn(registry.get('tasks', 'task'), site.site._registry)
+        self.assertTrue(patterns)
+
+    def test_warm(self):
+        registry.clear()
+        site = self.make_site('warm')
+        self.watcher.attach(site)
+        self.watcher.warm()
+        self.assertTrue(site.materialised)
+        self.assertIsNotNone(registry.get('tasks', 'task'))
+
+    def test_sync_removes_deleted_model(self):
+        self.model.delete()
+        self.assertTrue(self.watcher.sync())
+        self.assertEqual(self.get_prefixes(), [])
+
+    def test_sync_removes_cascade_deleted_model(self):
+        models.Application.objects.filter(pk=self.app.pk).delete()
+        self.assertTrue(self.watcher.sync())
+        self.assertEqual(self.get_prefixes(), [])
+
+    def test_queryset_field_delete_publishes(self):
+        models.ModelField.objects.create(
+            name='title', verbose_name='Title',
+            model=self.model, field_type='application_charfield',
+        )
+        self.watcher.sync()
+        models.ModelField.objects.filter(model=self.model).delete()
+        self.assertTrue(self.watcher.sync())
+        model_class = self.router.registry[0][1].get_view_set().queryset.model
+        self.assertNotIn('title', model_class._meta.get_all_field_names())
+
+
+class SchemaSyncMiddlewareTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+        # Make the project's watcher treat every model as changed, the
+        # generation counter is rolled back between tests
+        schema.watcher.generation = -1
+
+    def tearDown(self):
+        self.app.delete()
+
+    def test_new_model_is_routed_without_restart(self):
+        self.assertNotIn('tasks', self.client.get('/api/').data)
+        models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app
+        )
+        self.assertIn('tasks', self.client.get('/api/').data)
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 200)
+
+    def test_new_model_is_in_admin_without_restart(self):
+        self.client.get('/api/')
+        models.ApplicationModel.objects.create(
+            name='Task', verbose_name='Task',
+            app=self.app
+        )
+        self.client.get('/api/')
+        self.assertEqual(
+            reverse('admin:tasks_task_changelist'), '/admin/tasks/task/'
+        )
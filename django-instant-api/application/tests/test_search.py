@@ -0,0 +1,128 @@
+from django.contrib import admin
+from django.db import connection
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+
+from application import models, search
+from application.caching import bump_data_version
+
+
+class SearchTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='library', verbose_name='Library'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Book', verbose_name='Book', app=self.app,
+            admin=models.AdminSetting.objects.create(search_fields='title,summary'),
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,title,summary', filter_fields='title'
+            )
+        )
+        for name, field_type in (('title', 'application_charfield'),
+                                 ('summary', 'application_textfield'),
+                                 ('pages', 'application_integerfield')):
+            models.ModelField.objects.create(
+                name=name, verbose_name=name, model=self.model,
+                field_type=field_type, null=True
+            )
+        self.book = self.model.as_model()
+        self.apple = self.book.objects.create(
+            title='Apple pie', summary='Baking with apples and apple juice'
+        )
+        self.pear = self.book.objects.create(title='Pears', summary='An apple cousin')
+        self.book.objects.create(title='Bread', summary='Flour and water')
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def search(self, query):
+        view = self.model.as_view_set().as_view({'get': 'list'})
+        response = view(self.factory.get('/api/books/', {'search': query}))
+        return [row['title'] for row in response.data['results']]
+
+    def check_search(self):
+        self.assertEqual(search.get_search_fields(self.model), ['title', 'summary'])
+        self.assertEqual(self.search('apple'), ['Apple pie', 'Pears'])
+        self.assertEqual(self.search('apple cous'), ['Pears'])
+        self.assertEqual(self.search('flour WATER'), ['Bread'])
+        self.assertEqual(self.search('nothing'), [])
+
+        self.pear.title = 'Quince'
+        self.pear.summary = 'Not related'
+        self.pear.save()
+        self.assertEqual(self.search('apple'), ['Apple pie'])
+        self.apple.delete()
+        self.assertEqual(self.search('apple'), [])
+
+    def test_fts5(self):
+        table = self.book._meta.db_table
+        self.assertTrue(search.has_fts_table(self.book, 'default'))
+        with CaptureQueriesContext(connection) as queries:
+            search.sync_search_index(self.model)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'CREATE' in query['sql'] or 'DROP' in query['sql']
+        ])
+        self.check_search()
+        self.assertIn('%s_fts' % table, connection.queries[-1]['sql'])
+
+    @override_settings(INSTANT_API_SEARCH_FTS=False)
+    def test_python_index(self):
+        self.check_search()
+
+    @override_settings(INSTANT_API_SEARCH_FTS=False)
+    def test_python_index_updates(self):
+        fields = ['title', 'summary']
+        index = search.get_search_index(self.book, fields, 'default')
+        self.book.objects.create(title='Apple crumble')
+        self.assertEqual(self.search('crumble'), ['Apple crumble'])
+        self.assertIs(search.get_search_index(self.book, fields, 'default'), index)
+
+        # Changes made without signals, as by another process
+        self.book.objects.filter(pk=self.pear.pk).update(title='Quince')
+        bump_data_version(self.book)
+        with override_settings(INSTANT_API_SEARCH_REBUILD_INTERVAL=3600):
+            self.assertEqual(self.search('quince'), [])
+        with override_settings(INSTANT_API_SEARCH_REBUILD_INTERVAL=0):
+            self.assertEqual(self.search('quince'), ['Quince'])
+        self.assertIsNot(search.get_search_index(self.book, fields, 'default'), index)
+
+    @override_settings(INSTANT_API_SEARCH_FTS=False, INSTANT_API_SEARCH_LIMIT=2)
+    def test_python_index_limit(self):
+        self.book.objects.create(title='Apple', summary='Apple apple apple')
+        self.assertEqual(self.search('apple'), ['Apple', 'Apple pie'])
+
+    @override_settings(INSTANT_API_SEARCH_FTS=False)
+    def test_python_index_many_matches(self):
+        self.book.objects.bulk_create([
+            self.book(title='Volume %s' % i, summary='Common words') for i in range(1200)
+        ])
+        queryset = search.search_queryset(
+            self.book.objects.all(), ['title', 'summary'], 'common'
+        )
+        self.assertEqual(queryset.count(), search.SEARCH_LIMIT)
+        self.assertEqual(len(self.search('common')), 50)
+
+    def test_search_fields_change(self):
+        self.model.admin.search_fields = 'summary'
+        self.model.admin.save()
+        self.assertEqual(self.search('pears'), [])
+        self.assertEqual(self.search('juice'), ['Apple pie'])
+
+        self.model.admin.search_fields = ''
+        self.model.admin.save()
+        self.assertFalse(search.has_fts_table(self.book, 'default'))
+        self.assertEqual(len(self.search('juice')), 3)
+
+    def test_admin(self):
+        model_admin = self.model.as_admin()(self.model.as_model(), admin.site)
+        queryset, distinct = model_admin.get_search_results(
+            RequestFactory().get('/'), self.book.objects.all(), 'apple'
+        )
+        self.assertFalse(distinct)
+        self.assertEqual([book.title for book in queryset], ['Apple pie', 'Pears'])
@@ -0,0 +1,69 @@
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from application import models
+
+
+class NestedSerialiserTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='tasks', verbose_name='Task'
+        )
+        self.account_model = self.create_model('Account', 'id,name')
+        self.project_model = self.create_model('Project', 'id,name,account', True)
+        self.task_model = self.create_model('Task', 'id,name,project,account', True)
+        self.create_field(self.account_model, 'name', 'application_charfield')
+        self.create_field(self.project_model, 'name', 'application_charfield')
+        self.create_field(self.project_model, 'account', 'account')
+        self.create_field(self.task_model, 'name', 'application_charfield')
+        self.create_field(self.task_model, 'project', 'project')
+        self.create_field(self.task_model, 'account', 'account')
+
+        account = self.account_model.as_model().objects.create(name='Acme')
+        project = self.project_model.as_model().objects.create(
+            name='Launch', account=account
+        )
+        task = self.task_model.as_model()
+        for i in range(10):
+            task.objects.create(name='Task %s' % i, project=project, account=account)
+
+    def tearDown(self):
+        self.app.delete()
+
+    def create_model(self, name, fields, nested=False):
+        return models.ApplicationModel.objects.create(
+            name=name, verbose_name=name,
+            app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields=fields, filter_fields='id', nested=nested
+            )
+        )
+
+    def create_field(self, model, name, field_type):
+        models.ModelField.objects.create(
+            name=name, verbose_name=name,
+            model=model, field_type=field_type,
+        )
+
+    def test_select_related_paths(self):
+        self.assertEqual(
+            sorted(self.task_model.get_select_related()),
+            ['account', 'project', 'project__account']
+        )
+
+    def test_serialiser_is_memoised(self):
+        serialiser = self.task_model.as_api_serialiser()
+        with self.assertNumQueries(0):
+            self.assertIs(self.task_model.as_api_serialiser(), serialiser)
+
+    def test_nested_list_query_count(self):
+        view = self.task_model.as_view_set().as_view({'get': 'list'})
+        request = APIRequestFactory().get('/api/tasks/')
+        # One query to count the rows, one to fetch the page
+        with self.assertNumQueries(2):
+            data = view(request).data
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(
+            data['results'][0]['project']['account']['name'], 'Acme'
+        )
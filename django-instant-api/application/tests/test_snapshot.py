@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from application import models, registry, schema, snapshot
+from application.routers import SchemaRouter
+
+
+class SchemaSnapshotTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='crm', verbose_name='CRM'
+        )
+        for name in ('Company', 'Contact'):
+            models.ApplicationModel.objects.create(
+                name=name, verbose_name=name, app=self.app,
+                admin=models.AdminSetting.objects.create(search_fields='name'),
+                api_serialiser=models.ApiSerialiserSetting.objects.create(
+                    fields='id,name', filter_fields='name', cache_timeout=30
+                ),
+            )
+        self.create_field('Company', 'name', 'application_charfield')
+        self.create_field('Company', 'owner', 'user')
+        self.create_field('Contact', 'name', 'application_charfield')
+        self.create_field('Contact', 'company', 'company')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'schema.json')
+        registry.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.app.delete()
+
+    def create_field(self, model_name, name, field_type):
+        models.ModelField.objects.create(
+            name=name, verbose_name=name,
+            model=models.ApplicationModel.objects.get(name=model_name),
+            field_type=field_type
+        )
+
+    def export(self):
+        call_command('export_schema', output=self.path, stdout=StringIO())
+        with open(self.path) as stream:
+            return json.load(stream)
+
+    def test_export(self):
+        data = self.export()
+        self.assertEqual(data['generation'], schema.current_generation())
+        contact = [entry for entry in data['models'] if entry['model']['name'] == 'Contact'][0]
+        self.assertEqual(contact['endpoint'], 'contacts')
+        self.assertEqual(contact['api_serialiser']['cache_timeout'], 30)
+        fields = dict((field['name'], field) for field in contact['fields'])
+        self.assertEqual(fields['name']['field_class'], 'django.db.models.fields.CharField')
+        self.assertEqual(fields['company']['related_to'], 'crm.company')
+        self.assertEqual(
+            sorted(ctype['model'] for ctype in data['content_types']), ['company', 'user']
+        )
+
+    def test_load_without_queries(self):
+        data = self.export()
+        with self.assertNumQueries(0):
+            loaded = snapshot.load(data, data['generation'])
+            loaded.build()
+            contact = registry.get('crm', 'contact')
+            company = registry.get('crm', 'company')
+            self.assertIs(contact._meta.get_field('company').rel.to, company)
+            self.assertIs(company._meta.get_field('owner').rel.to, User)
+            app_model = [m for m in loaded.app_models if m.name == 'Contact'][0]
+            self.assertEqual(app_model.api_serialiser.cache_timeout, 30)
+            self.assertEqual(app_model.as_view_set().cache_timeout, 30)
+            app_model.as_admin()
+
+    def test_stale(self):
+        data = self.export()
+        self.create_field('Contact', 'email', 'application_emailfield')
+        with self.assertRaises(snapshot.StaleSnapshot):
+            snapshot.load(data, schema.current_generation())
+        data['format'] = 0
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.load(data, data['generation'])
+
+    def test_malformed(self):
+        data = self.export()
+        for broken in (
+            {'format': data['format']},
+            {'format': data['format'], 'generation': data['generation']},
+            dict(data, models=[{'model': data['models'][0]['model']}]),
+            dict(data, models=[dict(data['models'][0], fields=[None])]),
+            [],
+        ):
+            with self.assertRaises(snapshot.SnapshotError):
+                snapshot.load(broken, data['generation'])
+
+        # Workers fall back to the database
+        snapshot.write(self.path, {'format': data['format'], 'generation': data['generation']})
+        watcher = schema.SchemaWatcher()
+        watcher.generation = data['generation']
+        with override_settings(INSTANT_API_SCHEMA_SNAPSHOT=self.path):
+            watcher.attach(SchemaRouter())
+        self.assertEqual(len(watcher.registered), 2)
+
+    def test_watcher(self):
+        self.export()
+        watcher = schema.SchemaWatcher()
+        watcher.generation = schema.current_generation()
+        with override_settings(INSTANT_API_SCHEMA_SNAPSHOT=self.path):
+            with self.assertNumQueries(0):
+                watcher.attach(SchemaRouter())
+            self.assertEqual(len(watcher.registered), 2)
+
+            # A stale snapshot is passed over for the database
+            self.create_field('Contact', 'email', 'application_emailfield')
+            watcher = schema.SchemaWatcher()
+            watcher.generation = schema.current_generation()
+            with self.assertNumQueries(3):
+                watcher.attach(SchemaRouter())
@@ -0,0 +1,24 @@
+from django.test import TestCase
+from django.db import models as django_models
+from django.contrib.contenttypes.models import ContentType
+
+from application import models, utils
+
+
+class FieldTypeTestCase(TestCase):
+
+    def test_get_field_class(self):
+        self.assertIs(
+            utils.get_field_class('application_charfield'),
+            django_models.CharField
+        )
+        self.assertIsNone(utils.get_field_class('user'))
+
+    def test_field_choices_follow_content_types(self):
+        choices = dict(utils.get_field_choices())
+        self.assertIn('Basic Fields', choices)
+        self.assertNotIn('Tasks', choices)
+
+        ContentType.objects.create(name='task', app_label='tasks', model='task')
+        choices = dict(models.ModelField._meta.get_field('field_type').choices)
+        self.assertEqual(choices['Tasks'], [('task', 'Task')])
@@ -0,0 +1,119 @@
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from application import models
+from application.caching import get_data_version
+from application.writebehind import WriteBatcher
+
+
+class WriteBatcherTestCase(TestCase):
+
+    def submit_all(self, batcher, writes):
+        errors = []
+
+        def client(write):
+            try:
+                batcher.submit(write)
+            except Exception as exc:
+                errors.append(exc)
+        threads = [threading.Thread(target=client, args=(write,)) for write in writes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_batches(self):
+        batcher = WriteBatcher(4, 1, DEFAULT_DB_ALIAS)
+        batches = []
+        original = batcher.flush
+
+        def flush(batch):
+            batches.append(len(batch))
+            original(batch)
+        batcher.flush = flush
+
+        done = []
+        self.assertEqual(self.submit_all(
+            batcher, [lambda i=i: done.append(i) for i in range(10)]
+        ), [])
+        self.assertEqual(sorted(done), list(range(10)))
+        self.assertEqual(sum(batches), 10)
+        self.assertLessEqual(max(batches), 4)
+        self.assertLess(len(batches), 10)
+        self.assertEqual(batcher.pending, [])
+
+    def test_failing_write(self):
+        batcher = WriteBatcher(3, 1, DEFAULT_DB_ALIAS)
+        done = []
+
+        def fail():
+            raise IntegrityError('duplicate')
+        errors = self.submit_all(batcher, [
+            lambda: done.append(1), fail, lambda: done.append(2)
+        ])
+        self.assertEqual([str(error) for error in errors], ['duplicate'])
+        self.assertEqual(sorted(done), [1, 2])
+
+
+class WriteBehindViewSetTestCase(TestCase):
+
+    def setUp(self):
+        self.app = models.Application.objects.create(
+            name='orders', verbose_name='Orders'
+        )
+        self.model = models.ApplicationModel.objects.create(
+            name='Order', verbose_name='Order', app=self.app,
+            api_serialiser=models.ApiSerialiserSetting.objects.create(
+                fields='id,code', filter_fields='code',
+                write_batch_rows=10, write_batch_ms=1
+            )
+        )
+        models.ModelField.objects.create(
+            name='code', verbose_name='code', model=self.model,
+            field_type='application_charfield', unique=True
+        )
+        self.order = self.model.as_model()
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        self.app.delete()
+
+    def test_create_and_update(self):
+        viewset = self.model.as_view_set()
+        self.assertEqual(viewset.write_batch_rows, 10)
+        response = viewset.as_view({'post': 'create'})(
+            self.factory.post('/api/orders/', {'code': 'A1'}, format='json')
+        )
+        self.assertEqual(response.status_code, 201)
+        order = self.order.objects.get()
+        self.assertEqual(response.data, {'id': order.pk, 'code': 'A1'})
+
+        response = viewset.as_view({'put': 'update'})(
+            self.factory.put('/api/orders/%s/' % order.pk, {'code': 'B2'}, format='json'),
+            pk=order.pk
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.order.objects.get().code, 'B2')
+
+    def test_invalid_rows_skip_the_queue(self):
+        response = self.model.as_view_set().as_view({'post': 'create'})(
+            self.factory.post('/api/orders/', {'code': 'x' * 300}, format='json')
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.order.objects.exists())
+
+    def test_version_moves_after_commit(self):
+        batcher = WriteBatcher(1, 0, DEFAULT_DB_ALIAS)
+        before = get_data_version(self.order)
+        seen = []
+
+        def write():
+            self.order.objects.create(code='Z')
+            seen.append(get_data_version(self.order))
+        batcher.submit(write)
+        self.assertEqual(seen, [before])
+        self.assertNotEqual(get_data_version(self.order), before)
@@ -1,16 +1,43 @@
+from django.core import urlresolvers
 from django.utils.importlib import import_module
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 
 import inspect
 
+_field_map = {}
+_field_classes = {}
+
+
 def get_field_map():
-    field_map = {}
-    for name, obj in inspect.getmembers(models):
-        if inspect.isclass(obj) and name.endswith('Field'):
-            application_field = 'application_%s' %  name.lower()
-            field_map[application_field] = ('django.db.models', name)
-    return field_map
+    '''
+    Maps field type names to the (module, class name) of the Django field,
+    inspecting django.db.models only the first time it's called
+    '''
+    if not _field_map:
+        for name, obj in inspect.getmembers(models):
+            if inspect.isclass(obj) and name.endswith('Field'):
+                application_field = 'application_%s' %  name.lower()
+                _field_map[application_field] = ('django.db.models', name)
+    return _field_map
+
+
+def get_field_class(field_type):
+    '''
+    Returns the Django field class for a field type name, or None if it isn't
+    one of the basic field types
+    '''
+    try:
+        return _field_classes[field_type]
+    except KeyError:
+        pass
+    field_class = None
+    if field_type in get_field_map():
+        module, klass = get_field_map()[field_type]
+        field_class = get_module_attr(module, klass, models.CharField)
+    _field_classes[field_type] = field_class
+    return field_class
 
 
 def get_module_attr(module, attr, fallback=None):
@@ -18,7 +45,7 @@ def get_module_attr(module, attr, fallback=None):
     return getattr(m, attr, fallback)
 
 
-def get_field_choices():
+def _build_field_choices():
     django_fields = []
     django_fields.append(
         ('Basic Fields', [(key, value[1]) for key, value in get_field_map().items()])
@@ -37,9 +64,50 @@ def get_field_choices():
     except Exception as e:
         # ContentTypes aren't available yet, maybe pre-syncdb
         print e
-        pass
+        return django_fields, False
+
+    return django_fields, True
+
+
+_field_choices = []
+
+
+def get_field_choices():
+    '''
+    Returns the grouped field type choices, the basic fields followed by a
+    group per app of content types to point foreign keys at.
+
+    The result is kept until a content type is saved or deleted.
+    '''
+    if not _field_choices:
+        choices, complete = _build_field_choices()
+        if not complete:
+            return choices
+        _field_choices.extend(choices)
+    return _field_choices
+
+
+def reset_field_choices(**kwargs):
+    del _field_choices[:]
+
+post_save.connect(reset_field_choices, sender=ContentType)
+post_delete.connect(reset_field_choices, sender=ContentType)
+
+
+class FieldChoices(object):
+    '''
+    Lazy stand-in for a field's choices that always reflects
+    get_field_choices(), rather than a copy frozen at import time
+    '''
 
-    return django_fields
+    def __nonzero__(self):
+        return True
+
+    def __iter__(self):
+        return iter(get_field_choices())
+
+    def __len__(self):
+        return len(get_field_choices())
 
 
 def get_unicode(self):
@@ -50,4 +118,28 @@ def get_unicode(self):
     if len(unival) > 0:
         return u' '.join(unival)
     else:
-        return self.verbose_name
\ No newline at end of file
+        return self.verbose_name
+
+
+def reset_url_caches():
+    '''
+    Forgets every resolved and reversed URL so patterns changed in place are
+    picked up by the next request
+    '''
+    resolvers = list(urlresolvers._resolver_cache.values())
+    resolvers.extend(urlresolvers._ns_resolver_cache.values())
+    for resolver in resolvers:
+        _reset_resolver(resolver)
+    urlresolvers.clear_url_caches()
+
+
+def _reset_resolver(resolver):
+    resolver._reverse_dict = {}
+    resolver._namespace_dict = {}
+    resolver._app_dict = {}
+    # Only walk URLconfs that are already loaded, this may run while the
+    # root URLconf itself is being imported
+    urlconf = getattr(resolver, '_urlconf_module', None)
+    for pattern in getattr(urlconf, 'urlpatterns', urlconf) or []:
+        if isinstance(pattern, urlresolvers.RegexURLResolver):
+            _reset_resolver(pattern)
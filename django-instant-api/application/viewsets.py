@@ -0,0 +1,74 @@
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import viewsets
+from rest_framework.settings import api_settings
+
+from application import registry
+from application.aggregates import AggregateMixin
+from application.bulk import BulkMixin, NDJSONParser
+from application.caching import ResponseCacheMixin
+from application.changelog import ChangeLogMixin
+from application.export import ExportMixin
+from application.fieldsets import SparseFieldsMixin
+from application.instrumentation import InstrumentationMixin
+from application.longpoll import LongPollMixin
+from application.pagination import KeysetPaginationMixin
+from application.search import FullTextSearchFilter
+from application.writebehind import WriteBehindMixin
+
+
+class ModelViewSet(InstrumentationMixin, ResponseCacheMixin,
+                   SparseFieldsMixin, KeysetPaginationMixin, BulkMixin,
+                   ExportMixin, AggregateMixin, LongPollMixin, ChangeLogMixin,
+                   WriteBehindMixin, viewsets.ModelViewSet):
+    '''
+    Base class of the viewsets generated by ApiMixin.as_view_set()
+    '''
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES + [NDJSONParser]
+    filter_backends = list(api_settings.DEFAULT_FILTER_BACKENDS) + [FullTextSearchFilter]
+    search_fields = ()
+    uncached_actions = ('changes', 'sync')
+
+
+class LazyViewSet(ModelViewSet):
+    '''
+    Stands in for a generated viewset when routing, so the routes can be
+    set up without building the model, serialiser and viewset classes.
+
+    The views it hands out build the real viewset on their first request
+    and again whenever the model's schema version moves on.
+    '''
+    app_model = None
+    base_name = None
+
+    @classmethod
+    def get_view_set(cls):
+        app_model = cls.app_model
+        return registry.memoise(
+            app_model.app.name, app_model.name, 'view_set', app_model.as_view_set
+        )
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        built = [(None, None)]
+
+        def view(request, *args, **kwargs):
+            view_set = cls.get_view_set()
+            built_for, built_view = built[0]
+            if built_for is not view_set:
+                built_view = view_set.as_view(actions, **initkwargs)
+                built[0] = (view_set, built_view)
+            return built_view(request, *args, **kwargs)
+
+        view.cls = cls
+        view.suffix = initkwargs.get('suffix', None)
+        return csrf_exempt(view)
+
+
+def lazy_view_set(app_model):
+    '''
+    Returns a LazyViewSet subclass for a model definition
+    '''
+    return type(str('%sLazyViewSet' % app_model.name.capitalize()), (LazyViewSet,), {
+        'app_model': app_model,
+        'base_name': app_model.name.lower(),
+    })
@@ -0,0 +1,156 @@
+'''
+Write coalescing for the generated viewsets.
+
+Models whose API settings give ``write_batch_rows`` have the single-object
+writes of their create and update actions committed together. Each request
+validates its row as usual and queues the save. The first request to find
+no flush under way collects the rows queued within ``write_batch_ms``
+milliseconds, up to ``write_batch_rows`` of them, and saves them all in
+one transaction, each in a savepoint of its own so a failing row only fails
+its request. Every request answers once the transaction holding its row
+has committed, with the same result it would have had on its own.
+'''
+import sys
+import threading
+import time
+
+from django.db import router, transaction
+from django.utils import six
+
+from application import registry
+from application.caching import deferred_invalidation
+
+BATCHED_ACTIONS = ('create', 'update', 'partial_update')
+
+
+class PendingWrite(object):
+
+    def __init__(self, write):
+        self.write = write
+        self.done = False
+        self.exc_info = None
+
+    def result(self):
+        if self.exc_info is not None:
+            six.reraise(*self.exc_info)
+
+
+class WriteBatcher(object):
+    '''
+    Queues writes to a model and commits them a batch per transaction, one
+    batch at a time
+    '''
+
+    def __init__(self, max_rows, max_delay, using):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.using = using
+        self.condition = threading.Condition()
+        self.pending = []
+        self.flushing = False
+
+    def submit(self, write):
+        '''
+        Runs ``write`` in the next batch, returning once it has committed
+        or raising what it raised
+        '''
+        item = PendingWrite(write)
+        with self.condition:
+            self.pending.append(item)
+            self.condition.notify_all()
+            while not item.done:
+                if self.flushing:
+                    self.condition.wait()
+                    continue
+                self.flushing = True
+                try:
+                    batch = self.collect()
+                    self.condition.release()
+                    try:
+                        self.flush(batch)
+                    finally:
+                        self.condition.acquire()
+                finally:
+                    self.flushing = False
+                    self.condition.notify_all()
+        item.result()
+
+    def collect(self):
+        '''
+        Waits for the batch to fill up or its time to run out, then takes it
+        off the queue
+        '''
+        deadline = time.time() + self.max_delay
+        while len(self.pending) < self.max_rows:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            self.condition.wait(remaining)
+        batch = self.pending[:self.max_rows]
+        del self.pending[:self.max_rows]
+        return batch
+
+    def flush(self, batch):
+        try:
+            # Data versions move on once, after the batch has committed
+            with deferred_invalidation():
+                try:
+                    with transaction.atomic(using=self.using):
+                        for item in batch:
+                            try:
+                                with transaction.atomic(using=self.using):
+                                    item.write()
+                            except Exception:
+                                item.exc_info = sys.exc_info()
+                except Exception:
+                    # Nothing was committed
+                    exc_info = sys.exc_info()
+                    for item in batch:
+                        item.exc_info = item.exc_info or exc_info
+        finally:
+            for item in batch:
+                item.done = True
+
+
+def get_write_batcher(model_class, max_rows, max_delay_ms):
+    '''
+    Returns the batcher shared by the writes to a model in this process
+    '''
+    app_label, model_name = registry.get_key(model_class)
+    using = router.db_for_write(model_class)
+    return registry.memoise(
+        app_label, model_name,
+        'write_batcher:%s:%s:%s' % (max_rows, max_delay_ms, using),
+        lambda: WriteBatcher(max_rows, max_delay_ms / 1000.0, using)
+    )
+
+
+class WriteBehindSerializerMixin(object):
+    '''
+    Hands the saves of a write-behind viewset to its model's batcher
+    '''
+
+    def save_object(self, obj, **kwargs):
+        view = self.context.get('view')
+        batcher = getattr(view, 'get_write_batcher', lambda: None)()
+        if batcher is None:
+            return super(WriteBehindSerializerMixin, self).save_object(obj, **kwargs)
+        batcher.submit(
+            lambda: super(WriteBehindSerializerMixin, self).save_object(obj, **kwargs)
+        )
+
+
+class WriteBehindMixin(object):
+    '''
+    Coalesces the writes of the create and update actions when
+    ``write_batch_rows`` is set
+    '''
+    write_batch_rows = None
+    write_batch_ms = 10
+
+    def get_write_batcher(self):
+        if not self.write_batch_rows or self.action not in BATCHED_ACTIONS:
+            return None
+        return get_write_batcher(
+            self.queryset.model, self.write_batch_rows, self.write_batch_ms
+        )
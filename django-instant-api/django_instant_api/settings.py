@@ -43,6 +43,9 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'application.middleware.InstrumentationMiddleware',
+    'application.middleware.SchemaSyncMiddleware',
+    'application.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,6 +69,28 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['application.replicas.ReplicaRouter']
+
+# Aliases in DATABASES to read generated models from, e.g. ['replica']
+INSTANT_API_REPLICAS = []
+
+# File written by manage.py export_schema that workers build the generated
+# models from at startup while it matches the schema generation
+INSTANT_API_SCHEMA_SNAPSHOT = None
+
+# Build every generated model, serialiser, viewset and admin when the URLs
+# load, rather than each one on its first request
+INSTANT_API_WARM_START = False
+
+# Serve <endpoint>/changes/, whose requests each hold a worker for up to
+# INSTANT_API_LONG_POLL_TIMEOUT seconds. Only turn it on with gevent workers,
+# see gunicorn.conf.py.
+INSTANT_API_LONG_POLL = False
+INSTANT_API_LONG_POLL_TIMEOUT = 5
+
+# Addresses allowed to read and reset api/_stats/ besides staff users
+INSTANT_API_STATS_ALLOWED_IPS = []
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.6/topics/i18n/
 
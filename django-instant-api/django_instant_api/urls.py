@@ -1,19 +1,19 @@
+from django.conf import settings
 from django.conf.urls import patterns, include, url
 from django.contrib import admin
 
-from rest_framework import routers
-from application.models import ApplicationModel
+from application.admin import schema_admin
+from application.routers import SchemaRouter
+from application.schema import watcher
 
 admin.autodiscover()
 
 
-router = routers.DefaultRouter()
-for model in ApplicationModel.objects.all():
-    if model.verbose_name_plural:
-        endpoint_name = model.verbose_name_plural.lower()
-    else:
-        endpoint_name = model.verbose_name.lower() + 's'
-    router.register(endpoint_name, model.as_view_set())
+router = SchemaRouter()
+watcher.attach(router)
+
+if getattr(settings, 'INSTANT_API_WARM_START', False):
+    watcher.warm()
 
 
 urlpatterns = patterns('',
@@ -21,6 +21,6 @@ urlpatterns = patterns('',
     # url(r'^$', 'django_instant_api.views.home', name='home'),
     # url(r'^blog/', include('blog.urls')),
     url(r'^grappelli/', include('grappelli.urls')),
-    url(r'^admin/', include(admin.site.urls)),
+    url(r'^admin/', include(schema_admin.urls)),
     url(r'^api/', include(router.urls)),
 )
@@ -0,0 +1,21 @@
+'''
+Gunicorn settings for serving the API with INSTANT_API_LONG_POLL on.
+
+    pip install -r requirements-longpoll.txt
+    gunicorn -c gunicorn.conf.py django_instant_api.wsgi
+
+Long-poll requests wait for up to INSTANT_API_LONG_POLL_TIMEOUT seconds.
+Gevent workers patch threading and sockets at startup, so a waiting
+request is a greenlet rather than a thread and a worker serves up to
+``worker_connections`` of them at once.
+'''
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = multiprocessing.cpu_count() * 2 + 1
+worker_class = 'gevent'
+worker_connections = 1000
+# Seconds without a heartbeat before a worker is restarted, well above the
+# longest wait
+timeout = 30